@@ -1,12 +1,13 @@
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
+from usecon.fred_store import load_series
+from usecon.streaming import stream_gaussian
+from usecon.ensemble import ensemble_writer
+from usecon.render import fan_bands, fan_chart, save_figure
 
-# Load historical GDP data from FRED database
-url = 'https://fred.stlouisfed.org/graph/fredgraph.csv?bgcolor=%23e1e9f0&chart_type=line&drp=0&fo=open%20sans&graph_bgcolor=%23ffffff&height=450&mode=fred&recession_bars=on&txtcolor=%23444444&ts=12&tts=12&width=1318&nt=0&thu=0&trc=0&show_legend=yes&show_axis_titles=yes&show_tooltip=yes&id=GDP&scale=left&co'
-df = pd.read_csv(url, index_col='DATE')
-df.index = pd.to_datetime(df.index)
-df = df.sort_index()
+# Load historical GDP data from the local FRED series store
+df = load_series('GDP')
 
 
 # Convert quarterly data to annual data
@@ -23,27 +24,32 @@ plt.plot(df.index, df['GDP_growth_rate'])
 plt.title('US GDP Growth Rate')
 plt.xlabel('Year')
 plt.ylabel('Growth Rate (%)')
-plt.show()
+save_figure('_main-gdp-growth-rate')
 
 # Calculate the mean and standard deviation of the GDP growth rate
 mean_growth_rate = df['GDP_growth_rate'].mean()
 std_dev_growth_rate = df['GDP_growth_rate'].std()
 
-# Simulate the GDP growth rate until 2100
+# Simulate the GDP growth rate until 2100 over many paths, streamed through
+# bounded-memory accumulators instead of keeping every path. With
+# USECON_ENSEMBLE_DIR set, every path is also written there for later analysis
 num_years = 2100 - df.index.year[-1]
-simulated_growth_rate = np.random.normal(mean_growth_rate, std_dev_growth_rate, num_years)
-
-# Combine historical and simulated data
+risk = stream_gaussian(mean_growth_rate, std_dev_growth_rate, num_years, n_paths=2000000,
+                       start_level=df['GDP'][-1],
+                       sink=ensemble_writer('_main-gaussian', num_years, first_year=df.index.year[-1] + 1))
+print('Probability of a recession in the next 10 years: {:.3f}'.format(risk.recession_probability(10)))
+print('Probability of a recession in the next {} years: {:.3f}'.format(num_years, risk.recession_probability(num_years)))
+
+# Percentile bands and min/max envelope of the simulated GDP level for each
+# future year, read from the accumulators' sketches
 simulated_index = pd.date_range(start=df.index[-1] + pd.DateOffset(years=1), end='2100-12-31', freq='A')
-simulated_df = pd.DataFrame({'GDP_growth_rate': simulated_growth_rate}, index=simulated_index)
-combined_df = pd.concat([df, simulated_df])
-
-# Calculate the cumulative GDP growth
-cumulative_growth = (1 + combined_df['GDP_growth_rate'] / 100).cumprod() * df['GDP'][-1]
+bands = fan_bands(risk)
 
-# Plot the cumulative GDP growth
-plt.plot(combined_df.index, cumulative_growth)
+# Plot historical GDP followed by the simulated fan chart
+plt.plot(df.index, df['GDP'], color='black', label='Historical')
+fan_chart(plt.gca(), simulated_index, bands)
 plt.title('SIMULATED US GDP Growth Rate') 
 plt.xlabel('Year')
 plt.ylabel('GDP (trillions of dollars)')
-plt.show()
+plt.legend()
+save_figure('_main-simulated-gdp')
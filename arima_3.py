@@ -3,43 +3,15 @@ import numpy as np
 import matplotlib.pyplot as plt
 from statsmodels.tsa.statespace.sarimax import SARIMAX
 from statsmodels.graphics.tsaplots import plot_acf, plot_pacf
+from usecon.align import align, to_frame
+from usecon.model_store import ModelStore
+from usecon.render import save_figure
 
-# Load historical GDP data from FRED database
-url = 'https://fred.stlouisfed.org/graph/fredgraph.csv?bgcolor=%23e1e9f0&chart_type=line&drp=0&fo=open%20sans&graph_bgcolor=%23ffffff&height=450&mode=fred&recession_bars=on&txtcolor=%23444444&ts=12&tts=12&width=1318&nt=0&thu=0&trc=0&show_legend=yes&show_axis_titles=yes&show_tooltip=yes&id=GDP&scale=left&co'
-gdp = pd.read_csv(url, index_col='DATE', parse_dates=['DATE'], infer_datetime_format=True)
-gdp = gdp.resample('A').last()
-
-# Load exogenous variable data
-url_inflation = 'https://fred.stlouisfed.org/graph/fredgraph.csv?id=FPCPITOTLZGUSA'
-inflation = pd.read_csv(url_inflation, index_col='DATE', parse_dates=['DATE'], infer_datetime_format=True)
-inflation = inflation.resample('A').last()
-
-# Select relevant columns and rename them
-inflation = inflation[['FPCPITOTLZGUSA']]
-inflation.columns = ['inflation_rate']
-
-
-url_interest = 'https://fred.stlouisfed.org/graph/fredgraph.csv?id=FEDFUNDS'
-interest = pd.read_csv(url_interest, index_col='DATE', parse_dates=['DATE'], infer_datetime_format=True)
-interest = interest.resample('A').last()
-
-# Select relevant columns and rename them
-interest = interest[['FEDFUNDS']]
-interest.columns = ['interest_rate']
-
-
-url_population = 'https://fred.stlouisfed.org/graph/fredgraph.csv?id=POPTHM'
-population = pd.read_csv(url_population, index_col='DATE', parse_dates=['DATE'], infer_datetime_format=True)
-population = population.resample('A').last()
-
-# Select relevant columns and rename them
-population = population[['POPTHM']]
-population.columns = ['population']
-
-
-# Merge GDP data with exogenous variable data
-data = pd.concat([gdp, inflation, interest, population], axis=1, join='inner')
-data.columns = ['gdp', 'inflation', 'interest', 'population']
+# Annual GDP and exogenous variables: the last observation of each year,
+# over the years every series covers
+data = to_frame(align({'gdp': ('GDP', 'last'), 'inflation': ('FPCPITOTLZGUSA', 'last'),
+                       'interest': ('FEDFUNDS', 'last'), 'population': ('POPTHM', 'last')},
+                      frequency='annual', how='inner'))
 
 # Calculate the annual percentage change in GDP
 data['gdp_growth_rate'] = data['gdp'].pct_change(periods=1) * 100
@@ -51,7 +23,7 @@ data = data.iloc[1:]
 fig, ax = plt.subplots(figsize=(12, 8))
 plot_acf(data['gdp_growth_rate'], ax=ax)
 plot_pacf(data['gdp_growth_rate'], ax=ax)
-plt.show()
+save_figure('arima_3-growth-acf-pacf')
 
 # Based on the ACF and PACF plots, we can set p=1 and q=0
 p = 1
@@ -59,9 +31,11 @@ q = 0
 
 
 
-# Fit a SARIMAX model to the historical GDP growth rate data with exogenous variables
+# Fit a SARIMAX model to the historical GDP growth rate data with exogenous variables;
+# the model store skips the fit when the data is unchanged and warm-starts it
+# from the stored parameters when only new years were added
 model = SARIMAX(data['gdp_growth_rate'], exog=data[['inflation', 'interest', 'population']], order=(p, 1, q))
-model_fit = model.fit()
+model_fit, _ = ModelStore().fit_statespace(model)
 
 
 # Generate a new set of dates from 2021 to 2100
@@ -95,7 +69,7 @@ ax.plot(future_years, forecasted_gdp_growth_rate, color='red')
 ax.set_xlabel('Year')
 ax.set_ylabel('GDP Growth Rate (%)')
 ax.set_title('Forecasted GDP Growth Rates')
-plt.show()
+save_figure('arima_3-forecast-growth-rate')
 
 # Calculate the forecasted GDP values for the years 2021-2100
 forecasted_gdp = data['gdp'].iloc[-1] * (1 + forecasted_gdp_growth_rate / 100).cumprod()
@@ -106,4 +80,4 @@ ax.plot(future_years, forecasted_gdp, color='red')
 ax.set_xlabel('Year')
 ax.set_ylabel('GDP ($)')
 ax.set_title('Forecasted GDP Values')
-plt.show()
+save_figure('arima_3-forecast-gdp')
@@ -0,0 +1,48 @@
+import warnings
+
+from sklearn.mixture import GaussianMixture
+from statsmodels.tsa.statespace.sarimax import SARIMAX
+
+from usecon.hmm import RegimeHMM
+from usecon.hsmm import RegimeHSMM
+
+from .common import SERIES_LENGTHS, regime_growth
+
+
+# EM fits run a fixed number of iterations (tol=0), so a timing measures the
+# same amount of work on every commit instead of wherever convergence stops
+EM_ITERATIONS = 10
+
+
+class Fit:
+    """Model fits on synthetic regime-switching growth, by series length."""
+
+    params = [SERIES_LENGTHS]
+    param_names = ['n_obs']
+    # One fit per sample: the larger fits take seconds each
+    number = 1
+    repeat = (1, 5, 30.0)
+    timeout = 600
+
+    def setup(self, n_obs):
+        self.growth = regime_growth(n_obs)
+        self.X = self.growth.reshape(-1, 1)
+
+    def time_gmm(self, n_obs):
+        GaussianMixture(2, max_iter=EM_ITERATIONS, tol=0, random_state=0).fit(self.X)
+
+    def time_hmm(self, n_obs):
+        RegimeHMM(2, n_iter=EM_ITERATIONS, tol=0, n_restarts=4, random_state=0).fit(self.X)
+
+    def time_hsmm(self, n_obs):
+        RegimeHSMM(2, n_iter=EM_ITERATIONS, tol=0, random_state=0).fit(self.X)
+
+    def time_arima(self, n_obs):
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            SARIMAX(self.growth, order=(1, 0, 1), trend='c').fit(disp=False)
+
+    def time_sarimax(self, n_obs):
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            SARIMAX(self.growth, order=(1, 0, 1), seasonal_order=(1, 0, 1, 4), trend='c').fit(disp=False)
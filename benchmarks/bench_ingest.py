@@ -0,0 +1,70 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from usecon.fred_store import SeriesStore, parse_fred_csv
+from usecon.synthetic import MacroProcess
+
+from .common import SERIES_LENGTHS, remove_dir, synthetic_source
+
+
+class Ingest:
+    """FRED CSV parsing, the local series store and the scripts' annual resample."""
+
+    params = [SERIES_LENGTHS]
+    param_names = ['n_obs']
+
+    def setup(self, n_obs):
+        # Daily observations, like DFF; 30000 days stay inside pandas' date range
+        self.root = synthetic_source(n_obs)
+        with open(os.path.join(self.root, 'GDP.csv')) as f:
+            self.text = f.read()
+        self.store = SeriesStore(root=os.path.join(self.root, 'store'), source=self.root, offline=False)
+        self.store.refresh('GDP')
+        self.frame = self.store.load('GDP')
+
+    def teardown(self, n_obs):
+        remove_dir(self.root)
+
+    def time_parse_csv(self, n_obs):
+        parse_fred_csv(self.text)
+
+    def time_read_csv_pandas(self, n_obs):
+        # What the scripts did before the store: pd.read_csv + to_datetime
+        frame = pd.read_csv(os.path.join(self.root, 'GDP.csv'))
+        pd.to_datetime(frame['DATE'])
+
+    def time_store_load_arrays(self, n_obs):
+        self.store.load_arrays('GDP')
+
+    def time_store_load(self, n_obs):
+        self.store.load('GDP')
+
+    def time_resample_annual(self, n_obs):
+        self.frame.resample('A').last()
+
+    def time_resample_quarterly_mean(self, n_obs):
+        self.frame.resample('QS').mean()
+
+
+class Growth:
+    """Annual growth rates from a level series: pandas as in the scripts, and numpy as in the CLI."""
+
+    params = [SERIES_LENGTHS]
+    param_names = ['n_obs']
+
+    def setup(self, n_obs):
+        chunk = MacroProcess(frequency='daily', seed=0).chunk(n_obs)
+        self.dates, self.values = chunk.dates, chunk.columns['gdp'][:, 0]
+        self.frame = pd.DataFrame({'GDP': self.values}, index=pd.DatetimeIndex(self.dates, name='DATE'))
+
+    def time_pandas(self, n_obs):
+        annual = self.frame.resample('A').last()
+        annual['GDP'].pct_change(periods=1) * 100
+
+    def time_numpy(self, n_obs):
+        years = self.dates.astype('datetime64[Y]')
+        last = np.flatnonzero(np.r_[years[1:] != years[:-1], True])
+        annual = self.values[last]
+        (annual[1:] / annual[:-1] - 1) * 100
@@ -0,0 +1,77 @@
+import numpy as np
+
+from usecon.hsmm import _draw_spells, simulate_semi_markov
+from usecon.simulation import TransitionSampler, simulate_gaussian, simulate_regimes
+from usecon.streaming import stream_gaussian, stream_regimes
+
+from .common import PATH_COUNTS
+
+TRANSMAT = np.array([[0.9, 0.1], [0.5, 0.5]])
+MEANS = np.array([3.5, -1.5])
+STDS = np.array([1.8, 2.2])
+# Spell-length pmfs for the semi-Markov simulator: geometric-like expansions, short recessions
+DURATIONS = np.vstack([np.full(30, 1 / 30), np.r_[0.6, 0.3, 0.1, np.zeros(27)]])
+
+
+class Simulate:
+    """Path simulators, by horizon and number of paths."""
+
+    params = [[20, 80], PATH_COUNTS]
+    param_names = ['n_years', 'n_paths']
+    number = 1
+    repeat = (1, 5, 30.0)
+    timeout = 600
+
+    def time_simulate_gaussian(self, n_years, n_paths):
+        simulate_gaussian(6.3, 3.0, n_years, n_paths=n_paths, rng=0)
+
+    def time_simulate_regimes(self, n_years, n_paths):
+        simulate_regimes(TRANSMAT, MEANS, STDS, n_years, n_paths=n_paths, initial_state=0, rng=0)
+
+    def time_simulate_semi_markov(self, n_years, n_paths):
+        simulate_semi_markov(np.array([[0.0, 1.0], [1.0, 0.0]]), DURATIONS, MEANS, STDS, n_years, n_paths=n_paths,
+                             initial_state=0, rng=0)
+
+    def time_stream_gaussian(self, n_years, n_paths):
+        stream_gaussian(6.3, 3.0, n_years, n_paths, seed=0)
+
+    def time_stream_regimes(self, n_years, n_paths):
+        stream_regimes(TRANSMAT, MEANS, STDS, n_years, n_paths, initial_state=0, seed=0)
+
+    def peakmem_simulate_gaussian(self, n_years, n_paths):
+        simulate_gaussian(6.3, 3.0, n_years, n_paths=n_paths, rng=0)
+
+    def peakmem_stream_gaussian(self, n_years, n_paths):
+        stream_gaussian(6.3, 3.0, n_years, n_paths, seed=0)
+
+
+class SpellDraws:
+    """Accuracy check: remaining-spell draws against a brute-force conditional draw.
+
+    For a spell already `elapsed` years old the remaining length is d - elapsed
+    with d drawn from the regime's duration pmf and conditioned on d >= elapsed
+    (0: the spell ended with the data). The brute-force version draws d and
+    rejects d < elapsed; the tracked value is the largest gap between the two
+    pmfs, which should stay at sampling noise (~1e-3).
+    """
+
+    params = [[1, 2, 3, 5]]
+    param_names = ['elapsed']
+    unit = 'max |pmf difference|'
+
+    def track_remaining_spell_error(self, elapsed):
+        n = 400000
+        rng = np.random.default_rng(0)
+        cdf = np.cumsum(DURATIONS, axis=1)
+        worst = 0.0
+        for state, pmf in enumerate(DURATIONS):
+            durations = rng.choice(len(pmf), size=n, p=pmf / pmf.sum()) + 1
+            durations = durations[durations >= elapsed]
+            if not len(durations):
+                continue
+            brute = np.bincount(durations - elapsed, minlength=len(pmf)) / len(durations)
+            remaining = _draw_spells(TransitionSampler(DURATIONS), cdf, np.full(n, state), np.full(n, elapsed),
+                                     rng.random(n))
+            drawn = np.bincount(remaining, minlength=len(pmf)) / n
+            worst = max(worst, float(np.abs(brute - drawn).max()))
+        return worst
@@ -0,0 +1,27 @@
+import shutil
+import tempfile
+
+import numpy as np
+
+from usecon.synthetic import MacroProcess, write_panel
+
+# Sizes shared by the suites: ~300 quarters is today's FRED GDP history
+SERIES_LENGTHS = [300, 3000, 30000]
+PATH_COUNTS = [1000, 100000, 1000000]
+
+
+def regime_growth(n, seed=0):
+    # Quarterly GDP growth in percent from the synthetic regime-switching economy
+    gdp = MacroProcess(seed=seed).chunk(n + 1).columns['gdp'][:, 0]
+    return np.diff(gdp) / gdp[:-1] * 100
+
+
+def synthetic_source(n, frequency='daily', seed=0):
+    # A directory of fredgraph-style CSVs (GDP, DFF, ...) for SeriesStore to ingest
+    root = tempfile.mkdtemp(prefix='usecon-bench-')
+    write_panel(root, n, frequency=frequency, fmt='csv', seed=seed)
+    return root
+
+
+def remove_dir(path):
+    shutil.rmtree(path, ignore_errors=True)
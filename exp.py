@@ -2,12 +2,13 @@ import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 from sklearn.mixture import GaussianMixture
+from usecon.model_store import ModelStore
+from usecon.fred_store import load_series
+from usecon.simulation import simulate_regimes
+from usecon.render import fan_bands, fan_chart, save_figure
 
-# Load historical GDP data from FRED database
-url = 'https://fred.stlouisfed.org/graph/fredgraph.csv?bgcolor=%23e1e9f0&chart_type=line&drp=0&fo=open%20sans&graph_bgcolor=%23ffffff&height=450&mode=fred&recession_bars=on&txtcolor=%23444444&ts=12&tts=12&width=1318&nt=0&thu=0&trc=0&show_legend=yes&show_axis_titles=yes&show_tooltip=yes&id=GDP&scale=left&co'
-df = pd.read_csv(url, index_col='DATE')
-df.index = pd.to_datetime(df.index)
-df = df.sort_index()
+# Load historical GDP data from the local FRED series store
+df = load_series('GDP')
 
 # Convert quarterly data to annual data
 df = df.resample('A').last()
@@ -22,8 +23,10 @@ df = df.iloc[1:]
 model = GaussianMixture(n_components=2)
 
 # Estimate the mean and standard deviation of the GDP growth rate in each state
+# (reusing the stored fit when the data has not changed)
 X = np.array(df['GDP_growth_rate']).reshape(-1, 1)
-model.fit(X)
+store = ModelStore()
+model, _ = store.fit_estimator(model, X, name='GDP_growth_rate')
 mean_expansion, std_expansion = model.means_[0][0], np.sqrt(model.covariances_[0][0])
 mean_recession, std_recession = model.means_[1][0], np.sqrt(model.covariances_[1][0])
 
@@ -32,32 +35,30 @@ startprob = np.array([0.9, 0.1])
 transmat = np.array([[0.95, 0.05], [0.1, 0.9]])
 model.weights_ = startprob
 model.transmat_ = transmat
-model.fit(X)
 
-# Simulate the GDP growth rate until 2100
+# Calculate the cumulative historical GDP growth
+cumulative_growth = (1 + df['GDP_growth_rate'] / 100).cumprod()
+
+# Simulate the GDP growth rate until 2100 over many paths at once, starting
+# every path from the last historical regime
 num_years = 2100 - df.index.year[-1]
-simulated_growth_rate = []
+num_paths = 100000
 state_sequence = model.predict(X)[-1]
+simulation = simulate_regimes(model.transmat_, [mean_expansion, mean_recession], [std_expansion, std_recession],
+                              num_years, n_paths=num_paths, initial_state=state_sequence,
+                              start_level=cumulative_growth[-1], keep_paths=True)
 
-for i in range(num_years):
-    if state_sequence == 0:
-        simulated_growth_rate.append(np.random.normal(mean_expansion, std_expansion))
-    else:
-        simulated_growth_rate.append(np.random.normal(mean_recession, std_recession))
-    state_sequence = np.random.choice([0, 1], p=model.transmat_[state_sequence])
-
-# Combine historical and simulated data
+# Fan chart of the simulated cumulative growth: percentile bands and the
+# min/max envelope are taken over all paths before anything is drawn
 simulated_index = pd.date_range(start=df.index[-1] + pd.DateOffset(years=1), end='2100-12-31', freq='A')
-simulated_df = pd.DataFrame({'GDP_growth_rate': simulated_growth_rate}, index=simulated_index)
-combined_df = pd.concat([df, simulated_df])
-
-# Calculate the cumulative GDP growth
-cumulative_growth = (1 + combined_df['GDP_growth_rate'] / 100).cumprod()
+bands = fan_bands(simulation.log_levels, start_level=cumulative_growth[-1])
 
 # Plot the simulated GDP growth
 fig, ax = plt.subplots(figsize=(12, 8))
-ax.plot(cumulative_growth)
+ax.plot(cumulative_growth, color='black', label='Historical')
+fan_chart(ax, simulated_index, bands)
 ax.set_xlabel('Year')
 ax.set_ylabel('Cumulative GDP growth')
 ax.set_title('Simulated GDP growth')
-plt.show()
+ax.legend()
+save_figure('exp-simulated-gdp-growth')
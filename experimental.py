@@ -1,73 +1,57 @@
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
-from hmmlearn.hmm import GaussianHMM
-
-
-
-# Load historical GDP data from FRED database
-url = 'https://fred.stlouisfed.org/graph/fredgraph.csv?bgcolor=%23e1e9f0&chart_type=line&drp=0&fo=open%20sans&graph_bgcolor=%23ffffff&height=450&mode=fred&recession_bars=on&txtcolor=%23444444&ts=12&tts=12&width=1318&nt=0&thu=0&trc=0&show_legend=yes&show_axis_titles=yes&show_tooltip=yes&id=GDP&scale=left&co'
-df = pd.read_csv(url, index_col='DATE')
-df.index = pd.to_datetime(df.index)
-df = df.sort_index()
-
-# Convert quarterly data to annual data
-df = df.resample('A').last()
-
-# Calculate the annual percentage change in GDP
-df['GDP_growth_rate'] = df['GDP'].pct_change(periods=1) * 100
-
-# Remove the first row containing NaN
-df = df.iloc[1:]
-
-# Fit a Hidden Markov Model to the historical GDP growth rate data
-model = GaussianHMM(n_components=4)  # modified from n_components=2
-
-# Estimate the mean and standard deviation of the GDP growth rate in each state
-X = np.array(df['GDP_growth_rate']).reshape(-1, 1)
-model.fit(X)
-mean_states, std_states = model.means_, np.sqrt(model.covars_)
-
-# Estimate the transition probabilities between the states
-startprob = np.ones(4) / 4  # equal probability of starting in any state
-transmat = np.array([
-    [0.6, 0.2, 0.1, 0.1],
-    [0.1, 0.6, 0.2, 0.1],
-    [0.1, 0.1, 0.6, 0.2],
-    [0.2, 0.1, 0.2, 0.5]
-])  # arbitrary transition probabilities, should be tuned
-model.startprob_ = startprob
-model.transmat_ = transmat
-model.fit(X)
-
-# Simulate the GDP growth rate until 2100
-num_years = 2100 - df.index.year[-1]
-simulated_growth_rate = []
-state_sequence = model.predict(X)[-1]
-
-for i in range(num_years):
-    if state_sequence == 0:
-        simulated_growth_rate.append(np.random.normal(mean_states[0], std_states[0]))
-    elif state_sequence == 1:
-        simulated_growth_rate.append(np.random.normal(mean_states[1], std_states[1]))
-    elif state_sequence == 2:
-        simulated_growth_rate.append(np.random.normal(mean_states[2], std_states[2]))
-    else:
-        simulated_growth_rate.append(np.random.normal(mean_states[3], std_states[3]))
-    state_sequence = np.random.choice(range(4), p=model.transmat_[state_sequence])
-
-# Combine historical and simulated data
-simulated_index = pd.date_range(start=df.index[-1] + pd.DateOffset(years=1), end='2100-12-31', freq='A')
-simulated_df = pd.DataFrame({'GDP_growth_rate': simulated_growth_rate}, index=simulated_index)
-combined_df = pd.concat([df, simulated_df])
-
-# Calculate the cumulative GDP growth
-cumulative_growth = (1 + combined_df['GDP_growth_rate'] / 100).cumprod()
-
-# Plot the simulated GDP growth
-fig, ax = plt.subplots(figsize=(12, 8))
-ax.plot(cumulative_growth)
-ax.set_xlabel('Year')
-ax.set_ylabel('Cumulative GDP growth')
-ax.set_title('Simulated GDP growth')
-plt.show()
+from usecon.hmm_selection import select_hmm
+from usecon.fred_store import load_series
+from usecon.simulation import simulate_regimes
+from usecon.render import fan_bands, fan_chart, save_figure
+
+# The regime selection fits on a process pool, whose workers may re-import
+# this script, so everything runs under the main guard
+if __name__ == '__main__':
+    # Load historical GDP data from the local FRED series store
+    df = load_series('GDP')
+
+    # Convert quarterly data to annual data
+    df = df.resample('A').last()
+
+    # Calculate the annual percentage change in GDP
+    df['GDP_growth_rate'] = df['GDP'].pct_change(periods=1) * 100
+
+    # Remove the first row containing NaN
+    df = df.iloc[1:]
+
+    # Pick the number of regimes (2 to 6) by BIC, with EM restarted many times
+    # for each candidate instead of once from an arbitrary transition matrix
+    X = np.array(df['GDP_growth_rate']).reshape(-1, 1)
+    selection = select_hmm(X, k_range=range(2, 7), criterion='bic', random_state=0)
+    print(selection.table)
+    model = selection.model
+    mean_states, std_states = model.means_, np.sqrt(model.covars_)
+
+    # Calculate the cumulative historical GDP growth
+    cumulative_growth = (1 + df['GDP_growth_rate'] / 100).cumprod()
+
+    # Simulate the GDP growth rate until 2100 over many paths at once, starting
+    # every path from the last historical regime
+    num_years = 2100 - df.index.year[-1]
+    num_paths = 100000
+    state_sequence = model.predict(X)[-1]
+    simulation = simulate_regimes(model.transmat_, mean_states.ravel(), std_states.ravel(), num_years,
+                                  n_paths=num_paths, initial_state=state_sequence,
+                                  start_level=cumulative_growth[-1], keep_paths=True)
+
+    # Fan chart of the simulated cumulative growth: percentile bands and the
+    # min/max envelope are taken over all paths before anything is drawn
+    simulated_index = pd.date_range(start=df.index[-1] + pd.DateOffset(years=1), end='2100-12-31', freq='A')
+    bands = fan_bands(simulation.log_levels, start_level=cumulative_growth[-1])
+
+    # Plot the simulated GDP growth
+    fig, ax = plt.subplots(figsize=(12, 8))
+    ax.plot(cumulative_growth, color='black', label='Historical')
+    fan_chart(ax, simulated_index, bands)
+    ax.set_xlabel('Year')
+    ax.set_ylabel('Cumulative GDP growth')
+    ax.set_title('Simulated GDP growth')
+    ax.legend()
+    save_figure('experimental-simulated-gdp-growth')
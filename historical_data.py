@@ -3,87 +3,60 @@ import numpy as np
 import matplotlib.pyplot as plt
 from statsmodels.graphics.tsaplots import plot_acf, plot_pacf
 from statsmodels.tsa.seasonal import seasonal_decompose
-from statsmodels.tsa.arima.model import ARIMA
-#import auto ARIMA
-from pmdarima import auto_arima
-
-
-
-
-# Load historical GDP data from FRED database
-url = 'https://fred.stlouisfed.org/graph/fredgraph.csv?bgcolor=%23e1e9f0&chart_type=line&drp=0&fo=open%20sans&graph_bgcolor=%23ffffff&height=450&mode=fred&recession_bars=on&txtcolor=%23444444&ts=12&tts=12&width=1318&nt=0&thu=0&trc=0&show_legend=yes&show_axis_titles=yes&show_tooltip=yes&id=GDP&scale=left&co'
-df = pd.read_csv(url, index_col='DATE')
-df.index = pd.to_datetime(df.index)
-df = df.sort_index()
-df.columns = ['gdp']
-
-# Load exogenous variables data
-inflation_url = 'https://fred.stlouisfed.org/graph/fredgraph.csv?bgcolor=%23e1e9f0&chart_type=line&drp=0&fo=open%20sans&graph_bgcolor=%23ffffff&height=450&mode=fred&recession_bars=on&txtcolor=%23444444&ts=12&tts=12&width=1318&nt=0&thu=0&trc=0&show_legend=yes&show_axis_titles=yes&show_tooltip=yes&id=FPCPITOTLZGUSA&scale=left&cos'
-inflation_df = pd.read_csv(inflation_url, index_col='DATE')
-inflation_df.index = pd.to_datetime(inflation_df.index)
-inflation_df.columns = ['inflation_rate']
-
-interest_rate_url = 'https://fred.stlouisfed.org/graph/fredgraph.csv?bgcolor=%23e1e9f0&chart_type=line&drp=0&fo=open%20sans&graph_bgcolor=%23ffffff&height=450&mode=fred&recession_bars=on&txtcolor=%23444444&ts=12&tts=12&width=1318&nt=0&thu=0&trc=0&show_legend=yes&show_axis_titles=yes&show_tooltip=yes&id=DFF&scale=left&cos'
-interest_rate_df = pd.read_csv(interest_rate_url, index_col='DATE')
-interest_rate_df.index = pd.to_datetime(interest_rate_df.index)
-interest_rate_df.columns = ['interest_rate']
-
-population_url = 'https://fred.stlouisfed.org/graph/fredgraph.csv?bgcolor=%23e1e9f0&chart_type=line&drp=0&fo=open%20sans&graph_bgcolor=%23ffffff&height=450&mode=fred&recession_bars=on&txtcolor=%23444444&ts=12&tts=12&width=1318&nt=0&thu=0&trc=0&show_legend=yes&show_axis_titles=yes&show_tooltip=yes&id=POPTHM&scale=left&cos'
-population_df = pd.read_csv(population_url, index_col='DATE')
-population_df.index = pd.to_datetime(population_df.index)
-population_df.columns = ['population']
-
-# Merge dataframes
-df = df.merge(inflation_df, left_index=True, right_index=True)
-df = df.merge(interest_rate_df, left_index=True, right_index=True)
-df = df.merge(population_df, left_index=True, right_index=True)
-
-# Plot GDP data along with exogenous variables on a single plot
-fig, ax = plt.subplots(2, 2, figsize=(12, 8))
-ax[0, 0].plot(df['gdp'])
-ax[0, 0].set_title('GDP')
-ax[0, 1].plot(df['inflation_rate'])
-ax[0, 1].set_title('Inflation Rate')
-ax[1, 0].plot(df['interest_rate'])
-ax[1, 0].set_title('Interest Rate')
-ax[1, 1].plot(df['population'])
-ax[1, 1].set_title('Population')
-plt.tight_layout()
-plt.show()
-
-# Use auto ARIMA to find the best ARIMA model
-values = auto_arima(df['gdp'], exogenous=df[['inflation_rate', 'interest_rate', 'population']], seasonal=True, m=4)
-p, d, q = values.order
-# get order values from summary
-print(values)
-#print(summary)
-
-
-
-# Fit ARIMA model to GDP data
-model = ARIMA(df['gdp'], order=(p,d,q))
-result = model.fit()
-
-
-
-
-# Simulate 80 years of GDP data
-
-# Create a dataframe with 80 years of dates
-dates = pd.date_range(start='2020-01-01', end='2100-01-01', freq='AS')
-dates = dates[:-1]
-dates_df = pd.DataFrame(index=dates)
-
-# Merge dates dataframe with exogenous variables
-dates_df = dates_df.merge(inflation_df, left_index=True, right_index=True)
-dates_df = dates_df.merge(interest_rate_df, left_index=True, right_index=True)
-dates_df = dates_df.merge(population_df, left_index=True, right_index=True)
-
-# Create a dataframe with simulated GDP data
-simulated_df = pd.DataFrame(index=dates)
-simulated_df['gdp'] = result.forecast(steps=80, exog=dates_df)
-
-# Plot simulated GDP data
-plt.plot(simulated_df['gdp'])
-plt.title('Simulated GDP')
-plt.show()
+from usecon.auto_arima import auto_arima
+from usecon.model_store import ModelStore
+from usecon.align import align, to_frame
+from usecon.episodes import extract_episodes
+from usecon.render import Panel, line_panel, render_panels, save_figure
+
+# The order search fits candidates on a process pool, whose workers may
+# re-import this script, so everything runs under the main guard
+if __name__ == '__main__':
+    # Historical GDP data and the exogenous variables from the local FRED
+    # series store, on the same quarters: daily rates and monthly population
+    # averaged per quarter, annual inflation as of each quarter. Inner merges
+    # on exact dates kept only the days all four shared
+    df = to_frame(align({'gdp': ('GDP', 'last'), 'inflation_rate': ('FPCPITOTLZGUSA', 'asof'),
+                         'interest_rate': ('DFF', 'mean'), 'population': ('POPTHM', 'mean')},
+                        frequency='quarterly', how='inner'))
+
+    # Plot GDP data along with exogenous variables on a single 2x2 figure, each
+    # panel drawn in its own worker process
+    render_panels([Panel(line_panel, (df['gdp'],), 'GDP'),
+                   Panel(line_panel, (df['inflation_rate'],), 'Inflation Rate'),
+                   Panel(line_panel, (df['interest_rate'],), 'Interest Rate'),
+                   Panel(line_panel, (df['population'],), 'Population')], 'historical_data-gdp-and-exog')
+
+    # Historical recessions as two or more consecutive quarters of falling GDP
+    growth = df['gdp'].pct_change().to_numpy()[1:] * 100
+    episodes = extract_episodes(growth, frequency='quarterly')
+    for start, duration, depth in zip(episodes.start, episodes.duration, episodes.depth):
+        print('Recession from %s: %d quarters, GDP down %.1f%%' % (df.index[1 + start].date(), duration, depth))
+
+    # Stepwise seasonal ARIMA search with the exogenous regressors; the winning
+    # model comes back already fitted, so there is no separate refit. Candidates
+    # fitted on an earlier run are reused from (or warm-started by) the model store
+    search = auto_arima(df['gdp'], exog=df[['inflation_rate', 'interest_rate', 'population']], seasonal=True, m=4,
+                        store=ModelStore())
+    p, d, q = search.order
+    print(search.table.head(10))
+    result = search.result
+
+    # Simulate 80 years of GDP data, one quarter at a time like the model
+    horizon = 80 * 4
+    exog_columns = ['inflation_rate', 'interest_rate', 'population']
+
+    # Quarterly dates over the 80 years after the last observation, with the
+    # exogenous variables held at their last observed values
+    dates = pd.date_range(start=df.index[-1], periods=horizon + 1, freq='QS')[1:]
+    dates_df = pd.DataFrame(np.repeat(df[exog_columns].to_numpy()[-1:], horizon, axis=0), index=dates,
+                            columns=exog_columns)
+
+    # Create a dataframe with simulated GDP data
+    simulated_df = pd.DataFrame(index=dates)
+    simulated_df['gdp'] = np.asarray(result.forecast(steps=horizon, exog=dates_df))
+
+    # Plot simulated GDP data
+    plt.plot(simulated_df['gdp'])
+    plt.title('Simulated GDP')
+    save_figure('historical_data-simulated-gdp')
@@ -1,14 +1,14 @@
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
-import pymc3 as pm 
-import theano.tensor as tt
+import pymc3 as pm
+from usecon.bayes_hmm import build_regime_model, posterior_states
+from usecon.fred_store import load_series
+from usecon.simulation import simulate_regimes
+from usecon.render import fan_bands, fan_chart, save_figure
 
-# Load historical GDP data from FRED database
-url = 'https://fred.stlouisfed.org/graph/fredgraph.csv?bgcolor=%23e1e9f0&chart_type=line&drp=0&fo=open%20sans&graph_bgcolor=%23ffffff&height=450&mode=fred&recession_bars=on&txtcolor=%23444444&ts=12&tts=12&width=1318&nt=0&thu=0&trc=0&show_legend=yes&show_axis_titles=yes&show_tooltip=yes&id=GDP&scale=left&co'
-df = pd.read_csv(url, index_col='DATE')
-df.index = pd.to_datetime(df.index)
-df = df.sort_index()
+# Load historical GDP data from the local FRED series store
+df = load_series('GDP')
 
 # Convert quarterly data to annual data
 df = df.resample('A').last()
@@ -24,60 +24,44 @@ plt.plot(df.index, df['GDP_growth_rate'])
 plt.title('US GDP Growth Rate')
 plt.xlabel('Year')
 plt.ylabel('Growth Rate (%)')
-plt.show()
+save_figure('main-gdp-growth-rate')
 
 # Define the number of states for the HMM
 n_states = 3
+growth = df['GDP_growth_rate'].values
 
-# Define the prior probabilities for the initial state
-p_initial = np.array([0.6, 0.2, 0.2])
-
-# Define the transition probabilities between states
-p_transitions = np.array([[0.8, 0.1, 0.1],
-                          [0.2, 0.6, 0.2],
-                          [0.1, 0.1, 0.8]])
-
-# Define the means and standard deviations for each state
-means = np.array([1.5, 2.5, 3.5])
-std_devs = np.array([0.5, 1.0, 1.5])
-
-# Define the HMM model
-with pm.Model() as model:
-    # Define the latent state variable
-    states = pm.Categorical('states', p=p_initial, shape=len(df) + 1)
-    print(states[:-1])
-
-    # Define the observed variable for the GDP growth rate
-    obs = pm.Normal('obs', mu=tt.switch(states[:-1] < n_states, means[states[:-1]], np.nan),
-                    sd=tt.switch(states[:-1] < n_states, std_devs[states[:-1]], np.nan),
-                    observed=df['GDP_growth_rate'].values)
-
-    # Define the transition probabilities
-    transitions = pm.Deterministic('transitions', p_transitions[states[:-1], :, np.newaxis][:-1])
-    
-    # Run the HMM sampler
+# The hidden states are summed out of the likelihood with the forward
+# algorithm, so NUTS only samples the regime means, volatilities and
+# transition probabilities
+model = build_regime_model(growth, n_states)
+with model:
     trace = pm.sample(2000, tune=1000, cores=2, target_accept=0.95)
 
-
-    
-
-# Extract the simulated GDP growth rate from the trace
-simulated_growth_rate = trace['obs'][-1, :]
-
-# Combine historical and simulated data
+# Recover the regimes afterwards: one forward-filtering backward-sampling
+# path per posterior draw
+state_paths, regime_probabilities = posterior_states(trace, growth)
+for k in range(n_states):
+    plt.plot(df.index, regime_probabilities[:, k], label='Regime %d' % k)
+plt.title('Posterior Regime Probabilities')
+plt.xlabel('Year')
+plt.ylabel('Probability')
+plt.legend()
+save_figure('main-regime-probabilities')
+
+# Simulate future growth with the posterior mean parameters, starting from
+# the regime distribution one year after the last observation
+means = trace['means'].mean(axis=0)
+stds = trace['sigmas'].mean(axis=0)
+transmat = trace['transmat'].mean(axis=0)
+next_regime = regime_probabilities[-1] @ transmat
 simulated_index = pd.date_range(start=df.index[-1] + pd.DateOffset(years=1), end='2100-12-31', freq='A')
-simulated_df = pd.DataFrame({'GDP_growth_rate': simulated_growth_rate}, index=simulated_index)
-combined_df = pd.concat([df, simulated_df])
-
-
-# Calculate the cumulative GDP growth
-cumulative_growth = (1 + combined_df['GDP_growth_rate'] / 100).cumprod()
+simulation = simulate_regimes(transmat, means, stds, len(simulated_index), n_paths=10000,
+                              startprob=next_regime, keep_paths=True)
 
-
-# Plot the simulated GDP growth rate
-plt.plot(simulated_df.index, simulated_df['GDP_growth_rate'])
-plt.title('SIMULATED US GDP Growth Rate')
+# Fan chart of the simulated GDP level relative to today
+fan_chart(plt.gca(), simulated_index, fan_bands(simulation.log_levels))
+plt.title('SIMULATED US GDP (relative to %d)' % df.index[-1].year)
 plt.xlabel('Year')
-plt.ylabel('Growth Rate (%)')
-plt.show()
-
+plt.ylabel('GDP level')
+plt.legend()
+save_figure('main-simulated-gdp')
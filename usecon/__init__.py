@@ -0,0 +1,6 @@
+"""US GDP growth simulation, regime models and forecasting.
+
+Submodules are imported on demand (e.g. `from usecon.parallel import
+parallel_gaussian`), so importing the package itself costs nothing.
+"""
+__version__ = '0.1.0'
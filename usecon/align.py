@@ -0,0 +1,193 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from .fred_store import default_store
+from .panel import FREQUENCIES, MacroPanel, to_periods
+
+# Per-series rules: reduce the observations inside each target period, or
+# 'asof' to take the latest observation dated in or before the period
+# (for series coarser than the target, e.g. annual inflation on quarters)
+RULES = ('mean', 'last', 'first', 'sum', 'min', 'max', 'asof')
+
+# What to do with target periods a series has no value for. 'ffill' and
+# 'interpolate' respect `limit` (periods carried forward / longest gap bridged)
+GAPS = ('nan', 'ffill', 'interpolate')
+
+# Aligned panels are cached here, keyed by the inputs' store files and the alignment spec
+DEFAULT_ALIGN_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'us-econ-growth', 'aligned')
+
+# Bump when the alignment itself changes, so old cache entries are ignored
+ALIGN_VERSION = 2
+
+_REDUCERS = {'sum': np.add, 'min': np.minimum, 'max': np.maximum}
+
+
+def reduce_by_period(periods, values, rule):
+    # One pass over date-sorted observations: NaNs dropped, group boundaries
+    # found with one comparison, every group reduced at once with reduceat.
+    # Returns the observed period numbers and one value per period.
+    valid = ~np.isnan(values)
+    periods, values = periods[valid], values[valid]
+    if not len(periods):
+        return periods, values
+    starts = np.flatnonzero(np.r_[True, periods[1:] != periods[:-1]])
+    ends = np.r_[starts[1:], len(values)]
+    if rule == 'first':
+        reduced = values[starts]
+    elif rule == 'last':
+        reduced = values[ends - 1]
+    elif rule == 'mean':
+        reduced = np.add.reduceat(values, starts) / (ends - starts)
+    else:
+        reduced = _REDUCERS[rule].reduceat(values, starts)
+    return periods[starts], reduced
+
+
+def _asof(obs_periods, obs_values, periods, limit):
+    # Latest observation in or before each target period, no older than limit periods
+    valid = ~np.isnan(obs_values)
+    obs_periods, obs_values = obs_periods[valid], obs_values[valid]
+    if not len(obs_values):
+        return np.full(len(periods), np.nan)
+    index = np.searchsorted(obs_periods, periods, side='right') - 1
+    found = index >= 0
+    if limit is not None:
+        found &= periods - obs_periods[np.maximum(index, 0)] <= limit
+    return np.where(found, obs_values[np.maximum(index, 0)], np.nan)
+
+
+def fill_gaps(column, gaps, limit=None):
+    """Fill NaNs in one aligned column; returns (column, filled mask)."""
+    missing = np.isnan(column)
+    if gaps == 'nan' or not missing.any() or missing.all():
+        return column, np.zeros(len(column), dtype=bool)
+    position = np.arange(len(column))
+    previous = np.maximum.accumulate(np.where(missing, -1, position))
+    if gaps == 'ffill':
+        fill = missing & (previous >= 0)
+        if limit is not None:
+            fill &= position - previous <= limit
+        out = column.copy()
+        out[fill] = column[previous[fill]]
+        return out, fill
+
+    # Linear interpolation across interior gaps of at most `limit` periods
+    following = np.minimum.accumulate(np.where(missing, len(column), position)[::-1])[::-1]
+    fill = missing & (previous >= 0) & (following < len(column))
+    if limit is not None:
+        fill &= following - previous - 1 <= limit
+    out = column.copy()
+    out[fill] = np.interp(position[fill], position[~missing], column[~missing])
+    return out, fill
+
+
+def _spec(spec, gaps, limit):
+    # name -> 'SERIES' | ('SERIES', rule) | ('SERIES', rule, gaps) | ('SERIES', rule, gaps, limit)
+    spec = (spec,) if isinstance(spec, str) else tuple(spec)
+    spec = spec + ('mean', gaps, limit)[len(spec) - 1:]
+    if spec[1] not in RULES:
+        raise ValueError('unknown rule %r (choose from %s)' % (spec[1], ', '.join(RULES)))
+    if spec[2] not in GAPS:
+        raise ValueError('unknown gap handling %r (choose from %s)' % (spec[2], ', '.join(GAPS)))
+    return spec
+
+
+def align_arrays(arrays, columns, frequency='quarterly', how='target', gaps='nan', limit=None, dtype=np.float64):
+    """Align raw (dates, values) series on one target-frequency period grid.
+
+    arrays maps series ID -> (sorted datetime64 dates, float values), as
+    returned by SeriesStore.load_arrays. columns maps output name -> series
+    spec (see align). Each series is reduced in one vectorised pass and
+    scattered onto the grid by period number, so a long daily series costs
+    one reduceat, not a pandas resample and merge. Returns a MacroPanel
+    whose columns are dtype (float64, or float32 to halve long panels).
+    """
+    if frequency not in FREQUENCIES:
+        raise ValueError('frequency must be one of %s' % ', '.join(FREQUENCIES))
+    specs = {name: _spec(spec, gaps, limit) for name, spec in columns.items()}
+    observed = {}
+    for name, (series_id, rule, _, _) in specs.items():
+        dates, values = arrays[series_id]
+        observed[name] = (to_periods(dates, frequency), np.asarray(values, dtype=np.float64))
+
+    # Rows: the span of the first column ('target'), of every column ('outer')
+    # or of all columns at once ('inner')
+    spans = []
+    for periods, values in observed.values():
+        valid = periods[~np.isnan(values)]
+        spans.append((valid[0], valid[-1]) if len(valid) else (0, -1))
+    if how == 'target':
+        first, last = spans[0]
+    elif how == 'outer':
+        first, last = min(s[0] for s in spans), max(s[1] for s in spans)
+    elif how == 'inner':
+        first, last = max(s[0] for s in spans), min(s[1] for s in spans)
+    else:
+        raise ValueError("how must be 'target', 'outer' or 'inner'")
+    periods = np.arange(first, max(first, last + 1), dtype=np.int64)
+
+    values = np.full((len(periods), len(specs)), np.nan, dtype=dtype, order='F')
+    filled = np.zeros(values.shape, dtype=bool, order='F')
+    for j, (name, (_, rule, column_gaps, column_limit)) in enumerate(specs.items()):
+        obs_periods, obs_values = observed[name]
+        if rule == 'asof':
+            values[:, j] = _asof(obs_periods, obs_values, periods, column_limit)
+        else:
+            keys, reduced = reduce_by_period(obs_periods, obs_values, rule)
+            keep = (keys >= first) & (keys <= last)
+            values[keys[keep] - first, j] = reduced[keep]
+        values[:, j], filled[:, j] = fill_gaps(values[:, j], column_gaps, column_limit)
+    return MacroPanel(frequency, periods, list(specs), values, filled)
+
+
+def align(columns, frequency='quarterly', how='target', gaps='nan', limit=None, store=None, cache=True,
+          cache_dir=None, dtype=np.float64):
+    """Load series from the local FRED store and align them on one period grid, with caching.
+
+    columns maps output name -> series spec: a series ID, or a tuple
+    (series_id, rule[, gaps[, limit]]) with rule one of RULES (default
+    'mean') and gaps one of GAPS (default: the `gaps` / `limit` arguments).
+    For example, quarterly GDP with its exogenous series:
+
+        align({'gdp': ('GDP', 'last'), 'interest_rate': 'DFF', 'population': 'POPTHM',
+               'inflation_rate': ('FPCPITOTLZGUSA', 'asof')}, frequency='quarterly')
+
+    The result is a MacroPanel, cached as a saved panel under the store
+    files' size/mtime and the spec, so an unchanged alignment is
+    memory-mapped back without loading any series.
+    """
+    store = store or default_store()
+    specs = {name: _spec(spec, gaps, limit) for name, spec in columns.items()}
+    series_ids = list(dict.fromkeys(spec[0] for spec in specs.values()))
+
+    stale = [s for s in series_ids if not store.is_fresh(s)]
+    if stale:
+        store.load_many(stale)
+    fingerprints = []
+    for series_id in series_ids:
+        stat = os.stat(store.path(series_id))
+        fingerprints.append([series_id, stat.st_size, stat.st_mtime_ns])
+    key = hashlib.sha1(json.dumps([ALIGN_VERSION, frequency, how, list(specs.items()), fingerprints,
+                                   np.dtype(dtype).str], default=str).encode()).hexdigest()[:20]
+    root = cache_dir or os.environ.get('USECON_ALIGN_DIR', DEFAULT_ALIGN_DIR)
+    path = os.path.join(root, key)
+
+    if cache:
+        try:
+            return MacroPanel.open(path)
+        except (OSError, ValueError, KeyError):
+            pass
+
+    arrays = {series_id: store.load_arrays(series_id) for series_id in series_ids}
+    panel = align_arrays(arrays, specs, frequency, how, dtype=dtype)
+    if cache:
+        panel.save(path)
+    return panel
+
+
+def to_frame(panel):
+    """The aligned panel as a DataFrame indexed by period start dates."""
+    return panel.to_frame()
@@ -0,0 +1,193 @@
+import os
+import warnings
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+# result: the fitted SARIMAXResults of the winning order, ready to forecast
+# table: one row per candidate tried, best first
+AutoArimaResult = namedtuple('AutoArimaResult', ['order', 'seasonal_order', 'result', 'table'])
+
+# Seasonal strength above which one seasonal difference is taken (Wang, Smith & Hyndman 2006)
+SEASONAL_STRENGTH_THRESHOLD = 0.64
+
+
+def ndiffs(y, alpha=0.05, max_d=2):
+    # Number of first differences until the KPSS test stops rejecting level stationarity
+    from statsmodels.tsa.stattools import kpss
+
+    y = np.asarray(y, dtype=np.float64)
+    y = y[np.isfinite(y)]
+    for d in range(max_d + 1):
+        if len(y) < 10 or np.ptp(y) == 0:
+            return d
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            p_value = kpss(y, regression='c', nlags='auto')[1]
+        if p_value >= alpha:
+            return d
+        y = np.diff(y)
+    return max_d
+
+
+def nsdiffs(y, m, max_D=1):
+    # Seasonal difference when the STL seasonal component explains most of the
+    # de-trended variance
+    from statsmodels.tsa.seasonal import STL
+
+    y = np.asarray(y, dtype=np.float64)
+    y = y[np.isfinite(y)]
+    if m < 2 or len(y) < 2 * m + 1:
+        return 0
+    D = 0
+    while D < max_D:
+        decomposition = STL(y, period=m, robust=True).fit()
+        remainder = decomposition.resid
+        strength = max(0.0, 1 - np.var(remainder) / np.var(decomposition.seasonal + remainder))
+        if strength <= SEASONAL_STRENGTH_THRESHOLD:
+            break
+        y = y[m:] - y[:-m]
+        D += 1
+    return D
+
+
+def _fit_candidate(endog, exog, order, seasonal_order, trend, warm_start, maxiter, store):
+    # Runs in a worker process. warm_start maps parameter names to values from
+    # the neighbouring fit; parameters the neighbour did not have keep the
+    # model's own starting values. A fit of the same order on an earlier
+    # version of the data in the model store is a better start still.
+    from statsmodels.tsa.statespace.sarimax import SARIMAX
+
+    record = {'order': order, 'seasonal_order': seasonal_order, 'aic': np.nan, 'bic': np.nan,
+              'aicc': np.nan, 'iterations': 0, 'converged': False, 'error': None, 'result': None}
+
+    def fit(model, start_params=None):
+        if start_params is None and warm_start:
+            start_params = np.array([warm_start.get(name, value)
+                                     for name, value in zip(model.param_names, model.start_params)])
+        try:
+            return model.fit(start_params=start_params, maxiter=maxiter, disp=False)
+        except (ValueError, np.linalg.LinAlgError):
+            # Neighbour's values can be invalid for this order (e.g. non-stationary); start cold
+            if start_params is None:
+                raise
+            return model.fit(maxiter=maxiter, disp=False)
+
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            model = SARIMAX(endog, exog=exog, order=order, seasonal_order=seasonal_order, trend=trend)
+            if store is not None:
+                result, _ = store.fit_statespace(model, fit=fit)
+            else:
+                result = fit(model)
+        # A fit restored from the store ran no optimizer and has no mle_retvals
+        retvals = getattr(result, 'mle_retvals', None) or {}
+        record.update(aic=result.aic, bic=result.bic, aicc=result.aicc,
+                      iterations=int(retvals.get('iterations', 0)),
+                      converged=bool(retvals.get('converged', True)) and np.isfinite(result.llf),
+                      result=result)
+    except Exception as e:  # one failed candidate must not end the search
+        record['error'] = '%s: %s' % (type(e).__name__, e)
+    return record
+
+
+def _neighbours(order, seasonal_order, limits):
+    # The Hyndman-Khandakar moves: one of p, q, P, Q by +-1, or p and q (P and Q) together
+    p, d, q = order
+    P, D, Q, m = seasonal_order
+    moves = [(dp, dq, 0, 0) for dp, dq in ((1, 0), (-1, 0), (0, 1), (0, -1), (1, 1), (-1, -1))]
+    if m > 1:
+        moves += [(0, 0, dP, dQ) for dP, dQ in ((1, 0), (-1, 0), (0, 1), (0, -1), (1, 1), (-1, -1))]
+    max_p, max_q, max_P, max_Q, max_order = limits
+    for dp, dq, dP, dQ in moves:
+        cand = (p + dp, q + dq, P + dP, Q + dQ)
+        if min(cand) < 0 or cand[0] > max_p or cand[1] > max_q or cand[2] > max_P or cand[3] > max_Q:
+            continue
+        if sum(cand) > max_order:
+            continue
+        yield (cand[0], d, cand[1]), (cand[2], D, cand[3], m)
+
+
+def auto_arima(y, exog=None, m=1, seasonal=True, d=None, D=None, max_p=5, max_q=5, max_P=2, max_Q=2,
+               max_order=5, information_criterion='aicc', n_workers=None, maxiter=50, max_steps=100,
+               store=None):
+    """Stepwise (seasonal) ARIMA order search, a lighter stand-in for pmdarima.auto_arima.
+
+    d and D are picked with KPSS and STL seasonal-strength tests unless given.
+    From the usual four starting models the search repeatedly fits every
+    unvisited neighbour of the current best order, concurrently on a process
+    pool, each one warm-started from the current best fit's parameters, and
+    moves while the information criterion improves. The winner comes back
+    already fitted, so there is no refit. With a model_store.ModelStore,
+    candidates fitted before on the same data are not refitted and those
+    fitted on a shorter version of it start from the stored parameters.
+    """
+    if information_criterion not in ('aic', 'bic', 'aicc'):
+        raise ValueError("information_criterion must be 'aic', 'bic' or 'aicc'")
+    if not seasonal:
+        m = 1
+    if d is None:
+        d = ndiffs(y)
+    if D is None:
+        D = nsdiffs(y, m) if m > 1 else 0
+    # Hyndman-Khandakar: include a constant unless the series is differenced twice
+    trend = 'c' if d + D < 2 else None
+    limits = (max_p, max_q, max_P, max_Q, max_order)
+
+    start = [((2, d, 2), (1, D, 1, m)), ((0, d, 0), (0, D, 0, m)), ((1, d, 0), (1, D, 0, m)),
+             ((0, d, 1), (0, D, 1, m))]
+    if m == 1:
+        start = [(order, (0, 0, 0, 0)) for order, _ in start]
+    start = [(o, s) for o, s in start if sum(o) - d + s[0] + s[2] <= max_order]
+
+    n_workers = n_workers or os.cpu_count()
+    pool = ProcessPoolExecutor(max_workers=n_workers) if n_workers > 1 else None
+    visited = {}
+
+    def fit_all(candidates, warm_start):
+        candidates = [c for c in dict.fromkeys(candidates) if c not in visited]
+        if pool is not None and len(candidates) > 1:
+            futures = [pool.submit(_fit_candidate, y, exog, o, s, trend, warm_start, maxiter, store)
+                       for o, s in candidates]
+            records = [future.result() for future in futures]
+        else:
+            records = [_fit_candidate(y, exog, o, s, trend, warm_start, maxiter, store)
+                       for o, s in candidates]
+        for candidate, record in zip(candidates, records):
+            visited[candidate] = record
+
+    def score(candidate):
+        record = visited[candidate]
+        value = record[information_criterion]
+        return value if record['converged'] and np.isfinite(value) else np.inf
+
+    try:
+        fit_all(start, None)
+        best = min(visited, key=score)
+        for _ in range(max_steps):
+            result = visited[best]['result']
+            warm_start = dict(zip(result.model.param_names, result.params)) if result is not None else None
+            fit_all(list(_neighbours(*best, limits)), warm_start)
+            candidate = min(visited, key=score)
+            if score(candidate) >= score(best):
+                break
+            best = candidate
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    if not np.isfinite(score(best)):
+        raise ValueError('no candidate ARIMA model could be fitted')
+
+    rows = []
+    for (order, seasonal_order), record in visited.items():
+        rows.append({'order': order, 'seasonal_order': seasonal_order, 'aic': record['aic'],
+                     'bic': record['bic'], 'aicc': record['aicc'], 'iterations': record['iterations'],
+                     'converged': record['converged'], 'error': record['error']})
+    table = pd.DataFrame(rows)
+    table['_score'] = [score(c) for c in visited]
+    table = table.sort_values('_score').drop(columns='_score').reset_index(drop=True)
+    return AutoArimaResult(best[0], best[1], visited[best]['result'], table)
@@ -0,0 +1,233 @@
+import copy
+import os
+import time
+import warnings
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from .exog_forecast import DEFAULT_MAXITER, fit_with_budget
+from .online import DEFAULT_REFIT_EVERY, OnlineRegimeFilter, OnlineSARIMAX
+
+# forecasts: one row per (model, origin, horizon) with the forecast, the actual value and the error
+# metrics: one row per (model, horizon) with n, mae, rmse and bias
+# seconds: wall time per model, summed over its blocks
+BacktestResult = namedtuple('BacktestResult', ['forecasts', 'metrics', 'seconds'])
+
+# Every forecaster below has the same three methods:
+#   fit(y, exog)            fit on the first training window
+#   update(y_new, exog_new) move the training window on by the new observations,
+#                           reusing the fitted state and refitting only on a schedule
+#   forecast(steps, exog)   point forecasts for the next steps
+# They are passed to backtest() unfitted; each worker fits its own copy. Their
+# own refit_every schedule (None: never) is for standalone use: backtest()
+# turns it off and refits on its schedule instead.
+
+
+class MeanForecaster:
+    """Gaussian growth: forecasts the running mean of the history."""
+
+    def fit(self, y, exog=None):
+        self.total, self.count = float(np.sum(y)), len(y)
+        return self
+
+    def update(self, y, exog=None):
+        self.total += float(np.sum(y))
+        self.count += len(y)
+
+    def forecast(self, steps, exog=None):
+        return np.full(steps, self.total / self.count)
+
+
+class MixtureForecaster:
+    """Gaussian mixture: forecasts the mixture mean, refitting from the last fit every refit_every steps."""
+
+    def __init__(self, n_components=2, refit_every=DEFAULT_REFIT_EVERY, **mixture_kwargs):
+        self.n_components = n_components
+        self.refit_every = refit_every
+        self.mixture_kwargs = mixture_kwargs
+
+    def fit(self, y, exog=None):
+        from sklearn.mixture import GaussianMixture
+
+        self.history = [np.asarray(y, dtype=np.float64)]
+        self.model = GaussianMixture(self.n_components, warm_start=True, **self.mixture_kwargs)
+        self.model.fit(self.history[0].reshape(-1, 1))
+        self.n_pending = 0
+        return self
+
+    def update(self, y, exog=None):
+        self.history.append(np.asarray(y, dtype=np.float64))
+        self.n_pending += len(y)
+        if self.refit_every and self.n_pending >= self.refit_every:
+            # warm_start: EM continues from the current weights and means
+            self.model.fit(np.concatenate(self.history).reshape(-1, 1))
+            self.n_pending = 0
+
+    def forecast(self, steps, exog=None):
+        return np.full(steps, float(self.model.weights_ @ self.model.means_[:, 0]))
+
+
+class HMMForecaster:
+    """RegimeHMM: forecasts regime probabilities forward from the online filter, times the regime means."""
+
+    def __init__(self, n_components=2, refit_every=DEFAULT_REFIT_EVERY, **hmm_kwargs):
+        self.n_components = n_components
+        self.refit_every = refit_every
+        self.hmm_kwargs = hmm_kwargs
+
+    def fit(self, y, exog=None):
+        from .hmm import RegimeHMM
+
+        X = np.asarray(y, dtype=np.float64).reshape(-1, 1)
+        model = RegimeHMM(self.n_components, **self.hmm_kwargs).fit(X)
+        self.filter = OnlineRegimeFilter(model, X, refit_every=self.refit_every)
+        return self
+
+    def update(self, y, exog=None):
+        self.filter.update(np.asarray(y, dtype=np.float64).reshape(-1, 1))
+
+    def forecast(self, steps, exog=None):
+        return self.filter.forecast(steps) @ self.filter.model.means_[:, 0]
+
+
+class StateSpaceForecaster:
+    """ARIMA / SARIMAX (statsmodels SARIMAX), advanced with results.extend between refits.
+
+    An ARIMA model is the same state-space model with seasonal_order left at
+    zero. With use_exog=False the backtest's exog is ignored, so a plain
+    ARIMA can run next to a SARIMAX with regressors. Fits are capped at
+    maxiter iterations and time_budget seconds.
+    """
+
+    def __init__(self, order=(1, 0, 0), seasonal_order=(0, 0, 0, 0), trend='c', use_exog=True,
+                 refit_every=DEFAULT_REFIT_EVERY, maxiter=DEFAULT_MAXITER, time_budget=None):
+        self.order = order
+        self.seasonal_order = seasonal_order
+        self.trend = trend
+        self.use_exog = use_exog
+        self.refit_every = refit_every
+        self.maxiter = maxiter
+        self.time_budget = time_budget
+
+    def fit(self, y, exog=None):
+        from statsmodels.tsa.statespace.sarimax import SARIMAX
+
+        exog = exog if self.use_exog else None
+        model = SARIMAX(y, exog=exog, order=self.order, seasonal_order=self.seasonal_order, trend=self.trend)
+        result, _ = fit_with_budget(model, self.maxiter, self.time_budget)
+        self.online = OnlineSARIMAX(result, refit_every=self.refit_every, maxiter=self.maxiter,
+                                    time_budget=self.time_budget)
+        return self
+
+    def update(self, y, exog=None):
+        self.online.update(y, exog=exog if self.use_exog else None)
+
+    def forecast(self, steps, exog=None):
+        return np.asarray(self.online.forecast(steps, exog=exog if self.use_exog else None))
+
+
+def rolling_origins(n, horizon=1, initial=None, n_origins=None, step=1):
+    """Expanding-window forecast origins: each is the length of its training window.
+
+    The last origin leaves `horizon` observations to score. With n_origins,
+    the latest n_origins origins `step` apart are returned; otherwise every
+    step-th origin after an initial window (default half the data).
+    """
+    last = n - horizon
+    if n_origins is not None:
+        origins = last - step * np.arange(n_origins)[::-1]
+        origins = origins[origins >= (initial or 2)]
+    else:
+        initial = n // 2 if initial is None else initial
+        origins = np.arange(initial, last + 1, step)
+    if len(origins) == 0:
+        raise ValueError('not enough data for a forecast origin')
+    return origins
+
+
+def _slice(data, start, stop):
+    return None if data is None else data[start:stop]
+
+
+def _run_block(name, forecaster, y, exog, origins, refits, horizon):
+    # Runs in a worker process: walk the origins as the serial run would, with
+    # a full fit wherever refits is set (always at the first origin) and an
+    # update in between
+    started = time.perf_counter()
+    forecaster = copy.deepcopy(forecaster)
+    # The backtest's schedule is the only one: no refits inside update()
+    if hasattr(forecaster, 'refit_every'):
+        forecaster.refit_every = None
+    rows = []
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        previous = None
+        for origin, refit in zip(origins, refits):
+            if refit:
+                forecaster.fit(y[:origin], _slice(exog, 0, origin))
+            elif origin > previous:
+                forecaster.update(y[previous:origin], _slice(exog, previous, origin))
+            previous = origin
+            steps = min(horizon, len(y) - origin)
+            # Forecasts are conditional on the realised exog, as in the scripts
+            forecast = forecaster.forecast(steps, _slice(exog, origin, origin + steps))
+            for h in range(steps):
+                rows.append({'model': name, 'origin': origin, 'horizon': h + 1, 'forecast': float(forecast[h]),
+                             'actual': float(y[origin + h])})
+    return rows, name, time.perf_counter() - started
+
+
+def backtest(y, forecasters, exog=None, horizon=4, initial=None, n_origins=None, step=1, n_workers=None,
+             refit_every=DEFAULT_REFIT_EVERY):
+    """Rolling-origin backtest of one or more forecasters on a process pool.
+
+    forecasters maps a model name to an unfitted forecaster (MeanForecaster,
+    MixtureForecaster, HMMForecaster, StateSpaceForecaster or anything with
+    the same fit/update/forecast methods). A model is fitted afresh at the
+    first origin (see rolling_origins) of every refit_every observations,
+    counted from the first origin (None: only there), and carried forward
+    to the origins in between via update(), so most origins cost a filter
+    step rather than a fit. This is the only refit schedule: the
+    forecasters' own refit_every is turned off. The origins are split at scheduled fits into
+    contiguous blocks, up to one per worker and model, and every block is
+    submitted at once; since each block starts with a fit, the forecasts do
+    not depend on n_workers. With a single scheduled fit (refit_every=None)
+    each model is one serial block, so only the models run in parallel.
+    Returns a BacktestResult.
+    """
+    index = getattr(y, 'index', None)
+    y = np.asarray(y, dtype=np.float64)
+    if exog is not None:
+        exog = np.asarray(exog, dtype=np.float64)
+        if exog.ndim == 1:
+            exog = exog[:, None]
+    origins = rolling_origins(len(y), horizon, initial, n_origins, step)
+    period = (origins - origins[0]) // (refit_every or len(y))
+    refits = np.r_[True, period[1:] != period[:-1]]
+
+    n_workers = n_workers or os.cpu_count()
+    # Blocks begin at scheduled fits, so no block replays another's origins
+    fits = np.flatnonzero(refits)
+    firsts = [int(fits[group[0]]) for group in np.array_split(np.arange(len(fits)), min(n_workers, len(fits)))]
+    jobs = [(name, forecaster, y, exog, origins[a:b], refits[a:b], horizon)
+            for a, b in zip(firsts, firsts[1:] + [len(origins)]) for name, forecaster in forecasters.items()]
+    if n_workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=n_workers) as pool:
+            futures = [pool.submit(_run_block, *job) for job in jobs]
+            done = [future.result() for future in futures]
+    else:
+        done = [_run_block(*job) for job in jobs]
+
+    forecasts = pd.DataFrame([row for rows, _, _ in done for row in rows])
+    if index is not None:
+        # Origin is labelled by the last observation of the training window
+        forecasts['origin'] = index[forecasts['origin'].to_numpy() - 1]
+    forecasts['error'] = forecasts['forecast'] - forecasts['actual']
+    grouped = forecasts.groupby(['model', 'horizon'])['error']
+    metrics = pd.DataFrame({'n': grouped.size(), 'mae': grouped.apply(lambda e: e.abs().mean()),
+                            'rmse': grouped.apply(lambda e: np.sqrt((e ** 2).mean())), 'bias': grouped.mean()})
+    seconds = pd.Series({name: sum(s for _, n, s in done if n == name) for name in forecasters}, name='seconds')
+    return BacktestResult(forecasts, metrics.reset_index(), seconds)
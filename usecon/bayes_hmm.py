@@ -0,0 +1,69 @@
+import numpy as np
+import pymc3 as pm
+import theano
+import theano.tensor as tt
+from pymc3.distributions.transforms import ordered
+
+from .hmm import gaussian_log_emissions, pad_sequences, sample_states
+
+
+def _logsumexp(x, axis):
+    peak = tt.max(x, axis=axis, keepdims=True)
+    return tt.log(tt.sum(tt.exp(x - peak), axis=axis)) + tt.max(x, axis=axis)
+
+
+def hmm_log_likelihood(log_b, log_startprob, log_transmat):
+    """Log-likelihood of a Gaussian HMM with the hidden states summed out.
+
+    log_b is a (T, K) tensor of log emission densities. The forward recursion
+    runs in log space inside theano.scan, so the result is differentiable in
+    every continuous parameter and NUTS never has to visit discrete states.
+    """
+    def step(log_b_t, log_alpha, log_transmat):
+        return log_b_t + _logsumexp(log_alpha[:, None] + log_transmat, axis=0)
+
+    log_alpha, _ = theano.scan(step, sequences=log_b[1:], outputs_info=log_startprob + log_b[0],
+                               non_sequences=log_transmat)
+    return _logsumexp(log_alpha[-1], axis=0)
+
+
+def build_regime_model(y, n_states, stickiness=5.0):
+    """Bayesian Gaussian regime model for growth rates y with marginalised states.
+
+    Regime means are ordered (lowest first) to break label switching, and
+    each transition row gets a Dirichlet prior that favours staying in the
+    same regime by `stickiness` pseudo-counts.
+    """
+    y = np.asarray(y, dtype=np.float64)
+    spread = y.std()
+    start_means = np.quantile(y, np.linspace(0.1, 0.9, n_states))
+    with pm.Model() as model:
+        means = pm.Normal('means', mu=y.mean(), sigma=3 * spread, shape=n_states, transform=ordered,
+                          testval=start_means)
+        sigmas = pm.HalfNormal('sigmas', sigma=2 * spread, shape=n_states, testval=np.full(n_states, spread))
+        startprob = pm.Dirichlet('startprob', a=np.ones(n_states))
+        transmat = pm.Dirichlet('transmat', a=np.ones((n_states, n_states)) + stickiness * np.eye(n_states),
+                                shape=(n_states, n_states))
+        log_b = pm.Normal.dist(mu=means, sigma=sigmas).logp(y[:, None])
+        pm.Potential('hmm_loglike', hmm_log_likelihood(log_b, tt.log(startprob), tt.log(transmat)))
+    return model
+
+
+def posterior_states(trace, y, n_draws=500, rng=None):
+    """Sample one regime path per posterior draw by forward-filtering backward-sampling.
+
+    All draws are processed as one batch. Returns (n_draws, T) states and the
+    (T, n_states) posterior regime probabilities.
+    """
+    rng = np.random.default_rng(rng)
+    n_total = len(trace['means'])
+    draws = rng.choice(n_total, size=min(n_draws, n_total), replace=False)
+    X, mask = pad_sequences(y)
+    means = trace['means'][draws][:, :, None]
+    covars = trace['sigmas'][draws][:, :, None] ** 2
+    log_b = gaussian_log_emissions(X, means, covars)
+    states = sample_states(log_b, np.log(trace['startprob'][draws]), np.log(trace['transmat'][draws]), mask, rng)
+    states = states[:, 0]
+    n_states = means.shape[1]
+    probabilities = np.stack([(states == k).mean(axis=0) for k in range(n_states)], axis=1)
+    return states, probabilities
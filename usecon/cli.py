@@ -0,0 +1,358 @@
+"""usecon command line: simulate, query, fit, forecast and backtest GDP growth models.
+
+Only argparse and the standard library are imported up front. Each
+subcommand imports its own backends when it runs, so `usecon simulate`
+never loads pandas, statsmodels, sklearn or pymc3, and `usecon startup`
+checks that it stays that way.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+# Modules the lightweight commands must not import
+HEAVY_MODULES = ('pandas', 'matplotlib', 'statsmodels', 'sklearn', 'scipy', 'pymc3', 'theano')
+
+# Wall-clock budget (seconds, fresh interpreter included) for the lightweight commands
+DEFAULT_STARTUP_BUDGET = 0.5
+
+# The lightweight invocations `usecon startup` times; synthetic parameters so
+# they need neither the network nor a populated series store
+STARTUP_COMMANDS = (
+    ['--help'],
+    ['simulate', '--mean', '3.0', '--std', '2.5', '--years', '10', '--paths', '10000', '--seed', '0'],
+)
+
+# Percentile rows printed by simulate
+SIMULATE_PERCENTILES = (5, 25, 50, 75, 95)
+
+
+def _int_tuple(text):
+    return tuple(int(v) for v in text.split(','))
+
+
+def _float_tuple(text):
+    return tuple(float(v) for v in text.split(','))
+
+
+def _store(args):
+    from .fred_store import SeriesStore
+
+    return SeriesStore(offline=True if args.offline else None)
+
+
+def _annual_growth(store, series_id):
+    # Annual % growth from the last observation of each year, like the
+    # scripts' resample('A').last().pct_change(), with numpy only
+    from .align import align
+
+    panel = align({series_id: (series_id, 'last')}, frequency='annual', store=store)
+    return panel.periods[1:] + 1970, panel.pct_change(series_id)[1:]
+
+
+def _panel(args):
+    # Target growth plus exog columns at args.frequency, as a MacroPanel
+    from .align import align
+
+    columns = {args.series: (args.series, 'last')}
+    columns.update((series_id, (series_id, 'mean', 'interpolate')) for series_id in args.exog)
+    return align(columns, frequency=args.frequency, store=_store(args)).trim()
+
+
+def _frame(args):
+    # The same as one pandas DataFrame, 'growth' first
+    panel = _panel(args)
+    frame = panel.select(list(args.exog)).to_frame()
+    frame.insert(0, 'growth', panel.pct_change(args.series))
+    return frame.iloc[1:]
+
+
+def _print_bands(first_year, years, quantiles):
+    print('year  ' + ''.join('%10s' % ('p%d' % p) for p in SIMULATE_PERCENTILES))
+    for i in range(9, len(years), 10) if len(years) >= 10 else range(len(years)):
+        print('%4d  ' % (first_year + i) + ''.join('%10.3f' % q for q in quantiles[:, i]))
+
+
+def simulate(args):
+    import numpy as np
+
+    from .parallel import parallel_gaussian, parallel_regimes
+    from .streaming import stream_gaussian, stream_regimes
+
+    if args.mean is not None:
+        last_year, mean, std = time.localtime().tm_year - 1, args.mean, args.std
+        growth = None
+    else:
+        years, growth = _annual_growth(_store(args), args.series)
+        last_year, mean, std = int(years[-1]), float(growth.mean()), float(growth.std(ddof=1))
+    sink = None
+    if args.save:
+        from .ensemble import EnsembleWriter
+        sink = EnsembleWriter(args.save, args.years, first_year=last_year + 1)
+
+    if args.model == 'gaussian':
+        print('Gaussian growth: mean %.3f%%, std %.3f%%' % (mean, std))
+        if args.workers > 1:
+            risk = parallel_gaussian(mean, std, args.years, args.paths, seed=args.seed, n_workers=args.workers,
+                                     sink=sink)
+        else:
+            risk = stream_gaussian(mean, std, args.years, args.paths, seed=args.seed, sink=sink)
+    else:
+        from .hmm import RegimeHMM
+
+        if growth is None:
+            raise SystemExit('--model hmm is fitted to the series, so it cannot be used with --mean/--std')
+        X = growth.reshape(-1, 1)
+        model = RegimeHMM(args.components, n_restarts=10, random_state=args.seed).fit(X)
+        means, stds = model.means_[:, 0], np.sqrt(model.covars_[:, 0])
+        for k in range(args.components):
+            print('regime %d: mean %.3f%%, std %.3f%%' % (k, means[k], stds[k]))
+        state = int(model.predict(X)[-1])
+        if args.workers > 1:
+            risk = parallel_regimes(model.transmat_, means, stds, args.years, args.paths, initial_state=state,
+                                    seed=args.seed, n_workers=args.workers, sink=sink)
+        else:
+            risk = stream_regimes(model.transmat_, means, stds, args.years, args.paths, initial_state=state,
+                                  seed=args.seed, sink=sink)
+
+    print('GDP relative to %d over %d paths:' % (last_year, risk.n_paths))
+    _print_bands(last_year + 1, range(args.years), risk.quantiles(SIMULATE_PERCENTILES))
+    for horizon in sorted({min(10, args.years), args.years}):
+        print('P(recession within %d years) = %.4f' % (horizon, risk.recession_probability(horizon)))
+    if args.save:
+        print('paths saved to %s' % args.save)
+
+
+def query(args):
+    from .ensemble_index import load_index
+
+    index = load_index(args.ensemble)
+    first_year = index.ensemble.first_year
+    if args.year is None:
+        year = index.n_years - 1
+    else:
+        year = index.offset(args.year) if first_year is not None else args.year
+    if not 0 <= year < index.n_years:
+        raise SystemExit('year outside the %d simulated years' % index.n_years)
+    label = str(first_year + year) if first_year is not None else 'year %d' % year
+
+    print('%d paths x %d years, GDP relative to %g' % (index.n_paths, index.n_years, index.start_level))
+    for horizon in args.within:
+        print('P(recession within %d years) = %.4f' % (horizon, index.recession_probability(horizon)))
+    for p, level in zip(args.percentiles, index.percentile(year, args.percentiles)):
+        print('p%g GDP in %s = %.4f' % (p, label, level))
+    for level in args.below:
+        print('P(GDP < %g in %s) = %.4f' % (level, label, index.probability_below(year, level)))
+        print('P(GDP < %g in any year) = %.4f' % (level, index.probability_ever_below(level)))
+    if args.episodes:
+        from .episodes import ensemble_episodes, format_summary, summarize
+
+        print(format_summary(summarize(ensemble_episodes(index.ensemble))))
+
+
+def fit(args):
+    import numpy as np
+
+    from .model_store import ModelStore
+
+    store = ModelStore()
+    name = '%s-%s' % (args.series, args.frequency)
+    if args.model in ('hmm', 'hsmm', 'gmm'):
+        # A (n, 1) view of the growth column, as the estimators expect
+        X = _panel(args).pct_change(args.series)[1:, None]
+        if args.model == 'hmm':
+            from .hmm import RegimeHMM
+            estimator = RegimeHMM(args.components, n_restarts=10, random_state=0)
+        elif args.model == 'hsmm':
+            from .hsmm import RegimeHSMM
+            estimator = RegimeHSMM(args.components, random_state=0)
+        else:
+            from sklearn.mixture import GaussianMixture
+            estimator = GaussianMixture(args.components, random_state=0)
+        estimator, status = store.fit_estimator(estimator, X, name=name)
+        print('%s (%s), %d observations' % (type(estimator).__name__, status, len(X)))
+        for key in ('weights_', 'startprob_', 'means_', 'covars_', 'covariances_', 'transmat_'):
+            if hasattr(estimator, key):
+                print('%s\n%s' % (key, np.round(np.asarray(getattr(estimator, key)), 4)))
+        if hasattr(estimator, 'expected_durations'):
+            print('expected spell lengths\n%s' % np.round(estimator.expected_durations(), 2))
+    else:
+        result, status = _fit_statespace(args, _frame(args), store, name)
+        print('%s (%s)' % (type(result.model).__name__, status))
+        print(result.summary())
+
+
+def _fit_statespace(args, frame, store, name):
+    import warnings
+
+    from statsmodels.tsa.statespace.sarimax import SARIMAX
+
+    exog = frame[list(args.exog)] if args.exog else None
+    seasonal_order = args.seasonal_order if args.model == 'sarimax' else (0, 0, 0, 0)
+    model = SARIMAX(frame['growth'], exog=exog, order=args.order, seasonal_order=seasonal_order, trend='c')
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        return store.fit_statespace(model, name=name, disp=False, maxiter=args.maxiter)
+
+
+def forecast(args):
+    from .exog_forecast import forecast_with_exog
+    from .model_store import ModelStore
+
+    frame = _frame(args)
+    store = ModelStore()
+    if args.exog:
+        seasonal_order = args.seasonal_order if args.model == 'sarimax' else (0, 0, 0, 0)
+        stage = forecast_with_exog(frame, 'growth', list(args.exog), args.steps, order=args.order,
+                                   seasonal_order=seasonal_order, maxiter=args.maxiter, store=store)
+        print(stage.fits.to_string(index=False))
+        predictions = stage.forecast
+    else:
+        result, status = _fit_statespace(args, frame, store, '%s-%s' % (args.series, args.frequency))
+        print('%s (%s)' % (type(result.model).__name__, status))
+        predictions = result.forecast(args.steps)
+    print(predictions.to_string())
+
+
+def backtest(args):
+    from . import backtest as bt
+
+    frame = _frame(args)
+    available = {
+        'gaussian': lambda: bt.MeanForecaster(),
+        'gmm': lambda: bt.MixtureForecaster(args.components),
+        'hmm': lambda: bt.HMMForecaster(args.components, n_restarts=10),
+        'arima': lambda: bt.StateSpaceForecaster(args.order, use_exog=False),
+        'sarimax': lambda: bt.StateSpaceForecaster(args.order, args.seasonal_order),
+    }
+    models = args.models.split(',')
+    unknown = [m for m in models if m not in available]
+    if unknown:
+        raise SystemExit('unknown model(s): %s (choose from %s)' % (', '.join(unknown), ', '.join(available)))
+    exog = frame[list(args.exog)] if args.exog else None
+    result = bt.backtest(frame['growth'], {m: available[m]() for m in models}, exog=exog, horizon=args.horizon,
+                         n_origins=args.origins, n_workers=args.workers or None)
+    print(result.metrics.pivot(index='horizon', columns='model', values='rmse').to_string())
+    print(result.seconds.to_string())
+
+
+def generate(args):
+    from .synthetic import write_panel
+
+    started = time.perf_counter()
+    ids = write_panel(args.out, args.periods, n_series=args.economies, frequency=args.frequency, fmt=args.format,
+                      seed=args.seed)
+    print('wrote %d series x %d %s periods to %s in %.1fs' % (len(ids), args.periods, args.frequency, args.out,
+                                                               time.perf_counter() - started))
+    if args.format == 'npz':
+        print('use it with USECON_STORE_DIR=%s USECON_OFFLINE=1' % args.out)
+    else:
+        print('use it with USECON_FRED_SOURCE=%s' % args.out)
+
+
+def startup(args):
+    """Time the lightweight commands in fresh interpreters and check what they import."""
+    probe = ('import json, sys, time\n'
+             'started = time.perf_counter()\n'
+             'from usecon.cli import main\n'
+             'try:\n'
+             '    main(sys.argv[1:])\n'
+             'except SystemExit:\n'
+             '    pass\n'
+             'heavy = sorted(m for m in %r if m in sys.modules)\n'
+             'sys.stderr.write(json.dumps({"heavy": heavy}) + "\\n")\n') % (HEAVY_MODULES,)
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))), os.environ.get('PYTHONPATH')])))
+    failed = False
+    for command in STARTUP_COMMANDS:
+        started = time.perf_counter()
+        done = subprocess.run([sys.executable, '-c', probe] + command, env=env, stdout=subprocess.DEVNULL,
+                              stderr=subprocess.PIPE, text=True)
+        seconds = time.perf_counter() - started
+        report = json.loads(done.stderr.strip().splitlines()[-1]) if done.returncode == 0 else {'heavy': []}
+        ok = done.returncode == 0 and seconds <= args.budget and not report['heavy']
+        failed |= not ok
+        print('%-4s %6.3fs  usecon %s%s' % ('ok' if ok else 'FAIL', seconds, ' '.join(command),
+                                           '  (imported %s)' % ', '.join(report['heavy']) if report['heavy'] else ''))
+        if done.returncode != 0:
+            print(done.stderr, file=sys.stderr)
+    print('budget %.3fs per command' % args.budget)
+    return 1 if failed else 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='usecon', description='US GDP growth simulation and forecasting.')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    data = argparse.ArgumentParser(add_help=False)
+    data.add_argument('--series', default='GDP', help='FRED series to model (default GDP)')
+    data.add_argument('--offline', action='store_true', help='only use series already in the local store')
+
+    models = argparse.ArgumentParser(add_help=False)
+    models.add_argument('--frequency', choices=('annual', 'quarterly'), default='annual')
+    models.add_argument('--exog', nargs='*', default=[], metavar='SERIES', help='FRED series used as regressors')
+    models.add_argument('--order', type=_int_tuple, default=(1, 0, 0), help='ARIMA p,d,q (default 1,0,0)')
+    models.add_argument('--seasonal-order', type=_int_tuple, default=(1, 0, 1, 4), help='SARIMAX P,D,Q,m')
+    models.add_argument('--components', type=int, default=2, help='regimes / mixture components')
+    models.add_argument('--maxiter', type=int, default=1000)
+
+    p = sub.add_parser('simulate', parents=[data], help='simulate future GDP paths (numpy only)')
+    p.add_argument('--model', choices=('gaussian', 'hmm'), default='gaussian')
+    p.add_argument('--components', type=int, default=2)
+    p.add_argument('--years', type=int, default=80)
+    p.add_argument('--paths', type=int, default=100000)
+    p.add_argument('--seed', type=int, default=None)
+    p.add_argument('--workers', type=int, default=1, help='processes for large runs')
+    p.add_argument('--mean', type=float, default=None, help='annual growth mean (%%), instead of the data')
+    p.add_argument('--std', type=float, default=None, help='annual growth std (%%), with --mean')
+    p.add_argument('--save', metavar='DIR', default=None, help='also write every path to an ensemble directory')
+    p.set_defaults(handler=simulate)
+
+    p = sub.add_parser('query', help='answer risk questions from an ensemble saved by simulate --save')
+    p.add_argument('ensemble', help='ensemble directory (its index is built on first use)')
+    p.add_argument('--within', type=int, nargs='*', default=[10], metavar='YEARS',
+                   help='horizons for P(recession within YEARS)')
+    p.add_argument('--year', type=int, default=None, help='year for percentiles and --below (default: the last)')
+    p.add_argument('--percentiles', type=_float_tuple, default=SIMULATE_PERCENTILES)
+    p.add_argument('--below', type=float, nargs='*', default=[], metavar='LEVEL', help='P(GDP < LEVEL)')
+    p.add_argument('--episodes', action='store_true', help='recession episode durations and depths (scans the paths)')
+    p.set_defaults(handler=query)
+
+    p = sub.add_parser('fit', parents=[data, models], help='fit a model, reusing the model store')
+    p.add_argument('--model', choices=('hmm', 'hsmm', 'gmm', 'arima', 'sarimax'), default='hmm')
+    p.set_defaults(handler=fit)
+
+    p = sub.add_parser('forecast', parents=[data, models], help='ARIMA/SARIMAX forecast of growth')
+    p.add_argument('--model', choices=('arima', 'sarimax'), default='arima')
+    p.add_argument('--steps', type=int, default=10)
+    p.set_defaults(handler=forecast)
+
+    p = sub.add_parser('backtest', parents=[data, models], help='rolling-origin backtest of several models')
+    p.add_argument('--models', default='gaussian,gmm,hmm,arima', help='comma-separated: gaussian,gmm,hmm,arima,sarimax')
+    p.add_argument('--origins', type=int, default=60)
+    p.add_argument('--horizon', type=int, default=4)
+    p.add_argument('--workers', type=int, default=None)
+    p.set_defaults(handler=backtest)
+
+    p = sub.add_parser('generate', help='write a synthetic regime-switching panel for offline runs')
+    p.add_argument('out', help='directory to write the series to')
+    p.add_argument('--periods', type=int, default=300)
+    p.add_argument('--economies', type=int, default=1, help='independent economies (series get a _<n> suffix)')
+    p.add_argument('--frequency', choices=('quarterly', 'monthly', 'daily'), default='quarterly')
+    p.add_argument('--format', choices=('npz', 'csv'), default='npz', help='series store files or FRED-style CSVs')
+    p.add_argument('--seed', type=int, default=None)
+    p.set_defaults(handler=generate)
+
+    p = sub.add_parser('startup', help='check the cold-start time of the lightweight commands')
+    p.add_argument('--budget', type=float, default=DEFAULT_STARTUP_BUDGET, help='seconds per command')
+    p.set_defaults(handler=startup)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.command == 'simulate' and (args.mean is None) != (args.std is None):
+        raise SystemExit('--mean and --std go together')
+    return args.handler(args)
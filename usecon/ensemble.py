@@ -0,0 +1,245 @@
+import json
+import os
+import shutil
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# Arrays a simulation writes per chunk: growth rates in percent, and log GDP
+# levels relative to the starting level. 'levels' is read from log_levels.
+ARRAYS = ('growth', 'log_levels')
+
+# Years per stored block. A chunk of paths is cut into blocks of this many
+# years, so reading one year touches one block per chunk of paths and reading
+# one path touches one chunk's blocks.
+DEFAULT_YEAR_CHUNK = 10
+
+# zlib level for the high-order bytes of each block (None stores raw .npy
+# blocks that are memory-mapped when read)
+DEFAULT_COMPRESSION = 1
+
+# Where scripts persist their ensembles, when USECON_ENSEMBLE_DIR is set
+ENSEMBLE_ENV = 'USECON_ENSEMBLE_DIR'
+
+# Bump when the on-disk layout changes
+ENSEMBLE_VERSION = 1
+
+
+def _encode(block, level):
+    # Byte shuffle, then zlib on the high-order byte planes only: the sign,
+    # exponent and leading mantissa bytes of neighbouring values repeat, while
+    # the low mantissa bytes of simulated values are noise zlib cannot shrink
+    planes = np.ascontiguousarray(np.ascontiguousarray(block).view(np.uint8).reshape(-1, block.itemsize).T)
+    low = block.itemsize // 2
+    return planes[:low].tobytes() + zlib.compress(planes[low:].tobytes(), level)
+
+
+def _decode(data, dtype, shape):
+    dtype = np.dtype(dtype)
+    size = int(np.prod(shape))
+    low = dtype.itemsize // 2
+    planes = np.empty((dtype.itemsize, size), dtype=np.uint8)
+    planes[:low] = np.frombuffer(data, dtype=np.uint8, count=low * size).reshape(low, size)
+    planes[low:] = np.frombuffer(zlib.decompress(data[low * size:]), dtype=np.uint8).reshape(-1, size)
+    return np.ascontiguousarray(planes.T).view(dtype).reshape(shape)
+
+
+def _write_file(path, data):
+    with open(path + '.tmp', 'wb') as f:
+        if isinstance(data, bytes):
+            f.write(data)
+        else:
+            np.save(f, data)
+    os.replace(path + '.tmp', path)
+
+
+def _write_block(path, data, compression):
+    if compression is None:
+        _write_file(path + '.npy', data)
+    else:
+        _write_file(path + '.z', _encode(data, compression))
+
+
+class EnsembleWriter:
+    """Persists the chunks of a streaming or parallel simulation as they are produced.
+
+    Pass one as `sink` to streaming.stream_paths / parallel.simulate_parallel
+    (or their Gaussian and regime wrappers). Every chunk of paths is cut into
+    blocks of year_chunk years, stored as dtype and compressed on a small
+    thread pool while the next chunk is simulated (zlib releases the GIL);
+    in a parallel run each worker process writes its own chunks. The
+    manifest is written last, by close(), so an ensemble without one is
+    incomplete. Open the result with Ensemble(path).
+    """
+
+    def __init__(self, path, n_years, year_chunk=DEFAULT_YEAR_CHUNK, dtype=np.float32,
+                 compression=DEFAULT_COMPRESSION, arrays=ARRAYS, first_year=None, n_threads=None):
+        self.directory = path
+        self.n_years = int(n_years)
+        self.year_chunk = year_chunk
+        # Little-endian on disk, so the byte planes are in a known order
+        self.dtype = np.dtype(dtype).newbyteorder('<')
+        self.compression = compression
+        self.arrays = tuple(arrays)
+        self.first_year = None if first_year is None else int(first_year)
+        self.n_threads = n_threads or min(4, os.cpu_count() or 1)
+        self._pool = None
+        self._pending = deque()
+
+        # Start from an empty ensemble; only this writer's own files are removed
+        os.makedirs(path, exist_ok=True)
+        manifest = os.path.join(path, 'manifest.json')
+        if os.path.exists(manifest):
+            os.remove(manifest)
+        for name in ARRAYS:
+            shutil.rmtree(os.path.join(path, name), ignore_errors=True)
+        for name in self.arrays:
+            os.makedirs(os.path.join(path, name))
+
+    def __getstate__(self):
+        # Workers get the settings only; each starts its own thread pool
+        state = dict(self.__dict__)
+        state['_pool'], state['_pending'] = None, deque()
+        return state
+
+    def write(self, index, name, values):
+        """Queue chunk `index` of array `name`, a year-major (n_years, n) array."""
+        if name not in self.arrays:
+            return
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(self.n_threads)
+        for block, first in enumerate(range(0, self.n_years, self.year_chunk)):
+            # Copied here, since the caller goes on to overwrite the chunk in place
+            data = values[first:first + self.year_chunk].astype(self.dtype)
+            path = os.path.join(self.directory, name, '%d.%d' % (index, block))
+            self._pending.append(self._pool.submit(_write_block, path, data, self.compression))
+            # Bound the blocks held in memory while waiting to be written
+            while len(self._pending) > 4 * self.n_threads:
+                self._pending.popleft().result()
+
+    def flush(self):
+        while self._pending:
+            self._pending.popleft().result()
+
+    def close(self, sizes, accumulator=None):
+        """Wait for the queued blocks and write the manifest; sizes are the paths per chunk, in order."""
+        self.flush()
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+        manifest = {'version': ENSEMBLE_VERSION, 'n_years': self.n_years, 'sizes': [int(n) for n in sizes],
+                    'year_chunk': self.year_chunk, 'dtype': self.dtype.str, 'compression': self.compression,
+                    'arrays': list(self.arrays), 'first_year': self.first_year,
+                    'start_level': float(accumulator.start_level) if accumulator is not None else 1.0,
+                    'entropy': str(accumulator.entropy) if accumulator is not None else None}
+        path = os.path.join(self.directory, 'manifest.json')
+        with open(path + '.tmp', 'w') as f:
+            json.dump(manifest, f, indent=1)
+        os.replace(path + '.tmp', path)
+        return Ensemble(self.directory)
+
+
+def ensemble_writer(name, n_years, **kwargs):
+    """EnsembleWriter for <USECON_ENSEMBLE_DIR>/<name>, or None when the variable is not set."""
+    root = os.environ.get(ENSEMBLE_ENV)
+    return EnsembleWriter(os.path.join(root, name), n_years, **kwargs) if root else None
+
+
+def _positions(key, n):
+    # int or unit-step slice -> (first, stop, squeeze)
+    if isinstance(key, slice):
+        first, stop, step = key.indices(n)
+        if step != 1:
+            raise ValueError('only contiguous slices can be read')
+        return first, max(first, stop), False
+    key = int(key)
+    if key < 0:
+        key += n
+    if not 0 <= key < n:
+        raise IndexError('index %d out of range for %d' % (key, n))
+    return key, key + 1, True
+
+
+class Ensemble:
+    """A stored ensemble of simulated paths, read lazily block by block.
+
+    read() returns a year-major (years, paths) array for any rectangle of
+    years and paths, decompressing only the blocks it overlaps: year(k) is
+    one year across every path, path(i) one path across every year.
+    chunks() walks the paths chunk by chunk for full scans in bounded memory.
+    """
+
+    def __init__(self, path):
+        self.directory = path
+        with open(os.path.join(path, 'manifest.json')) as f:
+            manifest = json.load(f)
+        if manifest.get('version') != ENSEMBLE_VERSION:
+            raise ValueError('%s: ensemble version %r, expected %d' % (path, manifest.get('version'),
+                                                                      ENSEMBLE_VERSION))
+        self.n_years = manifest['n_years']
+        self.sizes = np.asarray(manifest['sizes'], dtype=np.int64)
+        self.starts = np.r_[0, np.cumsum(self.sizes)]
+        self.n_paths = int(self.starts[-1])
+        self.year_chunk = manifest['year_chunk']
+        self.dtype = np.dtype(manifest['dtype'])
+        self.compression = manifest['compression']
+        self.arrays = tuple(manifest['arrays'])
+        self.first_year = manifest['first_year']
+        self.start_level = manifest['start_level']
+        # Root seed entropy of the run (an int too large for json numbers)
+        self.entropy = None if manifest['entropy'] is None else int(manifest['entropy'])
+
+    def __repr__(self):
+        return '<Ensemble %s: %d paths x %d years, %s>' % (self.directory, self.n_paths, self.n_years,
+                                                            ', '.join(self.arrays))
+
+    def _block(self, name, chunk, block):
+        path = os.path.join(self.directory, name, '%d.%d' % (chunk, block))
+        if self.compression is None:
+            return np.load(path + '.npy', mmap_mode='r')
+        rows = min(self.year_chunk, self.n_years - block * self.year_chunk)
+        with open(path + '.z', 'rb') as f:
+            return _decode(f.read(), self.dtype, (rows, self.sizes[chunk]))
+
+    def read(self, name='log_levels', years=slice(None), paths=slice(None)):
+        """A (years, paths) block of growth, log_levels or levels; an int for either axis drops that axis."""
+        source = 'log_levels' if name == 'levels' else name
+        if source not in self.arrays:
+            raise KeyError('%s was not stored (arrays: %s)' % (name, ', '.join(self.arrays)))
+        y0, y1, drop_year = _positions(years, self.n_years)
+        p0, p1, drop_path = _positions(paths, self.n_paths)
+
+        out = np.empty((y1 - y0, p1 - p0), dtype=self.dtype)
+        if p1 > p0 and y1 > y0:
+            first_chunk = np.searchsorted(self.starts, p0, side='right') - 1
+            last_chunk = np.searchsorted(self.starts, p1 - 1, side='right') - 1
+            for chunk in range(first_chunk, last_chunk + 1):
+                c0 = max(p0, self.starts[chunk]) - self.starts[chunk]
+                c1 = min(p1, self.starts[chunk + 1]) - self.starts[chunk]
+                for block in range(y0 // self.year_chunk, (y1 - 1) // self.year_chunk + 1):
+                    b0 = block * self.year_chunk
+                    r0, r1 = max(y0, b0), min(y1, b0 + self.year_chunk)
+                    out[r0 - y0:r1 - y0, self.starts[chunk] + c0 - p0:self.starts[chunk] + c1 - p0] = \
+                        self._block(source, chunk, block)[r0 - b0:r1 - b0, c0:c1]
+        if name == 'levels':
+            out = self.start_level * np.exp(out.astype(np.float64))
+        if drop_path:
+            out = out[:, 0]
+        if drop_year:
+            out = out[0]
+        return out
+
+    def year(self, k, name='log_levels'):
+        """Year k (0 = first simulated year) across every path."""
+        return self.read(name, years=k)
+
+    def path(self, i, name='log_levels'):
+        """Path i across every year."""
+        return self.read(name, paths=i)
+
+    def chunks(self, name='log_levels'):
+        """Yield (first path, year-major (n_years, n) array) for each stored chunk of paths, in order."""
+        for chunk in range(len(self.sizes)):
+            yield int(self.starts[chunk]), self.read(name, paths=slice(self.starts[chunk], self.starts[chunk + 1]))
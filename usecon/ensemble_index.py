@@ -0,0 +1,221 @@
+import json
+import os
+
+import numpy as np
+
+from .ensemble import Ensemble
+from .streaming import DEFAULT_BINS, DEFAULT_LOG_BOUNDS, HistogramSketch
+
+# Bump when the index layout changes, so old indexes are rebuilt
+INDEX_VERSION = 1
+
+# Per-path arrays: first recession year (n_years for none) and the lowest /
+# highest log level each path reaches
+PATH_ARRAYS = ('first_recession', 'log_low', 'log_high')
+
+
+def _save(path, array):
+    with open(path + '.tmp', 'wb') as f:
+        np.save(f, array)
+    os.replace(path + '.tmp', path)
+
+
+def _stamp(ensemble):
+    # What the index was built from: a rewritten ensemble gets a new manifest
+    stat = os.stat(os.path.join(ensemble.directory, 'manifest.json'))
+    return [stat.st_size, stat.st_mtime_ns, ensemble.n_paths, ensemble.n_years]
+
+
+def build_index(ensemble, sorted_levels=True, log_bounds=DEFAULT_LOG_BOUNDS, bins=DEFAULT_BINS):
+    """Scan a stored ensemble once and write its query index to <ensemble>/index.
+
+    One pass over the chunks of paths records every path's first recession
+    year and lowest / highest log level, plus per-year min / max and a
+    cumulative histogram of the log level. With sorted_levels, a second pass
+    over the year blocks writes every year's log levels in sorted order (as
+    large as the log_levels array itself, so it can be skipped for very large
+    ensembles; queries then interpolate on the histograms).
+    """
+    if not isinstance(ensemble, Ensemble):
+        ensemble = Ensemble(ensemble)
+    root = os.path.join(ensemble.directory, 'index')
+    os.makedirs(root, exist_ok=True)
+    if os.path.exists(os.path.join(root, 'index.json')):
+        os.remove(os.path.join(root, 'index.json'))
+    n_years, n_paths = ensemble.n_years, ensemble.n_paths
+
+    first_recession = np.empty(n_paths, dtype=np.int16 if n_years < 2 ** 15 else np.int32)
+    log_low = np.empty(n_paths, dtype=ensemble.dtype)
+    log_high = np.empty(n_paths, dtype=ensemble.dtype)
+    year_low = np.full(n_years, np.inf)
+    year_high = np.full(n_years, -np.inf)
+    sketch = HistogramSketch(n_years, log_bounds, bins)
+    growth_chunks = ensemble.chunks('growth') if 'growth' in ensemble.arrays else None
+    for start, log_levels in ensemble.chunks('log_levels'):
+        rows = slice(start, start + log_levels.shape[1])
+        if growth_chunks is not None:
+            negative = next(growth_chunks)[1] < 0
+        else:
+            # Without stored growth, a recession year is a fall in the log level
+            negative = np.diff(log_levels, axis=0, prepend=0) < 0
+        first_recession[rows] = np.where(negative.any(axis=0), negative.argmax(axis=0), n_years)
+        log_levels.min(axis=0, out=log_low[rows])
+        log_levels.max(axis=0, out=log_high[rows])
+        np.minimum(year_low, log_levels.min(axis=1), out=year_low)
+        np.maximum(year_high, log_levels.max(axis=1), out=year_high)
+        sketch.add(log_levels)
+
+    for name, array in zip(PATH_ARRAYS, (first_recession, log_low, log_high)):
+        _save(os.path.join(root, name + '.npy'), array)
+    _save(os.path.join(root, 'recession_counts.npy'),
+          np.cumsum(np.bincount(first_recession, minlength=n_years + 1)).astype(np.int64))
+    _save(os.path.join(root, 'sorted_low.npy'), np.sort(log_low))
+    _save(os.path.join(root, 'sorted_high.npy'), np.sort(log_high))
+    _save(os.path.join(root, 'year_low.npy'), year_low)
+    _save(os.path.join(root, 'year_high.npy'), year_high)
+    _save(os.path.join(root, 'histogram.npy'), np.cumsum(sketch.counts, axis=1))
+
+    if sorted_levels:
+        # One block of years across every path at a time, sorted row by row
+        # into a year-major memory-mapped array
+        path = os.path.join(root, 'levels.npy')
+        levels = np.lib.format.open_memmap(path + '.tmp', mode='w+', dtype=ensemble.dtype, shape=(n_years, n_paths))
+        for first in range(0, n_years, ensemble.year_chunk):
+            block = ensemble.read('log_levels', years=slice(first, first + ensemble.year_chunk))
+            block.sort(axis=1)
+            levels[first:first + len(block)] = block
+        levels.flush()
+        del levels
+        os.replace(path + '.tmp', path)
+
+    header = {'version': INDEX_VERSION, 'stamp': _stamp(ensemble), 'sorted_levels': sorted_levels,
+              'log_bounds': list(log_bounds), 'bins': bins}
+    with open(os.path.join(root, 'index.json.tmp'), 'w') as f:
+        json.dump(header, f)
+    os.replace(os.path.join(root, 'index.json.tmp'), os.path.join(root, 'index.json'))
+    return EnsembleIndex(ensemble)
+
+
+def load_index(ensemble, build=True, **kwargs):
+    """The ensemble's index, built (with build_index's kwargs) if it is missing or stale."""
+    if not isinstance(ensemble, Ensemble):
+        ensemble = Ensemble(ensemble)
+    try:
+        return EnsembleIndex(ensemble)
+    except (OSError, ValueError):
+        if not build:
+            raise
+    return build_index(ensemble, **kwargs)
+
+
+class EnsembleIndex:
+    """Risk questions about a stored ensemble, answered without rescanning its paths.
+
+    Every array is memory-mapped, so a query reads a handful of pages:
+    recession probabilities are a lookup in cumulative counts, percentiles
+    an index into a year's sorted levels and P(GDP < x) a binary search in
+    them. Years are offsets (0 = first simulated year; see offset() for
+    calendar years) and levels are GDP levels, i.e. start_level * exp(log level).
+    """
+
+    def __init__(self, ensemble):
+        if not isinstance(ensemble, Ensemble):
+            ensemble = Ensemble(ensemble)
+        self.ensemble = ensemble
+        root = os.path.join(ensemble.directory, 'index')
+        with open(os.path.join(root, 'index.json')) as f:
+            header = json.load(f)
+        if header.get('version') != INDEX_VERSION or header.get('stamp') != _stamp(ensemble):
+            raise ValueError('%s: index is stale' % root)
+        self.n_paths, self.n_years = ensemble.n_paths, ensemble.n_years
+        self.start_level = ensemble.start_level
+
+        def load(name):
+            return np.load(os.path.join(root, name + '.npy'), mmap_mode='r')
+
+        self.first_recession, self.log_low, self.log_high = (load(name) for name in PATH_ARRAYS)
+        self.recession_counts = load('recession_counts')
+        self.sorted_low, self.sorted_high = load('sorted_low'), load('sorted_high')
+        self.year_low, self.year_high = load('year_low'), load('year_high')
+        self.histogram = load('histogram')
+        self.levels = load('levels') if header['sorted_levels'] else None
+        # Lower / upper edge of every histogram bin, the under- and overflow
+        # bins included; the open ends are clipped to the year's min / max
+        low, high = header['log_bounds']
+        edges = low + np.arange(header['bins'] + 1) * (high - low) / header['bins']
+        self.lower_edges = np.concatenate([[-np.inf], edges])
+        self.upper_edges = np.concatenate([edges, [np.inf]])
+
+    def offset(self, year):
+        """Year offset of a calendar year."""
+        if self.ensemble.first_year is None:
+            raise ValueError('the ensemble was saved without a first year')
+        return year - self.ensemble.first_year
+
+    def _log(self, level):
+        return np.log(np.asarray(level, dtype=np.float64) / self.start_level)
+
+    def recession_probability(self, years):
+        """P(at least one year of negative growth within the first `years` years)."""
+        if years <= 0:
+            return 0.0
+        return self.recession_counts[min(years, self.n_years) - 1] / self.n_paths
+
+    def percentile(self, year, percentiles):
+        """GDP level percentile(s) in year, interpolated like np.percentile."""
+        percentiles = np.asarray(percentiles, dtype=np.float64)
+        if self.levels is None:
+            return self._histogram_quantiles(year, percentiles)
+        position = percentiles / 100 * (self.n_paths - 1)
+        lower = np.floor(position).astype(np.intp)
+        upper = np.minimum(lower + 1, self.n_paths - 1)
+        row = self.levels[year]
+        low, high = row[lower].astype(np.float64), row[upper].astype(np.float64)
+        return self.start_level * np.exp(low + (high - low) * (position - lower))
+
+    def _bin(self, year, b):
+        # Count below bin b, count in it and its edges, for a year's histogram
+        cumulative = self.histogram[year]
+        before = np.where(b > 0, cumulative[np.maximum(b - 1, 0)], 0)
+        lower = np.clip(self.lower_edges[b], self.year_low[year], self.year_high[year])
+        upper = np.clip(self.upper_edges[b], self.year_low[year], self.year_high[year])
+        return before, cumulative[b] - before, lower, upper
+
+    def _histogram_quantiles(self, year, percentiles):
+        # Linear interpolation inside the bin holding each rank, as in HistogramSketch
+        cumulative = self.histogram[year]
+        rank = percentiles / 100 * cumulative[-1]
+        b = np.minimum(np.searchsorted(cumulative, rank, side='left'), len(cumulative) - 1)
+        before, inside, lower, upper = self._bin(year, b)
+        fraction = np.clip((rank - before) / np.maximum(inside, 1), 0, 1)
+        return self.start_level * np.exp(lower + fraction * (upper - lower))
+
+    def quantiles(self, percentiles):
+        """(len(percentiles), n_years) GDP levels, like PathAccumulator.quantiles."""
+        return np.stack([self.percentile(year, percentiles) for year in range(self.n_years)], axis=1)
+
+    def envelope(self):
+        """Exact (low, high) GDP level per year."""
+        return self.start_level * np.exp(self.year_low), self.start_level * np.exp(self.year_high)
+
+    def probability_below(self, year, level):
+        """P(GDP < level in year); exact with sorted levels, else interpolated on the histogram."""
+        x = self._log(level)
+        if self.levels is not None:
+            row = self.levels[year]
+            # Search in the row's own dtype, so the row is not converted first
+            return np.searchsorted(row, x.astype(row.dtype), side='left') / self.n_paths
+        b = np.searchsorted(self.upper_edges, x, side='right')
+        before, inside, lower, upper = self._bin(year, b)
+        width = upper - lower
+        fraction = np.clip((x - lower) / np.where(width > 0, width, 1), 0, 1)
+        return (before + inside * np.where(width > 0, fraction, x > lower)) / self.n_paths
+
+    def probability_ever_below(self, level):
+        """P(GDP falls below level in at least one year)."""
+        return np.searchsorted(self.sorted_low, self._log(level).astype(self.sorted_low.dtype)) / self.n_paths
+
+    def probability_ever_above(self, level):
+        """P(GDP rises above level in at least one year)."""
+        x = self._log(level).astype(self.sorted_high.dtype)
+        return 1 - np.searchsorted(self.sorted_high, x, side='right') / self.n_paths
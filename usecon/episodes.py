@@ -0,0 +1,140 @@
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .ensemble import Ensemble
+from .simulation import DEFAULT_PERCENTILES
+
+# Shortest run of negative-growth periods that counts as a recession: any
+# negative year, or the usual two consecutive negative quarters
+MIN_DURATIONS = {'annual': 1, 'quarterly': 2}
+
+# One row per episode, in path order then time order:
+# path: which path (column of the growth matrix, plus path_offset)
+# start: index of the first negative period
+# duration: number of consecutive negative periods
+# depth: fall of GDP over the episode in percent (peak before it to its trough)
+# worst: the most negative single-period growth rate in it
+Episodes = namedtuple('Episodes', ['path', 'start', 'duration', 'depth', 'worst', 'n_paths', 'n_periods'])
+
+# durations[d] and episodes_per_path[k] are counts (episodes lasting d
+# periods, paths with k episodes); probability is the share of paths with at
+# least one episode; depth_percentiles has one value per percentile
+EpisodeSummary = namedtuple('EpisodeSummary', ['n_paths', 'n_episodes', 'probability', 'episodes_per_path',
+                                               'durations', 'percentiles', 'depth_percentiles'])
+
+
+def growth_from_log_levels(log_levels):
+    """Year-major growth in percent back from log levels relative to the start (e.g. simulation log_levels.T)."""
+    log_levels = np.asarray(log_levels, dtype=np.float64)
+    return np.expm1(np.diff(log_levels, axis=0, prepend=0)) * 100
+
+
+def extract_episodes(growth, frequency='annual', min_duration=None, path_offset=0):
+    """Every recession episode in a growth series or a year-major (n_periods, n_paths) matrix of paths.
+
+    Run-length encoding of the negative-growth mask, done for all paths at
+    once: the paths are laid end to end, each followed by one non-negative
+    period so runs never join across paths, and the runs' boundaries are the
+    +1 / -1 steps of the mask. Depth and worst period come from one reduceat
+    each over the negative periods. Runs shorter than min_duration (default
+    MIN_DURATIONS[frequency]) are dropped.
+    """
+    growth = np.asarray(growth)
+    if growth.ndim == 1:
+        growth = growth[:, None]
+    n_periods, n_paths = growth.shape
+    if min_duration is None:
+        min_duration = MIN_DURATIONS[frequency]
+
+    # Path-major mask with the separator period last (compared year-major,
+    # then transposed as bytes, which is much cheaper than a strided compare)
+    negative = np.zeros((n_paths, n_periods + 1), dtype=bool)
+    negative[:, :n_periods] = (growth < 0).T
+    steps = np.diff(negative.ravel().view(np.int8), prepend=np.int8(0))
+    # Runs alternate with gaps, so the changes alternate start, stop, start, ...
+    changes = np.flatnonzero(steps)
+    starts, stops = changes[0::2], changes[1::2]
+    duration = stops - starts
+
+    # The negative periods alone, path-major, hold every episode as one
+    # contiguous segment; only they are reduced
+    values = growth.T[negative[:, :n_periods]].astype(np.float64)
+    offsets = np.cumsum(duration) - duration
+    worst = np.minimum.reduceat(values, offsets) if len(offsets) else values
+    # Log growth sums along each run; the fall is 1 - exp(sum)
+    np.divide(values, 100, out=values)
+    np.maximum(values, -0.999999, out=values)
+    np.log1p(values, out=values)
+    log_change = np.add.reduceat(values, offsets) if len(offsets) else values
+
+    keep = duration >= min_duration
+    starts = starts[keep]
+    return Episodes((starts // (n_periods + 1) + path_offset).astype(np.int64),
+                    (starts % (n_periods + 1)).astype(np.int32), duration[keep].astype(np.int32),
+                    -np.expm1(log_change[keep]) * 100, worst[keep], n_paths, n_periods)
+
+
+def concat_episodes(parts):
+    """Episodes of consecutive blocks of paths (see path_offset) as one set."""
+    parts = list(parts)
+    arrays = [np.concatenate([getattr(part, field) for part in parts]) for field in Episodes._fields[:5]]
+    return Episodes(*arrays, sum(part.n_paths for part in parts), parts[0].n_periods if parts else 0)
+
+
+def _chunk_episodes(ensemble, start, stop, frequency, min_duration):
+    # Episodes of paths [start, stop) of a stored ensemble (or its directory, in a worker)
+    if not isinstance(ensemble, Ensemble):
+        ensemble = Ensemble(ensemble)
+    if 'growth' in ensemble.arrays:
+        growth = ensemble.read('growth', paths=slice(start, stop))
+    else:
+        growth = growth_from_log_levels(ensemble.read('log_levels', paths=slice(start, stop)))
+    return extract_episodes(growth, frequency, min_duration, path_offset=start)
+
+
+def ensemble_episodes(ensemble, frequency='annual', min_duration=None, n_workers=1):
+    """Episodes of every path of a stored ensemble.Ensemble, one stored chunk of paths at a time.
+
+    With n_workers > 1 the chunks are read and scanned on a process pool
+    (callers need the `if __name__ == '__main__':` guard, as for parallel.py).
+    """
+    bounds = [(int(a), int(b)) for a, b in zip(ensemble.starts[:-1], ensemble.starts[1:])]
+    n_workers = max(1, min(n_workers or os.cpu_count(), len(bounds)))
+    if n_workers == 1:
+        parts = [_chunk_episodes(ensemble, a, b, frequency, min_duration) for a, b in bounds]
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers) as pool:
+            futures = [pool.submit(_chunk_episodes, ensemble.directory, a, b, frequency, min_duration)
+                       for a, b in bounds]
+            parts = [future.result() for future in futures]
+    return concat_episodes(parts)
+
+
+def summarize(episodes, percentiles=DEFAULT_PERCENTILES):
+    """Duration, depth and per-path count distributions of a set of episodes."""
+    per_path = np.bincount(episodes.path, minlength=episodes.n_paths)
+    depth_percentiles = (np.percentile(episodes.depth, percentiles) if len(episodes.depth)
+                         else np.full(len(percentiles), np.nan))
+    probability = np.count_nonzero(per_path) / max(episodes.n_paths, 1)
+    return EpisodeSummary(episodes.n_paths, len(episodes.path), probability, np.bincount(per_path),
+                          np.bincount(episodes.duration), np.asarray(percentiles), depth_percentiles)
+
+
+def format_summary(summary, unit='year'):
+    """A few lines of text describing an EpisodeSummary."""
+    lines = ['%d recession episodes over %d paths; P(at least one) = %.4f'
+             % (summary.n_episodes, summary.n_paths, summary.probability)]
+    if summary.n_episodes:
+        # Durations covering 99.9% of episodes, then the long tail in one
+        share = summary.durations / summary.durations.sum()
+        last = int(np.searchsorted(np.cumsum(share), 0.999))
+        parts = ['%d %s%s %.3f' % (d, unit, '' if d == 1 else 's', share[d]) for d in range(1, last + 1) if share[d]]
+        if last + 1 < len(share):
+            parts.append('%d+ %ss %.3f' % (last + 1, unit, share[last + 1:].sum()))
+        lines.append('duration: ' + ', '.join(parts))
+        lines.append('depth (% fall): ' + ', '.join('p%g %.2f' % (p, v) for p, v in
+                                                   zip(summary.percentiles, summary.depth_percentiles)))
+    return '\n'.join(lines)
@@ -0,0 +1,104 @@
+import os
+import time
+import warnings
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+# forecast: forecast of the target series (e.g. GDP) using the exog forecasts
+# exog_forecast: DataFrame with one forecast column per exogenous series
+# result: the fitted target model
+# fits: one row per fit with its wall time, iterations and whether it hit the budget
+ExogForecast = namedtuple('ExogForecast', ['forecast', 'exog_forecast', 'result', 'fits'])
+
+# Per-fit defaults: the scripts used maxiter=100000, which mostly bought wall time
+DEFAULT_MAXITER = 1000
+DEFAULT_TIME_BUDGET = 60.0
+
+
+class _BudgetExceeded(Exception):
+    pass
+
+
+def fit_with_budget(model, maxiter=DEFAULT_MAXITER, time_budget=None, **fit_kwargs):
+    """Fit a statsmodels state-space model, stopping at maxiter or time_budget seconds.
+
+    When the time budget runs out, the model is evaluated at the optimizer's
+    last iterate instead of failing, so a slow fit still yields a usable
+    (if not fully converged) result. Returns (result, timed_out).
+    """
+    deadline = None if time_budget is None else time.monotonic() + time_budget
+    last = {}
+
+    def callback(xk, *args):
+        last['params'] = xk
+        if deadline is not None and time.monotonic() > deadline:
+            raise _BudgetExceeded
+
+    try:
+        return model.fit(maxiter=maxiter, disp=False, callback=callback, **fit_kwargs), False
+    except _BudgetExceeded:
+        # The optimizer works on unconstrained parameters
+        return model.smooth(model.transform_params(last['params'])), True
+
+
+def _fit_series(name, endog, exog, order, seasonal_order, maxiter, time_budget, store):
+    # Runs in a worker process
+    from statsmodels.tsa.statespace.sarimax import SARIMAX
+
+    started = time.perf_counter()
+    budget = {'timed_out': False}
+
+    def fit(model, **fit_kwargs):
+        result, budget['timed_out'] = fit_with_budget(model, maxiter, time_budget, **fit_kwargs)
+        return result
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        model = SARIMAX(endog, exog=exog, order=order, seasonal_order=seasonal_order)
+        if store is not None:
+            result, status = store.fit_statespace(model, name=name, fit=fit)
+        else:
+            result, status = fit(model), 'new'
+    retvals = getattr(result, 'mle_retvals', None) or {}
+    info = {'series': name, 'seconds': time.perf_counter() - started, 'status': status,
+            'iterations': retvals.get('iterations'), 'converged': bool(retvals.get('converged', False)),
+            'timed_out': budget['timed_out']}
+    return result, info
+
+
+def forecast_with_exog(train, target, exog_columns, steps, order=(1, 1, 1), seasonal_order=(0, 1, 1, 4),
+                       exog_order=None, exog_seasonal_order=None, maxiter=DEFAULT_MAXITER,
+                       time_budget=DEFAULT_TIME_BUDGET, n_workers=None, store=None):
+    """Forecast the exogenous series and feed them to the target's SARIMAX model.
+
+    Each exogenous column gets its own SARIMAX model (exog_order /
+    exog_seasonal_order, defaulting to the target's orders) and the target
+    gets a SARIMAX model on the observed exog. None of these fits depends on
+    another, so all of them run at once on a process pool, each capped at
+    maxiter iterations and time_budget seconds; wall time is that of the
+    slowest fit. The exog forecasts then drive the target's forecast. With a
+    model_store.ModelStore, unchanged series skip their fit and grown ones
+    start from the stored parameters.
+    """
+    exog_columns = list(exog_columns)
+    exog_order = exog_order or order
+    exog_seasonal_order = exog_seasonal_order or seasonal_order
+    jobs = [(column, train[column], None, exog_order, exog_seasonal_order) for column in exog_columns]
+    jobs.append((target, train[target], train[exog_columns], order, seasonal_order))
+
+    n_workers = min(n_workers or os.cpu_count(), len(jobs))
+    if n_workers > 1:
+        with ProcessPoolExecutor(max_workers=n_workers) as pool:
+            futures = [pool.submit(_fit_series, *job, maxiter, time_budget, store) for job in jobs]
+            fitted = [future.result() for future in futures]
+    else:
+        fitted = [_fit_series(*job, maxiter, time_budget, store) for job in jobs]
+
+    exog_forecast = pd.DataFrame({column: result.forecast(steps)
+                                  for column, (result, _) in zip(exog_columns, fitted)})
+    result = fitted[-1][0]
+    forecast = result.forecast(steps, exog=exog_forecast[exog_columns])
+    fits = pd.DataFrame([info for _, info in fitted])
+    return ExogForecast(forecast, exog_forecast, result, fits)
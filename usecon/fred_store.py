@@ -0,0 +1,246 @@
+import hashlib
+import http.client
+import json
+import os
+import threading
+import time
+import urllib.error
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# Where FRED series are fetched from. Any URL template containing {series_id}
+# works, so a local HTTP stand-in (e.g. `python -m http.server` serving
+# GDP.csv, DFF.csv, ...) can be used with 'http://localhost:8000/{series_id}.csv'.
+# A plain directory path holding <series_id>.csv files works too, as does a
+# path template such as '/data/{series_id}.csv' (either with or without file://).
+FRED_CSV_URL = 'https://fred.stlouisfed.org/graph/fredgraph.csv?id={series_id}'
+
+# Parsed series are kept here as .npz files (datetime64[D] dates + float64 values)
+DEFAULT_STORE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'us-econ-growth', 'fred')
+
+# How long a stored series is trusted before we ask the source whether it changed
+DEFAULT_MAX_AGE = 12 * 60 * 60
+
+# Concurrent downloads used by load_many()
+DEFAULT_MAX_WORKERS = 8
+
+# One keep-alive connection per (thread, host), so repeated downloads from the
+# same worker skip the TCP/TLS handshake
+_connections = threading.local()
+
+
+def parse_fred_csv(text):
+    # fredgraph.csv is "DATE,<ID>" (newer exports use "observation_date,<ID>")
+    # with ISO dates and '.' for missing observations. Parsing it by hand is
+    # much cheaper than pd.read_csv + pd.to_datetime.
+    lines = text.strip().splitlines()[1:]
+    dates = np.array([line[:10] for line in lines], dtype='datetime64[D]')
+    values = np.array([_to_float(line[11:]) for line in lines], dtype=np.float64)
+
+    if len(dates) > 1 and (np.diff(dates) < np.timedelta64(0, 'D')).any():
+        order = np.argsort(dates, kind='stable')
+        dates, values = dates[order], values[order]
+    return dates, values
+
+
+def _http_get(url, headers, redirects=5):
+    parts = urllib.parse.urlsplit(url)
+    pool = getattr(_connections, 'pool', None)
+    if pool is None:
+        pool = _connections.pool = {}
+    key = (parts.scheme, parts.netloc)
+    path = parts.path or '/'
+    if parts.query:
+        path += '?' + parts.query
+
+    for attempt in range(2):
+        conn = pool.get(key)
+        if conn is None:
+            conn_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+            conn = pool[key] = conn_class(parts.netloc, timeout=30)
+        try:
+            conn.request('GET', path, headers=headers)
+            response = conn.getresponse()
+            body = response.read()
+            break
+        except (http.client.HTTPException, OSError):
+            # The server may have dropped an idle keep-alive connection; retry once on a fresh one
+            conn.close()
+            del pool[key]
+            if attempt:
+                raise
+
+    if response.status in (301, 302, 303, 307, 308) and redirects:
+        location = urllib.parse.urljoin(url, response.headers['Location'])
+        return _http_get(location, headers, redirects - 1)
+    if response.status >= 400:
+        raise urllib.error.HTTPError(url, response.status, response.reason, response.headers, None)
+    return response.status, response.headers, body
+
+
+def _to_float(field):
+    field = field.strip()
+    if field in ('', '.'):
+        return np.nan
+    return float(field)
+
+
+class SeriesStore:
+    """Local store of parsed FRED series, keyed by series ID.
+
+    A series is downloaded once and kept as a typed `.npz` file. Later loads
+    read that file without touching the network; the source is only asked
+    again once the stored copy is older than `max_age`, and the file is only
+    rewritten when the data actually changed.
+    """
+
+    def __init__(self, root=None, source=None, max_age=None, offline=None):
+        self.root = root or os.environ.get('USECON_STORE_DIR', DEFAULT_STORE_DIR)
+        self.source = source or os.environ.get('USECON_FRED_SOURCE', FRED_CSV_URL)
+        if max_age is None:
+            max_age = float(os.environ.get('USECON_MAX_AGE', DEFAULT_MAX_AGE))
+        self.max_age = max_age
+        if offline is None:
+            offline = os.environ.get('USECON_OFFLINE', '') not in ('', '0')
+        self.offline = offline
+        os.makedirs(self.root, exist_ok=True)
+
+    def path(self, series_id):
+        return os.path.join(self.root, series_id + '.npz')
+
+    def _meta_path(self, series_id):
+        return os.path.join(self.root, series_id + '.json')
+
+    def _read_meta(self, series_id):
+        try:
+            with open(self._meta_path(series_id)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_meta(self, series_id, meta):
+        tmp = self._meta_path(series_id) + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp, self._meta_path(series_id))
+
+    def _write_arrays(self, series_id, dates, values):
+        tmp = self.path(series_id) + '.tmp.npz'
+        np.savez(tmp, dates=dates, values=values)
+        os.replace(tmp, self.path(series_id))
+
+    def is_fresh(self, series_id):
+        meta = self._read_meta(series_id)
+        if not meta or not os.path.exists(self.path(series_id)):
+            return False
+        return self.offline or time.time() - meta.get('checked', 0) < self.max_age
+
+    def _fetch(self, series_id, meta):
+        # Returns the raw CSV bytes plus validators, or None if unchanged
+        source = self.source
+        if source.startswith('file://'):
+            source = source[len('file://'):]
+        location = source.format(series_id=series_id)
+        # A plain directory holds <series_id>.csv; a path template names the file itself
+        if '://' not in location and '{series_id}' not in source:
+            location = os.path.join(location, series_id + '.csv')
+
+        if '://' not in location:
+            stat = os.stat(location)
+            validator = '%d-%d' % (stat.st_mtime_ns, stat.st_size)
+            if validator == meta.get('etag'):
+                return None
+            with open(location, 'rb') as f:
+                return f.read(), {'etag': validator}
+
+        headers = {}
+        if meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+        status, response_headers, body = _http_get(location, headers)
+        if status == 304:
+            return None
+        return body, {'etag': response_headers.get('ETag'),
+                      'last_modified': response_headers.get('Last-Modified')}
+
+    def _store_response(self, series_id, meta, fetched):
+        # Parse + persist only if the payload differs from what is already on disk
+        changed = False
+        if fetched is not None:
+            body, validators = fetched
+            digest = hashlib.sha1(body).hexdigest()
+            if digest != meta.get('sha1') or not os.path.exists(self.path(series_id)):
+                dates, values = parse_fred_csv(body.decode('utf-8'))
+                self._write_arrays(series_id, dates, values)
+                changed = True
+            meta.update(validators)
+            meta['sha1'] = digest
+        meta['checked'] = time.time()
+        self._write_meta(series_id, meta)
+        return changed
+
+    def refresh(self, series_id, force=False):
+        """Ask the source for a newer copy; returns True if the series changed."""
+        if self.offline:
+            if not os.path.exists(self.path(series_id)):
+                raise FileNotFoundError('%s is not in the local store at %s and USECON_OFFLINE is set'
+                                        % (series_id, self.root))
+            return False
+        meta = {}
+        if not force and os.path.exists(self.path(series_id)):
+            meta = self._read_meta(series_id)
+        return self._store_response(series_id, meta, self._fetch(series_id, meta))
+
+    def load_arrays(self, series_id, refresh=False):
+        """Return (dates, values) as datetime64[D] / float64 arrays."""
+        if refresh or not self.is_fresh(series_id):
+            self.refresh(series_id)
+        with np.load(self.path(series_id)) as data:
+            return data['dates'], data['values']
+
+    def load(self, series_id, refresh=False):
+        """Return the series as a one-column DataFrame indexed by DATE."""
+        # pandas only here: load_arrays() callers (e.g. the CLI) never pay for it
+        import pandas as pd
+
+        dates, values = self.load_arrays(series_id, refresh=refresh)
+        index = pd.DatetimeIndex(dates, name='DATE')
+        return pd.DataFrame({series_id: values}, index=index)
+
+    def load_many(self, series_ids, refresh=False, max_workers=DEFAULT_MAX_WORKERS):
+        """Load several series, fetching the stale ones concurrently.
+
+        Each worker downloads, parses and stores its series on its own, so a
+        series is parsed while the others are still in flight. Returns a dict
+        of DataFrames keyed by series ID, in the order given.
+        """
+        series_ids = list(series_ids)
+        stale = [s for s in dict.fromkeys(series_ids) if refresh or not self.is_fresh(s)]
+        if len(stale) > 1 and not self.offline:
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(stale))) as pool:
+                list(pool.map(self.refresh, stale))
+        else:
+            for series_id in stale:
+                self.refresh(series_id)
+        return {s: self.load(s) for s in series_ids}
+
+
+_default_store = None
+
+
+def default_store():
+    global _default_store
+    if _default_store is None:
+        _default_store = SeriesStore()
+    return _default_store
+
+
+def load_series(series_id, refresh=False):
+    return default_store().load(series_id, refresh=refresh)
+
+
+def load_many(series_ids, refresh=False, max_workers=DEFAULT_MAX_WORKERS):
+    return default_store().load_many(series_ids, refresh=refresh, max_workers=max_workers)
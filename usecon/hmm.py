@@ -0,0 +1,297 @@
+import math
+
+import numpy as np
+
+# Array layout used throughout this module:
+#   X          (B, T, D)     B sequences padded to length T, D features
+#   mask       (B, T)        True where X holds a real observation
+#   log_b      (R, B, T, K)  log emission probability under R parameter sets
+#   startprob  (R, K), transmat (R, K, K), means / covars (R, K, D)
+# R is the number of parameter sets (random restarts) evaluated together, so
+# every recursion below runs over all restarts and all sequences in one array
+# operation per time step. Padded steps after the end of a sequence behave
+# like an identity transition with no emission, which leaves every
+# likelihood and state path exactly as if the sequence had stopped there.
+
+# Rows of xi (the pairwise state posteriors) are built for this many time
+# steps at a time, which bounds memory on long sequences
+XI_BLOCK = 4096
+
+
+def logsumexp(a, axis):
+    peak = np.max(a, axis=axis, keepdims=True)
+    peak = np.where(np.isfinite(peak), peak, 0.0)
+    with np.errstate(divide='ignore'):
+        return np.log(np.sum(np.exp(a - peak), axis=axis)) + np.squeeze(peak, axis=axis)
+
+
+def pad_sequences(X, lengths=None):
+    """Split hmmlearn-style concatenated X by lengths into a padded (B, T, D) batch."""
+    X = np.asarray(X, dtype=np.float64)
+    if X.ndim == 1:
+        X = X[:, None]
+    if lengths is None:
+        lengths = [len(X)]
+    lengths = np.asarray(lengths, dtype=np.intp)
+    out = np.zeros((len(lengths), lengths.max(), X.shape[1]))
+    mask = np.zeros((len(lengths), lengths.max()), dtype=bool)
+    start = 0
+    for b, n in enumerate(lengths):
+        out[b, :n] = X[start:start + n]
+        mask[b, :n] = True
+        start += n
+    return out, mask
+
+
+def gaussian_log_emissions(X, means, covars):
+    # Diagonal Gaussian; covars are per-feature variances
+    diff = X[None, :, :, None, :] - means[:, None, None, :, :]
+    return -0.5 * (np.log(2 * np.pi * covars)[:, None, None] + diff ** 2 / covars[:, None, None]).sum(-1)
+
+
+def student_t_log_emissions(X, means, covars, dof):
+    # Independent Student-t per feature with scale^2 = covars and fixed dof
+    diff = X[None, :, :, None, :] - means[:, None, None, :, :]
+    const = math.lgamma((dof + 1) / 2) - math.lgamma(dof / 2) - 0.5 * math.log(dof * math.pi)
+    z2 = diff ** 2 / covars[:, None, None]
+    return (const - 0.5 * np.log(covars)[:, None, None] - (dof + 1) / 2 * np.log1p(z2 / dof)).sum(-1)
+
+
+def forward(log_b, log_startprob, log_transmat, mask):
+    """Log-space forward pass; returns (log_alpha, loglik) with loglik (R, B)."""
+    log_alpha = np.empty_like(log_b)
+    log_alpha[:, :, 0] = log_startprob[:, None, :] + log_b[:, :, 0]
+    A = log_transmat[:, None]
+    for t in range(1, log_b.shape[2]):
+        step = logsumexp(log_alpha[:, :, t - 1, :, None] + A, axis=2) + log_b[:, :, t]
+        log_alpha[:, :, t] = np.where(mask[None, :, t, None], step, log_alpha[:, :, t - 1])
+    return log_alpha, logsumexp(log_alpha[:, :, -1], axis=-1)
+
+
+def backward(log_b, log_transmat, mask):
+    log_beta = np.zeros_like(log_b)
+    A = log_transmat[:, None]
+    for t in range(log_b.shape[2] - 2, -1, -1):
+        step = logsumexp(A + (log_b[:, :, t + 1] + log_beta[:, :, t + 1])[:, :, None, :], axis=3)
+        log_beta[:, :, t] = np.where(mask[None, :, t + 1, None], step, 0.0)
+    return log_beta
+
+
+def viterbi(log_b, log_startprob, log_transmat, mask):
+    """Most likely state paths; returns (states (R, B, T), log probability (R, B))."""
+    R, B, T, K = log_b.shape
+    identity = np.arange(K)
+    delta = log_startprob[:, None, :] + log_b[:, :, 0]
+    back = np.empty((R, B, T, K), dtype=np.intp)
+    back[:, :, 0] = identity
+    A = log_transmat[:, None]
+    for t in range(1, T):
+        scores = delta[..., :, None] + A
+        best = scores.argmax(axis=2)
+        step = np.take_along_axis(scores, best[..., None, :], axis=2)[..., 0, :] + log_b[:, :, t]
+        valid = mask[None, :, t, None]
+        delta = np.where(valid, step, delta)
+        back[:, :, t] = np.where(valid, best, identity)
+
+    states = np.empty((R, B, T), dtype=np.intp)
+    last = delta.argmax(axis=-1)
+    for t in range(T - 1, -1, -1):
+        states[:, :, t] = last
+        last = np.take_along_axis(back[:, :, t], last[..., None], axis=-1)[..., 0]
+    return states, delta.max(axis=-1)
+
+
+def sample_states(log_b, log_startprob, log_transmat, mask, rng=None):
+    """Forward-filtering backward-sampling of state paths.
+
+    Draws one state path per parameter set and sequence from the posterior
+    given those parameters, e.g. one per posterior draw of a Bayesian model
+    whose likelihood integrated the states out. Returns (R, B, T) states,
+    -1 on padded steps.
+    """
+    rng = np.random.default_rng(rng)
+    R, B, T, K = log_b.shape
+    log_alpha, _ = forward(log_b, log_startprob, log_transmat, mask)
+    A = np.broadcast_to(log_transmat[:, None], (R, B, K, K))
+    states = np.full((R, B, T), -1, dtype=np.intp)
+    for t in range(T - 1, -1, -1):
+        log_p = log_alpha[:, :, t]
+        if t + 1 < T:
+            # p(s_t | s_t+1, x_1..t) is proportional to alpha_t(i) * A[i, s_t+1]
+            following = np.maximum(states[:, :, t + 1], 0)
+            column = np.take_along_axis(A, following[..., None, None], axis=3)[..., 0]
+            log_p = np.where(mask[None, :, t + 1, None], log_p + column, log_p)
+        p = np.exp(log_p - logsumexp(log_p, axis=-1)[..., None])
+        draw = (rng.random((R, B, 1)) > np.cumsum(p, axis=-1)).sum(axis=-1)
+        states[:, :, t] = np.where(mask[None, :, t], np.minimum(draw, K - 1), -1)
+    return states
+
+
+def expected_transitions(log_alpha, log_beta, log_b, log_transmat, loglik, mask):
+    # Sum over sequences and time of the pairwise posteriors xi[t, i, j]
+    R, B, T, K = log_b.shape
+    total = np.zeros((R, K, K))
+    after = log_b + log_beta
+    for s in range(0, T - 1, XI_BLOCK):
+        e = min(s + XI_BLOCK, T - 1)
+        log_xi = (log_alpha[:, :, s:e, :, None] + log_transmat[:, None, None]
+                  + after[:, :, s + 1:e + 1, None, :] - loglik[:, :, None, None, None])
+        total += (np.exp(log_xi) * mask[None, :, s + 1:e + 1, None, None]).sum(axis=(1, 2))
+    return total
+
+
+class RegimeHMM:
+    """Hidden Markov model with Gaussian or Student-t emissions, in pure NumPy.
+
+    Follows the hmmlearn GaussianHMM interface (fit/predict/score,
+    startprob_/transmat_/means_/covars_, init_params) with diagonal
+    covariances; covars_ has shape (n_components, n_features). fit() runs
+    n_restarts randomly initialised Baum-Welch fits as one batched array
+    computation over all restarts and sequences, and keeps the best.
+    """
+
+    def __init__(self, n_components=2, emission='gaussian', dof=5.0, n_iter=100, tol=1e-4, n_restarts=1,
+                 min_covar=1e-3, init_params='stmc', random_state=None):
+        if emission not in ('gaussian', 't'):
+            raise ValueError("emission must be 'gaussian' or 't'")
+        self.n_components = n_components
+        self.emission = emission
+        self.dof = dof
+        self.n_iter = n_iter
+        self.tol = tol
+        self.n_restarts = n_restarts
+        self.min_covar = min_covar
+        self.init_params = init_params
+        self.random_state = random_state
+
+    def _log_emissions(self, X, means, covars):
+        if self.emission == 't':
+            return student_t_log_emissions(X, means, covars, self.dof)
+        return gaussian_log_emissions(X, means, covars)
+
+    def _init_batch(self, X, mask, rng):
+        R, K = self.n_restarts, self.n_components
+        observed = X[mask]
+        D = observed.shape[1]
+        if 's' in self.init_params or not hasattr(self, 'startprob_'):
+            startprob = np.full((R, K), 1.0 / K)
+        else:
+            startprob = np.broadcast_to(self.startprob_, (R, K)).copy()
+        if 't' in self.init_params or not hasattr(self, 'transmat_'):
+            # Sticky random rows: regimes persist, as they do in GDP data
+            transmat = 0.5 * np.eye(K) + 0.5 * rng.dirichlet(np.ones(K), size=(R, K))
+        else:
+            transmat = np.broadcast_to(self.transmat_, (R, K, K)).copy()
+        if 'm' in self.init_params or not hasattr(self, 'means_'):
+            picks = np.stack([rng.choice(len(observed), K, replace=len(observed) < K) for _ in range(R)])
+            # Each restart's picked rows, ordered by their first feature (rows kept whole)
+            means = observed[picks]
+            means = np.take_along_axis(means, np.argsort(means[..., 0], axis=1)[..., None], axis=1)
+        else:
+            means = np.broadcast_to(np.reshape(self.means_, (K, D)), (R, K, D)).copy()
+        if 'c' in self.init_params or not hasattr(self, 'covars_'):
+            covars = np.broadcast_to(observed.var(axis=0) + self.min_covar, (R, K, D)).copy()
+        else:
+            covars = np.broadcast_to(np.reshape(self.covars_, (K, D)), (R, K, D)).copy()
+        return startprob, transmat, means, covars
+
+    def _m_step(self, X, mask, gamma, xi, means, covars):
+        startprob = gamma[:, :, 0].sum(axis=1)
+        startprob /= startprob.sum(axis=-1, keepdims=True)
+        transmat = xi + 1e-12
+        transmat /= transmat.sum(axis=-1, keepdims=True)
+
+        occupancy = gamma.sum(axis=(1, 2))[..., None] + 1e-12
+        if self.emission == 't':
+            # ECM step for fixed dof: each observation is down-weighted by its
+            # latent precision u = (dof + 1) / (dof + z^2)
+            diff = X[None, :, :, None, :] - means[:, None, None]
+            u = (self.dof + 1) / (self.dof + diff ** 2 / covars[:, None, None])
+            weights = gamma[..., None] * u
+        else:
+            weights = np.broadcast_to(gamma[..., None], gamma.shape + (X.shape[-1],))
+        means = np.einsum('rbtkd,btd->rkd', weights, X) / (weights.sum(axis=(1, 2)) + 1e-12)
+        diff2 = (X[None, :, :, None, :] - means[:, None, None]) ** 2
+        covars = (weights * diff2).sum(axis=(1, 2)) / occupancy + self.min_covar
+        return startprob, transmat, means, covars
+
+    def fit(self, X, lengths=None):
+        X, mask = pad_sequences(X, lengths)
+        rng = np.random.default_rng(self.random_state)
+        startprob, transmat, means, covars = self._init_batch(X, mask, rng)
+
+        previous = np.full(self.n_restarts, -np.inf)
+        for iteration in range(self.n_iter):
+            log_b = self._log_emissions(X, means, covars)
+            with np.errstate(divide='ignore'):
+                log_startprob, log_transmat = np.log(startprob), np.log(transmat)
+            log_alpha, loglik = forward(log_b, log_startprob, log_transmat, mask)
+            total = loglik.sum(axis=1)
+            # Restarts that degenerated to a NaN likelihood do not hold up convergence
+            finite = np.isfinite(total)
+            if np.all(np.abs(total - previous)[finite] < self.tol):
+                break
+            previous = total
+            log_beta = backward(log_b, log_transmat, mask)
+            gamma = np.exp(log_alpha + log_beta - loglik[:, :, None, None]) * mask[None, :, :, None]
+            xi = expected_transitions(log_alpha, log_beta, log_b, log_transmat, loglik, mask)
+            startprob, transmat, means, covars = self._m_step(X, mask, gamma, xi, means, covars)
+
+        # Degenerate restarts (non-finite likelihood) are never picked
+        if not np.isfinite(total).any():
+            raise ValueError('every restart ended with a non-finite log-likelihood')
+        best = int(np.argmax(np.where(np.isfinite(total), total, -np.inf)))
+        self.startprob_, self.transmat_ = startprob[best], transmat[best]
+        self.means_, self.covars_ = means[best], covars[best]
+        self.restart_logliks_ = total
+        self.loglik_ = float(total[best])
+        self.n_iter_ = iteration + 1
+        return self
+
+    def _batch_inputs(self, X, lengths):
+        X, mask = pad_sequences(X, lengths)
+        log_b = self._log_emissions(X, self.means_[None], self.covars_[None])
+        with np.errstate(divide='ignore'):
+            return X, mask, log_b, np.log(self.startprob_)[None], np.log(self.transmat_)[None]
+
+    def score(self, X, lengths=None):
+        """Total log-likelihood of the sequences."""
+        _, mask, log_b, log_startprob, log_transmat = self._batch_inputs(X, lengths)
+        return float(forward(log_b, log_startprob, log_transmat, mask)[1].sum())
+
+    def predict_proba(self, X, lengths=None):
+        """Posterior state probabilities, (n_samples, n_components) like hmmlearn."""
+        _, mask, log_b, log_startprob, log_transmat = self._batch_inputs(X, lengths)
+        log_alpha, loglik = forward(log_b, log_startprob, log_transmat, mask)
+        log_beta = backward(log_b, log_transmat, mask)
+        posteriors = np.exp(log_alpha + log_beta - loglik[:, :, None, None])[0]
+        return posteriors[mask]
+
+    def predict(self, X, lengths=None):
+        """Viterbi state sequence, concatenated over sequences like hmmlearn."""
+        _, mask, log_b, log_startprob, log_transmat = self._batch_inputs(X, lengths)
+        states, _ = viterbi(log_b, log_startprob, log_transmat, mask)
+        return states[0][mask]
+
+    def n_parameters(self):
+        K, D = np.shape(self.means_)
+        return (K - 1) + K * (K - 1) + 2 * K * D
+
+    def bic(self, X, lengths=None):
+        n = len(np.asarray(X))
+        return -2 * self.score(X, lengths) + self.n_parameters() * np.log(n)
+
+    def sample(self, n_samples, initial_state=None, random_state=None):
+        """Draw one sequence; returns (X (n_samples, n_features), states)."""
+        rng = np.random.default_rng(random_state)
+        K, D = np.shape(self.means_)
+        states = np.empty(n_samples, dtype=np.intp)
+        state = rng.choice(K, p=self.startprob_) if initial_state is None else initial_state
+        for t in range(n_samples):
+            states[t] = state
+            state = rng.choice(K, p=self.transmat_[state])
+        if self.emission == 't':
+            noise = rng.standard_t(self.dof, size=(n_samples, D))
+        else:
+            noise = rng.standard_normal((n_samples, D))
+        return self.means_[states] + noise * np.sqrt(self.covars_[states]), states
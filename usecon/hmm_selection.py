@@ -0,0 +1,157 @@
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from .hmm import RegimeHMM
+from .simulation import stationary_distribution
+
+# model: the selected RegimeHMM, fitted on all of X
+# table: one row per number of states with its best score and how many restarts it took
+HMMSelection = namedtuple('HMMSelection', ['model', 'n_components', 'table'])
+
+# Restarts batched into one RegimeHMM fit per job; extra restarts in the same
+# array computation cost little next to a separate fit
+DEFAULT_RESTARTS_PER_JOB = 16
+
+# Jobs per wave of restarts. Fixed rather than one per worker, so the seeds,
+# and the selected model, do not depend on the machine's CPU count
+DEFAULT_JOBS_PER_WAVE = 8
+
+
+def split_state(model):
+    """Parameters for a K + 1 state model made by splitting one state of a fitted K state model.
+
+    The state with the largest stationary weight times variance is split in
+    two with means half a standard deviation either side of the original.
+    Both halves keep the original's transitions, sharing the probability of
+    moving into it, so the new model starts close to the old optimum.
+    Returns (startprob, transmat, means, covars).
+    """
+    K = model.n_components
+    weight = stationary_distribution(model.transmat_) * model.covars_.sum(axis=1)
+    s = int(np.argmax(weight))
+    order = np.r_[np.arange(K), s]
+
+    startprob = model.startprob_[order]
+    startprob[[s, K]] /= 2
+    transmat = model.transmat_[order][:, order]
+    transmat[:, [s, K]] /= 2
+    means = model.means_[order]
+    offset = 0.5 * np.sqrt(model.covars_[s])
+    means[s] -= offset
+    means[K] += offset
+    covars = model.covars_[order]
+    return startprob, transmat, means, covars
+
+
+def _fit_job(X, lengths, n_components, n_restarts, seed, init, model_kwargs):
+    # Runs in a worker process. init holds (startprob, transmat, means, covars)
+    # for a warm start, in which case one EM run starts exactly there.
+    if init is None:
+        model = RegimeHMM(n_components, n_restarts=n_restarts, random_state=seed, **model_kwargs)
+    else:
+        model = RegimeHMM(n_components, n_restarts=1, init_params='', random_state=seed, **model_kwargs)
+        model.startprob_, model.transmat_, model.means_, model.covars_ = init
+    return model.fit(X, lengths)
+
+
+def _split_sequences(X, lengths, train_fraction):
+    # First train_fraction of every sequence, as (X, lengths)
+    X = np.asarray(X)
+    lengths = [len(X)] if lengths is None else list(lengths)
+    starts = np.cumsum([0] + lengths[:-1])
+    train_lengths = [max(2, int(round(n * train_fraction))) for n in lengths]
+    train = np.concatenate([X[start:start + n] for start, n in zip(starts, train_lengths)])
+    return train, train_lengths
+
+
+def select_hmm(X, lengths=None, k_range=range(2, 6), criterion='bic', train_fraction=0.8, n_workers=None,
+               restarts_per_job=DEFAULT_RESTARTS_PER_JOB, jobs_per_wave=DEFAULT_JOBS_PER_WAVE, max_restarts=200,
+               patience=2, tol=1e-2, random_state=None, **model_kwargs):
+    """Pick the number of HMM states by BIC or held-out likelihood, with many EM restarts.
+
+    For each K in k_range, restarts run in waves of jobs_per_wave jobs on a
+    process pool of n_workers, each job fitting restarts_per_job random
+    starts at once, so for a given random_state the result does not depend
+    on n_workers. Every K after the first also gets one start made by
+    splitting a state of the best fit with one state fewer (see
+    split_state). Restarts for a K stop once `patience` waves in a row fail
+    to raise the best log-likelihood by more than tol, or after max_restarts.
+
+    criterion='bic' scores each K's best fit on all of X. With 'heldout',
+    models are fitted on the first train_fraction of each sequence and
+    scored by the log-likelihood of the rest given that first part; the
+    chosen K is then refitted on all of X starting from its best fit.
+    Remaining keyword arguments go to RegimeHMM (emission, n_iter, ...).
+    """
+    if criterion not in ('bic', 'heldout'):
+        raise ValueError("criterion must be 'bic' or 'heldout'")
+    X = np.asarray(X, dtype=np.float64)
+    if X.ndim == 1:
+        X = X[:, None]
+    if criterion == 'heldout':
+        fit_X, fit_lengths = _split_sequences(X, lengths, train_fraction)
+    else:
+        fit_X, fit_lengths = X, lengths
+
+    n_workers = n_workers or os.cpu_count()
+    root = np.random.SeedSequence(random_state)
+    pool = ProcessPoolExecutor(max_workers=n_workers) if n_workers > 1 else None
+
+    def run(jobs):
+        if pool is not None and len(jobs) > 1:
+            futures = [pool.submit(_fit_job, fit_X, fit_lengths, *job, model_kwargs) for job in jobs]
+            return [future.result() for future in futures]
+        return [_fit_job(fit_X, fit_lengths, *job, model_kwargs) for job in jobs]
+
+    best_models = {}
+    rows = []
+    try:
+        previous = None
+        for K in k_range:
+            # Seeds depend only on random_state and K, not on the order K is visited
+            seeds = np.random.SeedSequence(root.entropy, spawn_key=(K,))
+            jobs = [(K, restarts_per_job, seed, None) for seed in seeds.spawn(jobs_per_wave)]
+            if previous is not None and K == previous.n_components + 1:
+                jobs[-1] = (K, 1, jobs[-1][2], split_state(previous))
+            best, restarts, stale, waves = None, 0, 0, 0
+            while jobs:
+                for model in run(jobs):
+                    restarts += model.n_restarts
+                    if best is None or model.loglik_ > best.loglik_ + tol:
+                        best, stale = model, -1
+                    elif model.loglik_ > best.loglik_:
+                        best = model
+                stale += 1
+                waves += 1
+                if stale >= patience or restarts >= max_restarts:
+                    break
+                jobs = [(K, restarts_per_job, seed, None) for seed in seeds.spawn(jobs_per_wave)]
+            best_models[K] = previous = best
+
+            row = {'n_components': K, 'restarts': restarts, 'waves': waves, 'loglik': best.loglik_,
+                   'n_parameters': best.n_parameters()}
+            if criterion == 'heldout':
+                row['heldout_loglik'] = best.score(X, lengths) - best.score(fit_X, fit_lengths)
+            else:
+                row['bic'] = best.bic(X, lengths)
+            rows.append(row)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    table = pd.DataFrame(rows)
+    if criterion == 'heldout':
+        table = table.sort_values('heldout_loglik', ascending=False)
+    else:
+        table = table.sort_values('bic')
+    table = table.reset_index(drop=True)
+    n_components = int(table['n_components'].iloc[0])
+    model = best_models[n_components]
+    if criterion == 'heldout':
+        init = (model.startprob_, model.transmat_, model.means_, model.covars_)
+        model = _fit_job(X, lengths, n_components, 1, None, init, model_kwargs)
+    return HMMSelection(model, n_components, table)
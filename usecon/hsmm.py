@@ -0,0 +1,310 @@
+import numpy as np
+
+from .hmm import gaussian_log_emissions, logsumexp, pad_sequences
+from .simulation import (DEFAULT_PERCENTILES, SimulationResult, TransitionSampler, growth_to_log_levels,
+                         percentile_bands, stationary_distribution)
+
+# Explicit-duration (semi-Markov) regimes: each regime spell lasts d steps,
+# d drawn from that regime's own duration distribution (durations_[k, d - 1]),
+# after which transmat_ (zero diagonal) picks the next regime. A two-year
+# recession is then a duration, not an extra state.
+#
+# Spells longer than this many steps cannot be represented, so it has to
+# exceed the longest expansion in the data
+DEFAULT_MAX_DURATION = 30
+
+
+def duration_survival(durations):
+    # P(d >= j) for j = 1..max_duration, per regime
+    return np.cumsum(durations[:, ::-1], axis=1)[:, ::-1]
+
+
+def _cumulative_emissions(log_b):
+    # C[t] = sum of log_b[:t], so a spell s..t emits C[t + 1] - C[s]
+    return np.vstack([np.zeros(log_b.shape[1]), np.cumsum(log_b, axis=0)])
+
+
+def segment_forward(log_b, log_startprob, log_transmat, log_durations, log_survival):
+    """Forward pass of an explicit-duration HSMM over one (T, K) sequence of log emissions.
+
+    Whole-spell emissions come from a cumulative sum of log_b, so each time
+    step costs O(K * max_duration) and the pass O(T * K * max_duration).
+    Returns (log_start, log_end, loglik): log_start[s, k] is the log
+    probability of x_0..x_s-1 and a spell of k starting at s, log_end[t, k]
+    that of x_0..x_t and a spell of k ending at t. The last spell is right
+    censored: it only has to last until the end of the data.
+    """
+    T, K = log_b.shape
+    D = log_durations.shape[1]
+    C = _cumulative_emissions(log_b)
+    log_start = np.empty((T, K))
+    log_end = np.empty((T, K))
+    for t in range(T):
+        if t == 0:
+            log_start[0] = log_startprob
+        else:
+            log_start[t] = logsumexp(log_end[t - 1][:, None] + log_transmat, axis=0)
+        d = np.arange(1, min(D, t + 1) + 1)
+        starts = t + 1 - d
+        log_d = (log_survival if t == T - 1 else log_durations)[:, d - 1].T
+        log_end[t] = logsumexp(log_start[starts] + (C[t + 1] - C[starts]) + log_d, axis=0)
+    return log_start, log_end, float(logsumexp(log_end[-1], axis=0))
+
+
+def segment_backward(log_b, log_transmat, log_durations, log_survival):
+    """Backward pass matching segment_forward.
+
+    Returns (after_start, after_end): after_start[s, k] is the log
+    probability of x_s..x_T-1 given a spell of k starts at s, after_end[t, k]
+    that of x_t+1..x_T-1 given a spell of k ends at t.
+    """
+    T, K = log_b.shape
+    D = log_durations.shape[1]
+    C = _cumulative_emissions(log_b)
+    after_start = np.empty((T, K))
+    after_end = np.zeros((T, K))
+    for s in range(T - 1, -1, -1):
+        if s < T - 1:
+            after_end[s] = logsumexp(log_transmat + after_start[s + 1], axis=1)
+        d = np.arange(1, min(D, T - s) + 1)
+        ends = s + d - 1
+        log_d = np.where((ends == T - 1)[:, None], log_survival[:, d - 1].T, log_durations[:, d - 1].T)
+        after_start[s] = logsumexp(log_d + (C[ends + 1] - C[s]) + after_end[ends], axis=0)
+    return after_start, after_end
+
+
+def _posteriors(log_b, log_startprob, log_transmat, log_durations, log_survival):
+    # Expected sufficient statistics of one sequence for EM
+    T, K = log_b.shape
+    D = log_durations.shape[1]
+    log_start, log_end, loglik = segment_forward(log_b, log_startprob, log_transmat, log_durations,
+                                                 log_survival)
+    after_start, after_end = segment_backward(log_b, log_transmat, log_durations, log_survival)
+    start_post = np.exp(log_start + after_start - loglik)
+    end_post = np.exp(log_end + after_end - loglik)
+    # A regime is occupied at t if one of its spells started by t and did not end before t
+    gamma = np.cumsum(start_post, axis=0)
+    gamma[1:] -= np.cumsum(end_post[:-1], axis=0)
+    gamma = np.clip(gamma, 0.0, 1.0)
+    xi = np.exp(log_end[:-1, :, None] + log_transmat + after_start[1:, None, :] - loglik).sum(axis=0)
+
+    # The censored last spell is counted at its observed length
+    C = _cumulative_emissions(log_b)
+    duration_counts = np.zeros((K, D))
+    for d in range(1, min(D, T) + 1):
+        starts = np.arange(T - d + 1)
+        ends = starts + d - 1
+        log_d = np.where((ends == T - 1)[:, None], log_survival[:, d - 1], log_durations[:, d - 1])
+        duration_counts[:, d - 1] = np.exp(log_start[starts] + (C[ends + 1] - C[starts]) + log_d
+                                           + after_end[ends] - loglik).sum(axis=0)
+    return loglik, start_post[0], gamma, xi, duration_counts
+
+
+class RegimeHSMM:
+    """Hidden semi-Markov model with Gaussian emissions and explicit regime durations.
+
+    Same interface as RegimeHMM (fit/score/predict_proba/predict, diagonal
+    covars_ of shape (n_components, n_features)) plus durations_, a
+    nonparametric (n_components, max_duration) distribution of spell
+    lengths learnt by EM. transmat_ has a zero diagonal: staying in a regime
+    is what the duration distribution describes.
+    """
+
+    def __init__(self, n_components=2, max_duration=DEFAULT_MAX_DURATION, n_iter=100, tol=1e-4,
+                 min_covar=1e-3, init_params='stdmc', random_state=None):
+        if n_components < 2:
+            raise ValueError('a semi-Markov model needs at least two regimes')
+        self.n_components = n_components
+        self.max_duration = max_duration
+        self.n_iter = n_iter
+        self.tol = tol
+        self.min_covar = min_covar
+        self.init_params = init_params
+        self.random_state = random_state
+
+    def _sequences(self, X, lengths):
+        X, mask = pad_sequences(X, lengths)
+        return [X[b, mask[b]] for b in range(len(X))]
+
+    def _log_params(self):
+        with np.errstate(divide='ignore'):
+            return (np.log(self.startprob_), np.log(self.transmat_), np.log(self.durations_),
+                    np.log(duration_survival(self.durations_)))
+
+    def _log_emissions(self, x):
+        return gaussian_log_emissions(x[None], self.means_[None], self.covars_[None])[0, 0]
+
+    def _init(self, observed, n_sequences, rng):
+        K, D = self.n_components, self.max_duration
+        if 's' in self.init_params or not hasattr(self, 'startprob_'):
+            self.startprob_ = np.full(K, 1.0 / K)
+        if 't' in self.init_params or not hasattr(self, 'transmat_'):
+            self.transmat_ = (1 - np.eye(K)) / (K - 1)
+        if 'd' in self.init_params or not hasattr(self, 'durations_'):
+            # Geometric spells as long as an even split of the data would give
+            mean = np.clip(len(observed) / (n_sequences * 2 * K), 1.5, D / 2)
+            durations = (1 - 1 / mean) ** np.arange(D)
+            self.durations_ = np.broadcast_to(durations / durations.sum(), (K, D)).copy()
+        if 'm' in self.init_params or not hasattr(self, 'means_'):
+            picks = rng.choice(len(observed), K, replace=len(observed) < K)
+            self.means_ = np.sort(observed[picks], axis=0)
+        if 'c' in self.init_params or not hasattr(self, 'covars_'):
+            self.covars_ = np.broadcast_to(observed.var(axis=0) + self.min_covar, self.means_.shape).copy()
+
+    def fit(self, X, lengths=None):
+        sequences = self._sequences(X, lengths)
+        observed = np.concatenate(sequences)
+        self._init(observed, len(sequences), np.random.default_rng(self.random_state))
+        K = self.n_components
+
+        previous = -np.inf
+        for iteration in range(self.n_iter):
+            log_params = self._log_params()
+            loglik = 0.0
+            startprob = np.zeros(K)
+            xi = np.zeros((K, K))
+            duration_counts = np.zeros_like(self.durations_)
+            gammas = []
+            for x in sequences:
+                stats = _posteriors(self._log_emissions(x), *log_params)
+                loglik += stats[0]
+                startprob += stats[1]
+                gammas.append(stats[2])
+                xi += stats[3]
+                duration_counts += stats[4]
+            if abs(loglik - previous) < self.tol:
+                break
+            previous = loglik
+
+            self.startprob_ = startprob / startprob.sum()
+            xi[np.diag_indices(K)] = 0.0
+            xi += 1e-12 * (1 - np.eye(K))
+            self.transmat_ = xi / xi.sum(axis=1, keepdims=True)
+            duration_counts += 1e-12
+            self.durations_ = duration_counts / duration_counts.sum(axis=1, keepdims=True)
+            gamma = np.concatenate(gammas)
+            occupancy = gamma.sum(axis=0)[:, None] + 1e-12
+            self.means_ = gamma.T @ observed / occupancy
+            self.covars_ = gamma.T @ observed ** 2 / occupancy - self.means_ ** 2 + self.min_covar
+            self.covars_ = np.maximum(self.covars_, self.min_covar)
+
+        self.loglik_ = float(loglik)
+        self.n_iter_ = iteration + 1
+        return self
+
+    def score(self, X, lengths=None):
+        """Total log-likelihood of the sequences."""
+        log_params = self._log_params()
+        return sum(segment_forward(self._log_emissions(x), *log_params)[2] for x in self._sequences(X, lengths))
+
+    def predict_proba(self, X, lengths=None):
+        """Posterior regime probabilities, (n_samples, n_components)."""
+        log_params = self._log_params()
+        return np.concatenate([_posteriors(self._log_emissions(x), *log_params)[2]
+                               for x in self._sequences(X, lengths)])
+
+    def predict(self, X, lengths=None):
+        """Most probable regime at each step (posterior mode, not a Viterbi path)."""
+        return self.predict_proba(X, lengths).argmax(axis=1)
+
+    def expected_durations(self):
+        return self.durations_ @ np.arange(1, self.max_duration + 1)
+
+    def last_spell(self, X):
+        """Posterior of the regime and elapsed length of the spell still running at the end of X.
+
+        Returns a (n_components, max_duration) array whose [k, e - 1] entry is
+        the probability that the data ends e steps into a spell of regime k;
+        draws from it seed simulate_semi_markov.
+        """
+        x = self._sequences(X, None)[0]
+        log_b = self._log_emissions(x)
+        log_params = self._log_params()
+        log_start, _, loglik = segment_forward(log_b, *log_params)
+        T = len(x)
+        C = _cumulative_emissions(log_b)
+        e = np.arange(1, min(self.max_duration, T) + 1)
+        starts = T - e
+        joint = np.zeros((self.n_components, self.max_duration))
+        joint[:, e - 1] = np.exp(log_start[starts] + (C[T] - C[starts]) + log_params[3][:, e - 1].T - loglik).T
+        return joint / joint.sum()
+
+
+def _draw_spells(sampler, cdf, states, elapsed, uniforms):
+    # Remaining spell length given `elapsed` steps already spent in it, i.e. a
+    # draw of d conditioned on d >= elapsed (as in last_spell, a spell may end
+    # exactly where the data does): the uniforms are squeezed into the part of
+    # each row's CDF from elapsed on. 0 means the spell is already over.
+    lower = np.where(elapsed > 1, cdf[states, np.clip(elapsed, 2, cdf.shape[1]) - 2], 0.0)
+    columns = sampler.step(states, lower + uniforms * (1 - lower))
+    return np.maximum(np.minimum(columns, cdf.shape[1] - 1) + 1 - elapsed, 0)
+
+
+def simulate_semi_markov_paths(transmat, durations, means, stds, n_years, n_paths=10000, initial_state=None,
+                               elapsed=0, startprob=None, rng=None, dtype=np.float64):
+    """Simulate semi-Markov regime growth; returns year-major (growth, states).
+
+    Every path carries its regime and the years left in the current spell.
+    When a spell ends, the next regime and its length are drawn for just
+    those paths with a TransitionSampler over transmat and over the duration
+    distributions. The first year uses initial_state (an int or one per
+    path) with `elapsed` years already spent in it (so the spell may have
+    ended with the data, as last_spell allows), or otherwise a fresh
+    spell drawn from startprob (default: the long-run share of time in each
+    regime).
+    """
+    rng = np.random.default_rng(rng)
+    means = np.asarray(means, dtype=dtype).ravel()
+    stds = np.asarray(stds, dtype=dtype).ravel()
+    durations = np.asarray(durations, dtype=np.float64)
+    switches = TransitionSampler(transmat)
+    spells = TransitionSampler(durations)
+    cdf = np.cumsum(durations, axis=1)
+    cdf /= cdf[:, -1:]
+
+    if initial_state is not None:
+        state = np.broadcast_to(np.asarray(initial_state, dtype=np.intp), (n_paths,)).copy()
+        elapsed = np.broadcast_to(np.asarray(elapsed, dtype=np.intp), (n_paths,))
+    else:
+        if startprob is None:
+            startprob = stationary_distribution(transmat) * (durations @ np.arange(1, durations.shape[1] + 1))
+        state = switches.initial(startprob, rng.random(n_paths))
+        elapsed = np.zeros(n_paths, dtype=np.intp)
+    remaining = _draw_spells(spells, cdf, state, elapsed, rng.random(n_paths))
+    # Spells that ended with the data switch regime before the first year
+    ended = np.flatnonzero(remaining == 0)
+    if len(ended):
+        state[ended] = switches.step(state[ended], rng.random(len(ended)))
+        remaining[ended] = spells.step(state[ended], rng.random(len(ended))) + 1
+
+    state_dtype = np.int8 if switches.n_states <= 127 else np.int32
+    states = np.empty((n_years, n_paths), dtype=state_dtype)
+    growth = rng.standard_normal((n_years, n_paths), dtype=dtype)
+    for year in range(n_years):
+        states[year] = state
+        growth[year] *= stds[state]
+        growth[year] += means[state]
+        remaining -= 1
+        ended = np.flatnonzero(remaining == 0)
+        if year + 1 < n_years and len(ended):
+            state[ended] = switches.step(state[ended], rng.random(len(ended)))
+            remaining[ended] = spells.step(state[ended], rng.random(len(ended))) + 1
+    return growth, states
+
+
+def simulate_semi_markov(transmat, durations, means, stds, n_years, n_paths=10000, initial_state=None,
+                         elapsed=0, startprob=None, start_level=1.0, percentiles=DEFAULT_PERCENTILES,
+                         keep_paths=False, keep_states=False, rng=None, dtype=np.float64):
+    """Simulate semi-Markov regime growth for many paths and summarise it.
+
+    Same inputs as simulate_semi_markov_paths; returns a SimulationResult
+    like simulation.simulate_regimes.
+    """
+    growth, states = simulate_semi_markov_paths(transmat, durations, means, stds, n_years, n_paths=n_paths,
+                                                initial_state=initial_state, elapsed=elapsed,
+                                                startprob=startprob, rng=rng, dtype=dtype)
+    log_levels = growth_to_log_levels(growth, out=growth)
+    bands = percentile_bands(log_levels, start_level, percentiles)
+    return SimulationResult(np.asarray(percentiles), bands,
+                            log_levels.T if keep_paths else None,
+                            states.T if keep_states else None)
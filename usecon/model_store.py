@@ -0,0 +1,145 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from .order_search import data_fingerprint
+
+# Fitted models are stored here, one .json (metadata) + .npz (parameters)
+# pair per (series name, model class, configuration)
+DEFAULT_MODEL_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'us-econ-growth', 'models')
+
+
+def _fitted_attributes(estimator):
+    # sklearn convention, followed by RegimeHMM/RegimeHSMM: learnt state ends in '_'
+    return {k: v for k, v in vars(estimator).items() if k.endswith('_') and not k.startswith('_')}
+
+
+def _estimator_config(estimator):
+    return {k: v for k, v in vars(estimator).items() if not k.endswith('_') and not k.startswith('_')}
+
+
+class ModelStore:
+    """On-disk store of fitted models, so unchanged data is never refitted.
+
+    Every entry remembers the fingerprint and length of the data it was
+    fitted on. Looking a model up against new data gives 'unchanged' (same
+    data: reuse as is), 'grown' (the stored data is a prefix of the new data:
+    the stored parameters make a warm start) or 'new'; the fit methods
+    return that status with the model. Handles statsmodels
+    state-space models (ARIMA, SARIMAX) through fit_statespace and
+    estimators with fit(X) and trailing-underscore fitted attributes
+    (RegimeHMM, RegimeHSMM, sklearn's GaussianMixture) through fit_estimator.
+    """
+
+    def __init__(self, root=None):
+        self.root = root or os.environ.get('USECON_MODEL_STORE', DEFAULT_MODEL_DIR)
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, name, model_class, config):
+        digest = hashlib.sha1(repr(sorted(config.items())).encode()).hexdigest()[:16]
+        return os.path.join(self.root, '%s-%s-%s' % (name, model_class, digest))
+
+    def _read(self, path):
+        try:
+            with open(path + '.json') as f:
+                meta = json.load(f)
+            with np.load(path + '.npz', allow_pickle=False) as arrays:
+                return meta, {k: arrays[k] for k in arrays.files}
+        except (OSError, ValueError):
+            return None, None
+
+    def _write(self, path, meta, arrays):
+        # npz first: a .json without its .npz reads as a miss
+        with open(path + '.npz.tmp', 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(path + '.npz.tmp', path + '.npz')
+        with open(path + '.json.tmp', 'w') as f:
+            json.dump(meta, f)
+        os.replace(path + '.json.tmp', path + '.json')
+
+    def _status(self, meta, data):
+        if meta is None:
+            return 'new'
+        n = meta['n']
+        endog = data[0]
+        if len(endog) == n and data_fingerprint(*data) == meta['fingerprint']:
+            return 'unchanged'
+        if len(endog) > n and data_fingerprint(*(d[:n] if d is not None else None for d in data)) == \
+                meta['fingerprint']:
+            return 'grown'
+        return 'new'
+
+    def fit_statespace(self, model, name=None, fit=None, **fit_kwargs):
+        """Fit a statsmodels ARIMA/SARIMAX model, reusing a stored fit when possible.
+
+        Unchanged data skips the optimizer entirely (one filtering pass at the
+        stored parameters) if the stored fit converged, and otherwise resumes
+        it ('resumed'); grown data starts the optimizer from them. fit is
+        called as fit(model, start_params=..., **fit_kwargs) and defaults to
+        model.fit. Returns (result, status).
+        """
+        data = (np.asarray(model.data.orig_endog, dtype=np.float64),
+                None if model.data.orig_exog is None else np.asarray(model.data.orig_exog, dtype=np.float64))
+        config = dict(model._get_init_kwds(), param_names=list(model.param_names))
+        path = self._path(name or model.endog_names, type(model).__name__, config)
+        meta, arrays = self._read(path)
+        status = self._status(meta, data)
+
+        if status == 'unchanged':
+            if meta['converged']:
+                return model.smooth(arrays['params']), status
+            # Stopped early last time (maxiter or a time budget): carry on from there
+            status = 'resumed'
+        start_params = arrays['params'] if status != 'new' else None
+        fit = fit or (lambda model, **kwargs: model.fit(**kwargs))
+        result = fit(model, start_params=start_params, **fit_kwargs)
+        # Results without mle_retvals come from a fit that was cut short
+        retvals = getattr(result, 'mle_retvals', None) or {}
+        meta = {'fingerprint': data_fingerprint(*data), 'n': len(data[0]), 'class': type(model).__name__,
+                'config': repr(config), 'converged': bool(retvals.get('converged', False))}
+        self._write(path, meta, {'params': np.asarray(result.params, dtype=np.float64)})
+        return result, status
+
+    def fit_estimator(self, estimator, X, name='default', **fit_kwargs):
+        """Fit an HMM or mixture estimator on X, reusing a stored fit when possible.
+
+        Unchanged data restores the stored fitted attributes without fitting;
+        grown data runs EM once from them (init_params='' for RegimeHMM and
+        RegimeHSMM, warm_start for sklearn). Returns (estimator, status).
+        """
+        X = np.asarray(X, dtype=np.float64)
+        config = _estimator_config(estimator)
+        path = self._path(name, type(estimator).__name__, config)
+        meta, arrays = self._read(path)
+        status = self._status(meta, (X,))
+
+        if status != 'new':
+            for key, value in arrays.items():
+                setattr(estimator, key, value[()] if value.ndim == 0 else value)
+        if status == 'unchanged':
+            return estimator, status
+        if status == 'grown':
+            # Only the starting point changes; the caller's settings come back after the fit
+            if hasattr(estimator, 'warm_start'):
+                overrides = {'warm_start': True}
+            else:
+                overrides = {'init_params': ''}
+                if hasattr(estimator, 'n_restarts'):
+                    overrides['n_restarts'] = 1
+            for key, value in overrides.items():
+                setattr(estimator, key, value)
+            try:
+                estimator.fit(X, **fit_kwargs)
+            finally:
+                for key, value in config.items():
+                    setattr(estimator, key, value)
+        else:
+            estimator.fit(X, **fit_kwargs)
+        meta = {'fingerprint': data_fingerprint(X), 'n': len(X), 'class': type(estimator).__name__,
+                'config': repr(config)}
+        arrays = {k: np.asarray(v) for k, v in _fitted_attributes(estimator).items()
+                  if np.asarray(v).dtype != object}
+        self._write(path, meta, arrays)
+        return estimator, status
@@ -0,0 +1,134 @@
+import copy
+
+import numpy as np
+import pandas as pd
+
+from .exog_forecast import DEFAULT_MAXITER, fit_with_budget
+from .hmm import forward, logsumexp
+
+# New observations between full refits, unless the caller picks another schedule
+DEFAULT_REFIT_EVERY = 8
+
+
+def _concat(pieces):
+    if isinstance(pieces[0], (pd.Series, pd.DataFrame)):
+        return pd.concat(pieces)
+    return np.concatenate([np.asarray(piece) for piece in pieces])
+
+
+class OnlineSARIMAX:
+    """Keeps a fitted statsmodels SARIMAX result current as new observations arrive.
+
+    update() runs the Kalman filter over just the new observations from the
+    stored end-of-sample state (results.extend), keeping the parameters, so
+    forecasts are up to date at O(1) cost per observation. Every refit_every
+    observations (or on refit()) the model is refitted on the full history,
+    starting from the current parameters and capped like
+    exog_forecast.fit_with_budget.
+    """
+
+    def __init__(self, result, refit_every=DEFAULT_REFIT_EVERY, maxiter=DEFAULT_MAXITER, time_budget=None):
+        self.result = result
+        self.refit_every = refit_every
+        self.maxiter = maxiter
+        self.time_budget = time_budget
+        self._fitted = result
+        model = result.model
+        self._endog = [model.data.orig_endog]
+        self._exog = [model.data.orig_exog] if model.data.orig_exog is not None else None
+        self.n_pending = 0
+
+    def update(self, endog, exog=None):
+        """Add new observations (and their exog); returns the updated results."""
+        self._endog.append(endog)
+        if self._exog is not None:
+            if exog is None:
+                raise ValueError('the model has exogenous regressors, so new observations need exog')
+            self._exog.append(exog)
+        self.n_pending += len(endog)
+        if self.refit_every and self.n_pending >= self.refit_every:
+            return self.refit()
+        self.result = self.result.extend(endog, exog=exog)
+        return self.result
+
+    def refit(self):
+        """Refit on the full history, warm-started from the current parameters."""
+        exog = _concat(self._exog) if self._exog is not None else None
+        model = self._fitted.model.clone(_concat(self._endog), exog=exog)
+        self.result, _ = fit_with_budget(model, self.maxiter, self.time_budget, start_params=self._fitted.params)
+        self._fitted = self.result
+        self.n_pending = 0
+        return self.result
+
+    def forecast(self, steps=1, exog=None):
+        return self.result.forecast(steps, exog=exog)
+
+
+class OnlineRegimeFilter:
+    """Forward filter of a fitted RegimeHMM that advances one observation at a time.
+
+    The filter runs once over the history X, then keeps only the log
+    filtered regime probabilities of the last step; update() moves them
+    forward through each new observation at O(K^2) cost, so current regime
+    probabilities and regime forecasts never need a pass over the history.
+    Every refit_every observations (or on refit()) the model is refitted on
+    the full history with EM started from its current parameters.
+    """
+
+    def __init__(self, model, X, refit_every=DEFAULT_REFIT_EVERY):
+        self.model = model
+        self.refit_every = refit_every
+        self._history = [np.asarray(X, dtype=np.float64).reshape(len(X), -1)]
+        self.n_pending = 0
+        self._filter_history()
+
+    def _log_emissions(self, X):
+        return self.model._log_emissions(X[None], self.model.means_[None], self.model.covars_[None])[0, 0]
+
+    def _filter_history(self):
+        X = np.concatenate(self._history)
+        with np.errstate(divide='ignore'):
+            self._log_transmat = np.log(self.model.transmat_)
+            log_startprob = np.log(self.model.startprob_)
+        log_b = self._log_emissions(X)[None, None]
+        log_alpha, loglik = forward(log_b, log_startprob[None], self._log_transmat[None],
+                                    np.ones((1, len(X)), dtype=bool))
+        self.loglik = float(loglik[0, 0])
+        self.log_filtered = log_alpha[0, 0, -1] - self.loglik
+
+    def update(self, X):
+        """Filter new observations (n_new, n_features); returns the current regime probabilities."""
+        X = np.asarray(X, dtype=np.float64).reshape(len(X), -1)
+        self._history.append(X)
+        self.n_pending += len(X)
+        if self.refit_every and self.n_pending >= self.refit_every:
+            return self.refit()
+        for log_b in self._log_emissions(X):
+            step = logsumexp(self.log_filtered[:, None] + self._log_transmat, axis=0) + log_b
+            norm = logsumexp(step, axis=0)
+            self.log_filtered = step - norm
+            self.loglik += float(norm)
+        return self.probabilities
+
+    def refit(self):
+        """Refit on the full history from the current parameters and filter it again."""
+        warm = copy.copy(self.model)
+        warm.init_params = ''
+        warm.n_restarts = 1
+        self.model = warm.fit(np.concatenate(self._history))
+        self.n_pending = 0
+        self._filter_history()
+        return self.probabilities
+
+    @property
+    def probabilities(self):
+        return np.exp(self.log_filtered)
+
+    def forecast(self, steps=1):
+        """Regime probabilities for each of the next steps, (steps, n_components)."""
+        probabilities = np.empty((steps, len(self.log_filtered)))
+        current = self.probabilities
+        for h in range(steps):
+            current = current @ self.model.transmat_
+            probabilities[h] = current
+        return probabilities
@@ -0,0 +1,183 @@
+import hashlib
+import itertools
+import json
+import os
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from .auto_arima import ndiffs
+
+# Fit results are cached here, one small JSON file per (data fingerprint, order)
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'us-econ-growth', 'arima')
+
+# A cell is only fitted if one of its parents ((p-1, d, q) or (p, d, q-1)) scored
+# within this many AIC/BIC points of the best fit so far for the same d
+DEFAULT_PRUNE_MARGIN = 10.0
+
+
+def data_fingerprint(endog, exog=None):
+    # Hash of the values (and exog), so any revision of the data gives a new key
+    digest = hashlib.sha1()
+    for data in (endog, exog):
+        if data is None:
+            continue
+        values = np.ascontiguousarray(np.asarray(data, dtype=np.float64))
+        digest.update(str(values.shape).encode())
+        digest.update(values.tobytes())
+    return digest.hexdigest()
+
+
+def _options_key(fit_kwargs):
+    # Short hash of the fit options, so fits made with other options are separate entries
+    text = json.dumps(fit_kwargs or {}, sort_keys=True, default=repr)
+    return hashlib.sha1(text.encode()).hexdigest()[:8]
+
+
+class FitCache:
+    """On-disk cache of ARIMA fit summaries keyed by data fingerprint + order + fit options."""
+
+    def __init__(self, root=None):
+        self.root = root or os.environ.get('USECON_ARIMA_CACHE', DEFAULT_CACHE_DIR)
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, fingerprint, order, trend, fit_kwargs):
+        name = '%s-%s-%s-%s.json' % (fingerprint[:16], '_'.join(map(str, order)), trend or 'none',
+                                     _options_key(fit_kwargs))
+        return os.path.join(self.root, name)
+
+    def get(self, fingerprint, order, trend=None, fit_kwargs=None):
+        try:
+            with open(self._path(fingerprint, order, trend, fit_kwargs)) as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return record if record.get('fingerprint') == fingerprint else None
+
+    def put(self, fingerprint, order, trend, record, fit_kwargs=None):
+        # Failures are not stored: they may be transient, and are retried on the next search
+        if record.get('error') is not None:
+            return
+        path = self._path(fingerprint, order, trend, fit_kwargs)
+        with open(path + '.tmp', 'w') as f:
+            json.dump(dict(record, fingerprint=fingerprint), f)
+        os.replace(path + '.tmp', path)
+
+
+def _fit_order(endog, exog, order, trend, fit_kwargs):
+    # Runs in a worker process; never raises so one bad cell cannot sink the grid
+    from statsmodels.tsa.arima.model import ARIMA
+
+    record = {'order': list(order), 'aic': None, 'bic': None, 'llf': None, 'params': None,
+              'converged': False, 'error': None}
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            result = ARIMA(endog, exog=exog, order=order, trend=trend).fit(**fit_kwargs)
+        record.update(aic=float(result.aic), bic=float(result.bic), llf=float(result.llf),
+                      params=[float(v) for v in result.params],
+                      converged=bool(result.mle_retvals.get('converged', True)))
+        if not np.isfinite(result.llf):
+            record['converged'] = False
+    except Exception as e:  # statsmodels raises a zoo of LinAlgError/ValueError here
+        record['error'] = '%s: %s' % (type(e).__name__, e)
+    return record
+
+
+def search_arima_order(endog, p_values=range(0, 4), d_values=None, q_values=range(0, 4), exog=None,
+                       trend=None, criterion='aic', n_workers=None, prune_margin=DEFAULT_PRUNE_MARGIN,
+                       cache=None, fit_kwargs=None):
+    """Fit a (p, d, q) grid of ARIMA models and rank them by AIC or BIC.
+
+    Cells are fitted in waves of increasing p + q on a process pool. A cell is
+    skipped ('pruned') when none of its parents (one fewer AR or MA term)
+    converged within prune_margin of the best score for the same d, since
+    adding terms to a clearly worse model rarely wins. Each successful fit
+    summary is cached by data fingerprint + order + fit_kwargs, so widening
+    the grid later only fits the new cells; failed fits are retried next
+    time. Pass cache=False to disable caching.
+
+    d_values defaults to the one d picked by the KPSS test (auto_arima.ndiffs).
+    Scores are only comparable between fits with the same d, since each d
+    models a differently differenced series, so the returned DataFrame (one
+    row per cell) is grouped by d, best first within each d.
+    """
+    if criterion not in ('aic', 'bic'):
+        raise ValueError("criterion must be 'aic' or 'bic'")
+    endog = np.asarray(endog, dtype=np.float64)
+    exog = None if exog is None else np.asarray(exog, dtype=np.float64)
+    if cache is None:
+        cache = FitCache()
+    fingerprint = data_fingerprint(endog, exog)
+    fit_kwargs = fit_kwargs or {}
+    if d_values is None:
+        d_values = [ndiffs(endog)]
+
+    records = {}
+    best = {}
+    cells = list(itertools.product(p_values, d_values, q_values))
+    waves = sorted({p + q for p, _, q in cells})
+    n_workers = n_workers or os.cpu_count()
+    pool = ProcessPoolExecutor(max_workers=n_workers) if n_workers > 1 else None
+    try:
+        for wave in waves:
+            to_fit = []
+            for p, d, q in cells:
+                if p + q != wave:
+                    continue
+                order = (p, d, q)
+                parents = [records[c] for c in ((p - 1, d, q), (p, d, q - 1)) if c in records]
+                if parents and not any(r['converged'] and r[criterion] <= best.get(d, np.inf) + prune_margin
+                                       for r in parents):
+                    records[order] = {'order': list(order), 'status': 'pruned', 'converged': False,
+                                      'aic': None, 'bic': None, 'llf': None, 'params': None, 'error': None}
+                    continue
+                cached = cache.get(fingerprint, order, trend, fit_kwargs) if cache else None
+                if cached is not None:
+                    records[order] = dict(cached, status='cached')
+                else:
+                    to_fit.append(order)
+
+            if pool is not None and len(to_fit) > 1:
+                futures = [pool.submit(_fit_order, endog, exog, order, trend, fit_kwargs) for order in to_fit]
+                fitted = [future.result() for future in futures]
+            else:
+                fitted = [_fit_order(endog, exog, order, trend, fit_kwargs) for order in to_fit]
+            for order, record in zip(to_fit, fitted):
+                record['status'] = 'fitted' if record['error'] is None else 'failed'
+                records[order] = record
+                if cache:
+                    cache.put(fingerprint, order, trend, record, fit_kwargs)
+
+            for (p, d, q), record in records.items():
+                if p + q == wave and record['converged'] and record[criterion] is not None:
+                    best[d] = min(best.get(d, np.inf), record[criterion])
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    rows = []
+    for (p, d, q), record in records.items():
+        rows.append({'p': p, 'd': d, 'q': q, 'aic': record['aic'], 'bic': record['bic'], 'llf': record['llf'],
+                     'converged': record['converged'], 'status': record['status'], 'error': record['error']})
+    table = pd.DataFrame(rows)
+    # Within each d, converged fits first, ranked by the criterion; pruned and failed cells last
+    table['_rank'] = np.where(table['converged'], table[criterion].astype(float), np.inf)
+    return table.sort_values(['d', '_rank', 'p', 'q']).drop(columns='_rank').reset_index(drop=True)
+
+
+def best_order(table, d=None):
+    """Best (p, d, q) of a search_arima_order table for one d (required when the grid has several)."""
+    if d is None:
+        d_values = table['d'].unique()
+        if len(d_values) != 1:
+            raise ValueError('scores are not comparable across d; pass d= (one of %s)'
+                             % ', '.join(map(str, sorted(d_values))))
+        d = d_values[0]
+    rows = table[table['d'] == d]
+    if not len(rows) or not rows.iloc[0]['converged']:
+        raise ValueError('no ARIMA order with d=%d in the grid converged' % d)
+    row = rows.iloc[0]
+    return int(row['p']), int(row['d']), int(row['q'])
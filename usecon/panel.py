@@ -0,0 +1,182 @@
+import json
+import os
+
+import numpy as np
+
+# Panel frequencies: datetime64 unit and how many units make one period
+FREQUENCIES = {'annual': ('Y', 1), 'quarterly': ('M', 3), 'monthly': ('M', 1)}
+
+# pandas offsets for the period-start index of to_frame()
+PANDAS_FREQUENCIES = {'annual': 'AS', 'quarterly': 'QS', 'monthly': 'MS'}
+
+# Bump when the on-disk layout changes
+PANEL_VERSION = 1
+
+PANEL_FILES = ('periods.npy', 'values.npy', 'filled.npy', 'panel.json')
+
+
+def to_periods(dates, frequency):
+    """Period number of each datetime64 date at the given frequency."""
+    unit, step = FREQUENCIES[frequency]
+    return np.asarray(dates).astype('datetime64[%s]' % unit).astype(np.int64) // step
+
+
+def period_starts(periods, frequency):
+    """First day (datetime64[D]) of each period number."""
+    unit, step = FREQUENCIES[frequency]
+    return (np.asarray(periods, dtype=np.int64) * step).astype('datetime64[%s]' % unit).astype('datetime64[D]')
+
+
+def _save_npy(path, array):
+    with open(path + '.tmp', 'wb') as f:
+        np.save(f, array)
+    os.replace(path + '.tmp', path)
+
+
+class MacroPanel:
+    """Aligned series on one period grid, stored as a single column-major block.
+
+    periods is an (n_periods,) int64 array of period numbers (periods since
+    1970 at `frequency`), values an (n_periods, n_columns) Fortran-ordered
+    float32/float64 array, so every column - and every run of adjacent
+    columns - is a contiguous view, and filled marks the cells gap handling
+    supplied. A saved panel is three .npy files and a small json header;
+    MacroPanel.open memory-maps them, so opening and slicing a long panel
+    reads only the pages that are used.
+    """
+
+    def __init__(self, frequency, periods, names, values, filled=None):
+        if frequency not in FREQUENCIES:
+            raise ValueError('frequency must be one of %s' % ', '.join(FREQUENCIES))
+        self.frequency = frequency
+        self.periods = periods
+        self.names = list(names)
+        self.values = values
+        self.filled = np.zeros(values.shape, dtype=bool, order='F') if filled is None else filled
+        self._columns = {name: j for j, name in enumerate(self.names)}
+
+    @classmethod
+    def from_arrays(cls, frequency, periods, columns, dtype=np.float64, filled=None):
+        """Panel from a name -> (n_periods,) array mapping, copied into one block."""
+        values = np.empty((len(periods), len(columns)), dtype=dtype, order='F')
+        for j, column in enumerate(columns.values()):
+            values[:, j] = column
+        return cls(frequency, np.asarray(periods, dtype=np.int64), list(columns), values, filled)
+
+    def __len__(self):
+        return len(self.periods)
+
+    def __repr__(self):
+        span = ''
+        if len(self):
+            span = ' %s..%s' % tuple(period_starts(self.periods[[0, -1]], self.frequency))
+        return '<MacroPanel %s, %d periods%s, %s %s>' % (self.frequency, len(self), span, self.values.dtype,
+                                                         self.names)
+
+    @property
+    def dtype(self):
+        return self.values.dtype
+
+    def dates(self):
+        """Period start dates as datetime64[D]."""
+        return period_starts(self.periods, self.frequency)
+
+    def column(self, name):
+        """One column as a contiguous view."""
+        return self.values[:, self._columns[name]]
+
+    def columns(self, names):
+        """Several columns as an (n_periods, len(names)) array; a view when they are adjacent and in order."""
+        index = [self._columns[name] for name in names]
+        if index and index == list(range(index[0], index[0] + len(index))):
+            return self.values[:, index[0]:index[0] + len(index)]
+        return self.values[:, index]
+
+    def period(self, value):
+        # Period number of a date ('2020', '2020-04-01', datetime64) or an int period number
+        if isinstance(value, (int, np.integer)):
+            return int(value)
+        return int(to_periods(np.datetime64(value, 'D'), self.frequency))
+
+    def _slice(self, rows):
+        return MacroPanel(self.frequency, self.periods[rows], self.names, self.values[rows], self.filled[rows])
+
+    def window(self, start=None, end=None):
+        """The periods from start to end (both inclusive) as a panel of views."""
+        first = 0 if start is None else np.searchsorted(self.periods, self.period(start), side='left')
+        last = len(self) if end is None else np.searchsorted(self.periods, self.period(end), side='right')
+        return self._slice(slice(first, last))
+
+    def select(self, names):
+        """A panel of some of the columns; views when they are adjacent and in order."""
+        index = [self._columns[name] for name in names]
+        if index and index == list(range(index[0], index[0] + len(index))):
+            index = slice(index[0], index[0] + len(index))
+        return MacroPanel(self.frequency, self.periods, names, self.values[:, index], self.filled[:, index])
+
+    def trim(self, names=None):
+        """Drop leading and trailing periods where any of the columns is NaN (a view; interior gaps stay)."""
+        block = self.values if names is None else self.columns(names)
+        complete = ~np.isnan(block).any(axis=1)
+        if not complete.any():
+            return self._slice(slice(0, 0))
+        return self._slice(slice(complete.argmax(), len(self) - complete[::-1].argmax()))
+
+    def pct_change(self, name, periods=1):
+        """Percentage change of a column over `periods` periods, NaN for the first ones."""
+        column = self.column(name)
+        out = np.full(len(column), np.nan, dtype=column.dtype)
+        np.divide(column[periods:], column[:-periods], out=out[periods:])
+        out[periods:] -= 1
+        out[periods:] *= 100
+        return out
+
+    def astype(self, dtype):
+        if self.values.dtype == dtype:
+            return self
+        return MacroPanel(self.frequency, self.periods, self.names, np.asfortranarray(self.values, dtype=dtype),
+                          self.filled)
+
+    def save(self, path):
+        """Write the panel to a directory of .npy files; panel.json is written last, so it marks a complete panel."""
+        os.makedirs(path, exist_ok=True)
+        _save_npy(os.path.join(path, 'periods.npy'), np.ascontiguousarray(self.periods, dtype=np.int64))
+        _save_npy(os.path.join(path, 'values.npy'), np.asfortranarray(self.values))
+        _save_npy(os.path.join(path, 'filled.npy'), np.asfortranarray(self.filled))
+        header = {'version': PANEL_VERSION, 'frequency': self.frequency, 'names': self.names,
+                  'dtype': self.values.dtype.str}
+        with open(os.path.join(path, 'panel.json.tmp'), 'w') as f:
+            json.dump(header, f)
+        os.replace(os.path.join(path, 'panel.json.tmp'), os.path.join(path, 'panel.json'))
+        return path
+
+    @classmethod
+    def open(cls, path, mmap=True):
+        """Open a saved panel, memory-mapped read-only unless mmap is False."""
+        with open(os.path.join(path, 'panel.json')) as f:
+            header = json.load(f)
+        if header.get('version') != PANEL_VERSION:
+            raise ValueError('%s: panel version %r, expected %d' % (path, header.get('version'), PANEL_VERSION))
+        mode = 'r' if mmap else None
+        arrays = [np.load(os.path.join(path, name), mmap_mode=mode, allow_pickle=False) for name in PANEL_FILES[:3]]
+        periods, values, filled = arrays
+        if values.shape != (len(periods), len(header['names'])) or filled.shape != values.shape:
+            raise ValueError('%s: panel files do not match' % path)
+        return cls(header['frequency'], periods, header['names'], values, filled)
+
+    def series(self, name):
+        """One column as a pandas Series on the period start dates, sharing the column's memory."""
+        import pandas as pd
+
+        return pd.Series(self.column(name), index=self._index(), name=name, copy=False)
+
+    def to_frame(self):
+        """The panel as a DataFrame indexed by period start dates; the block is passed without a copy."""
+        import pandas as pd
+
+        return pd.DataFrame(self.values, index=self._index(), columns=self.names, copy=False)
+
+    def _index(self):
+        import pandas as pd
+
+        return pd.DatetimeIndex(self.dates(), name='DATE', freq=PANDAS_FREQUENCIES[self.frequency])
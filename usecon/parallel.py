@@ -0,0 +1,86 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .streaming import (DEFAULT_BINS, DEFAULT_CHUNK_SIZE, DEFAULT_LOG_BOUNDS, GaussianSampler, PathAccumulator,
+                        RegimeSampler, chunk_seeds, chunk_sizes)
+
+# Scripts that use these helpers must guard their entry point with
+# `if __name__ == '__main__':`, since worker processes may re-import the
+# calling module (the default on macOS and Windows).
+
+
+def _run_chunks(sampler, n_years, chunks, log_bounds, bins, sink=None):
+    # Worker: fold a block of chunks into one set of exact integer counts and
+    # keep each chunk's float moments separate for the ordered merge. With a
+    # sink, the worker writes its own chunks to disk.
+    accumulator = PathAccumulator(n_years, 1.0, log_bounds, bins)
+    moments = []
+    for index, n, seed in chunks:
+        growth = sampler(n, np.random.default_rng(seed))
+        if sink is not None:
+            sink.write(index, 'growth', growth)
+        moments.append((index, accumulator.fold(growth)))
+        if sink is not None:
+            sink.write(index, 'log_levels', growth)
+    if sink is not None:
+        sink.flush()
+    accumulator.moments = None
+    return accumulator, moments
+
+
+def simulate_parallel(sampler, n_years, n_paths, seed=None, n_workers=None, chunk_size=DEFAULT_CHUNK_SIZE,
+                      start_level=1.0, log_bounds=DEFAULT_LOG_BOUNDS, bins=DEFAULT_BINS, sink=None):
+    """Run a streaming simulation across a process pool.
+
+    Paths are cut into chunks, each with its own SeedSequence stream, and the
+    chunks are spread over n_workers processes. Counts merge exactly and the
+    per-chunk moments are merged in chunk order, so for a given seed the
+    result is bit-identical to streaming.stream_paths and to any other worker
+    count. Returns a PathAccumulator whose `entropy` reproduces the run.
+    With sink=EnsembleWriter(...) the workers also write every chunk to disk.
+    """
+    sizes = chunk_sizes(n_paths, chunk_size)
+    root, seeds = chunk_seeds(seed, len(sizes))
+    chunks = [(i, n, s) for i, (n, s) in enumerate(zip(sizes, seeds))]
+    n_workers = max(1, min(n_workers or os.cpu_count(), len(chunks)))
+
+    # Contiguous blocks of chunks, one per worker
+    bounds = np.linspace(0, len(chunks), n_workers + 1).astype(int)
+    blocks = [chunks[a:b] for a, b in zip(bounds[:-1], bounds[1:])]
+
+    if n_workers == 1:
+        parts = [_run_chunks(sampler, n_years, chunks, log_bounds, bins, sink)]
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers) as pool:
+            futures = [pool.submit(_run_chunks, sampler, n_years, block, log_bounds, bins, sink) for block in blocks]
+            parts = [future.result() for future in futures]
+
+    result = PathAccumulator(n_years, start_level, log_bounds, bins)
+    result.entropy = root.entropy
+    chunk_moments = []
+    for part, moments in parts:
+        result.sketch.merge(part.sketch)
+        result.first_recession += part.first_recession
+        result.merge_envelope(part)
+        chunk_moments.extend(moments)
+    for _, moments in sorted(chunk_moments, key=lambda item: item[0]):
+        result.moments.merge(moments)
+    if sink is not None:
+        sink.close(sizes, result)
+    return result
+
+
+def parallel_gaussian(mean, std, n_years, n_paths, seed=None, n_workers=None, chunk_size=DEFAULT_CHUNK_SIZE,
+                      start_level=1.0, sink=None):
+    """Process-pool version of streaming.stream_gaussian."""
+    return simulate_parallel(GaussianSampler(mean, std, n_years), n_years, n_paths, seed, n_workers,
+                             chunk_size, start_level, sink=sink)
+
+
+def parallel_regimes(transmat, means, stds, n_years, n_paths, initial_state=None, startprob=None, seed=None,
+                     n_workers=None, chunk_size=DEFAULT_CHUNK_SIZE, start_level=1.0, sink=None):
+    """Process-pool version of streaming.stream_regimes."""
+    sampler = RegimeSampler(transmat, means, stds, n_years, initial_state, startprob)
+    return simulate_parallel(sampler, n_years, n_paths, seed, n_workers, chunk_size, start_level, sink=sink)
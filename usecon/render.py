@@ -0,0 +1,179 @@
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib
+
+# Batch nodes have no display: render off-screen, whatever the default backend
+matplotlib.use('Agg')
+
+import matplotlib.pyplot as plt
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from .simulation import row_percentiles
+
+# Where figures are written, and in which formats (comma-separated, e.g. 'png,svg')
+DEFAULT_FIGURE_DIR = 'figures'
+DEFAULT_FORMATS = 'png'
+DEFAULT_DPI = 100
+
+# Nested fan bands, outermost first; the middle value is drawn as the median line
+FAN_PERCENTILES = (5, 25, 50, 75, 95)
+
+# Formats that cannot be assembled from raster tiles
+VECTOR_FORMATS = ('svg', 'pdf', 'eps', 'ps')
+
+# bands: (len(percentiles), n_years) values, one row per percentile
+# low / high: (n_years,) min / max envelope over all paths
+FanBands = namedtuple('FanBands', ['percentiles', 'bands', 'low', 'high'])
+
+# draw(ax, *args) must be a module-level function so it can be sent to a worker
+Panel = namedtuple('Panel', ['draw', 'args', 'title'], defaults=[(), None])
+
+
+def figure_dir(directory=None):
+    directory = directory or os.environ.get('USECON_FIGURE_DIR', DEFAULT_FIGURE_DIR)
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
+
+def figure_formats(formats=None):
+    if formats is None:
+        formats = os.environ.get('USECON_FIGURE_FORMATS', DEFAULT_FORMATS)
+    if isinstance(formats, str):
+        formats = formats.split(',')
+    return [f.strip().lower() for f in formats if f.strip()]
+
+
+def save_figure(name, fig=None, formats=None, directory=None, dpi=DEFAULT_DPI):
+    """Write a figure (the current pyplot figure by default) to <directory>/<name>.<format> and close it.
+
+    Scripts call this where they used to call plt.show(). Returns the paths written.
+    """
+    fig = fig or plt.gcf()
+    directory = figure_dir(directory)
+    paths = []
+    for fmt in figure_formats(formats):
+        path = os.path.join(directory, '%s.%s' % (name, fmt))
+        fig.savefig(path, format=fmt, dpi=dpi, bbox_inches='tight')
+        paths.append(path)
+    plt.close(fig)
+    return paths
+
+
+def fan_bands(source, percentiles=FAN_PERCENTILES, start_level=1.0, log=True):
+    """Reduce a path ensemble to fan-chart bands and a min/max envelope.
+
+    source is either an (n_paths, n_years) array of simulated paths (log
+    levels when log is True, as in SimulationResult.log_levels) or a
+    streaming PathAccumulator, whose quantile sketch and exact envelope are
+    read instead. Plotting the result costs the same for a hundred paths or a
+    hundred million.
+    """
+    percentiles = np.asarray(percentiles, dtype=np.float64)
+    if hasattr(source, 'quantiles'):
+        return FanBands(percentiles, source.quantiles(percentiles), *source.envelope())
+
+    # Paths come as an (n_paths, n_years) view of year-major storage, so .T
+    # gives contiguous years for the row-wise partition; the 0th / 100th
+    # percentiles are the exact min / max
+    values = row_percentiles(np.asarray(source).T, np.concatenate([percentiles, [0, 100]]))
+    if log:
+        values = start_level * np.exp(values)
+    return FanBands(percentiles, values[:-2], values[-2], values[-1])
+
+
+def fan_chart(ax, x, bands, color='C0', label=None, envelope=True):
+    """Draw FanBands on ax: nested shaded bands, the median line and a dotted min/max envelope."""
+    percentiles, values = list(bands.percentiles), bands.bands
+    n = len(percentiles)
+    for i in range(n // 2):
+        lower, upper = percentiles[i], percentiles[n - 1 - i]
+        ax.fill_between(x, values[i], values[n - 1 - i], color=color, alpha=0.15 + 0.25 * i / max(n // 2 - 1, 1),
+                        linewidth=0, label='%gth-%gth percentile' % (lower, upper))
+    if n % 2:
+        ax.plot(x, values[n // 2], color=color, label=label or 'Median')
+    if envelope:
+        ax.plot(x, bands.low, color=color, linestyle=':', linewidth=0.8, label='Min / max')
+        ax.plot(x, bands.high, color=color, linestyle=':', linewidth=0.8)
+    return ax
+
+
+def line_panel(ax, *series):
+    # Panel drawer: one line per pandas Series (or x, y pair given as a tuple)
+    for s in series:
+        if isinstance(s, tuple):
+            ax.plot(*s)
+        else:
+            ax.plot(s)
+
+
+def fan_panel(ax, x, bands, history=None):
+    # Panel drawer: optional historical series followed by a fan chart
+    if history is not None:
+        ax.plot(history, color='black', label='Historical')
+    fan_chart(ax, x, bands)
+    ax.legend(loc='upper left', fontsize='small')
+
+
+def _draw(ax, panel):
+    panel.draw(ax, *panel.args)
+    if panel.title:
+        ax.set_title(panel.title)
+
+
+def _render_panel(panel, size, dpi):
+    # Worker: draw one panel on its own off-screen canvas, return its RGBA pixels
+    fig = Figure(figsize=size, dpi=dpi)
+    canvas = FigureCanvasAgg(fig)
+    _draw(fig.add_subplot(), panel)
+    fig.tight_layout()
+    canvas.draw()
+    return np.asarray(canvas.buffer_rgba()).copy()
+
+
+def render_panels(panels, name, shape=None, figsize=(12, 8), formats=None, directory=None, dpi=DEFAULT_DPI,
+                  n_workers=None):
+    """Render a grid of panels, one worker process per panel, to <directory>/<name>.<format>.
+
+    Each panel is drawn on its own Agg canvas in a worker and the parent only
+    tiles the pixel arrays, so a 2x2 figure takes about as long as its
+    slowest panel. Vector formats cannot be tiled from pixels; they are drawn
+    as one figure in this process instead. Scripts calling this must guard
+    their entry point with `if __name__ == '__main__':`, since worker
+    processes may re-import the calling module.
+    """
+    panels = list(panels)
+    rows, cols = shape or (int(np.ceil(len(panels) / 2)), min(len(panels), 2))
+    formats = figure_formats(formats)
+    directory = figure_dir(directory)
+    paths = []
+
+    raster = [f for f in formats if f not in VECTOR_FORMATS]
+    if raster:
+        size = (figsize[0] / cols, figsize[1] / rows)
+        n_workers = min(n_workers or os.cpu_count() or 1, len(panels))
+        if n_workers > 1:
+            with ProcessPoolExecutor(max_workers=n_workers) as pool:
+                tiles = list(pool.map(_render_panel, panels, [size] * len(panels), [dpi] * len(panels)))
+        else:
+            tiles = [_render_panel(panel, size, dpi) for panel in panels]
+        blank = np.full_like(tiles[0], 255)
+        tiles += [blank] * (rows * cols - len(tiles))
+        image = np.concatenate([np.concatenate(tiles[r * cols:(r + 1) * cols], axis=1) for r in range(rows)])
+        for fmt in raster:
+            path = os.path.join(directory, '%s.%s' % (name, fmt))
+            plt.imsave(path, image, format=fmt, dpi=dpi)
+            paths.append(path)
+
+    vector = [f for f in formats if f in VECTOR_FORMATS]
+    if vector:
+        fig = Figure(figsize=figsize)
+        FigureCanvasAgg(fig)
+        for i, panel in enumerate(panels):
+            _draw(fig.add_subplot(rows, cols, i + 1), panel)
+        fig.tight_layout()
+        paths += save_figure(name, fig, vector, directory, dpi)
+    return paths
@@ -0,0 +1,164 @@
+from collections import namedtuple
+
+import numpy as np
+
+DEFAULT_PERCENTILES = (5, 25, 50, 75, 95)
+
+# bands: (len(percentiles), n_years) GDP levels, one row per percentile
+# log_levels: (n_paths, n_years) log GDP relative to start_level if keep_paths was set, else None
+# states: (n_paths, n_years) regime indices if keep_states was set, else None
+SimulationResult = namedtuple('SimulationResult', ['percentiles', 'bands', 'log_levels', 'states'],
+                              defaults=[None])
+
+
+# The engines below hold paths year-major, as (n_years, n_paths) arrays: each
+# year's values across all paths are contiguous, which makes the cumulative sum
+# a row-by-row add and the per-year percentiles a partition of one contiguous
+# row. Callers get the (n_paths, n_years) view through .T without a copy.
+
+def growth_to_log_levels(growth, out=None):
+    # Turn a year-major matrix of growth rates in percent into cumulative log
+    # GDP levels relative to the starting level, in place when out is growth.
+    # Working in log space turns the cumprod into a cumsum and keeps long
+    # horizons of compounding well inside float range.
+    out = np.divide(growth, 100, out=out)
+    # A fall of 100% or more would mean GDP hits zero; keep the log finite
+    np.maximum(out, -0.999999, out=out)
+    np.log1p(out, out=out)
+    np.cumsum(out, axis=0, out=out)
+    return out
+
+
+def row_percentiles(values, percentiles=DEFAULT_PERCENTILES):
+    # Same result as np.percentile(values, percentiles, axis=1) (linear
+    # interpolation), but partitions one contiguous row at a time instead of
+    # sorting the whole matrix
+    values = np.atleast_2d(values)
+    n = values.shape[1]
+    position = np.asarray(percentiles, dtype=np.float64) / 100 * (n - 1)
+    lower = np.floor(position).astype(np.intp)
+    upper = np.minimum(lower + 1, n - 1)
+    weight = position - lower
+    kth = np.unique(np.concatenate([lower, upper]))
+
+    out = np.empty((len(position), values.shape[0]))
+    for i, row in enumerate(values):
+        row = np.partition(row, kth)
+        out[:, i] = row[lower] + (row[upper] - row[lower]) * weight
+    return out
+
+
+def percentile_bands(log_levels, start_level=1.0, percentiles=DEFAULT_PERCENTILES):
+    # exp() is monotonic, so percentiles of the log level are the log of the
+    # level percentiles and the big matrix never has to be exponentiated
+    return start_level * np.exp(row_percentiles(log_levels, percentiles))
+
+
+def simulate_gaussian(mean, std, n_years, n_paths=10000, start_level=1.0,
+                      percentiles=DEFAULT_PERCENTILES, keep_paths=False, rng=None, dtype=np.float64):
+    """Simulate n_paths of i.i.d. normal annual growth (in percent) at once.
+
+    The whole growth matrix is drawn in one call and turned into log GDP
+    levels in place, so there is no per-path Python or pandas overhead.
+    Returns a SimulationResult with percentile bands of the GDP level per
+    year. Use dtype=np.float32 to halve memory for very large runs.
+    """
+    rng = np.random.default_rng(rng)
+    growth = rng.standard_normal((n_years, n_paths), dtype=dtype)
+    growth *= std
+    growth += mean
+    log_levels = growth_to_log_levels(growth, out=growth)
+    bands = percentile_bands(log_levels, start_level, percentiles)
+    return SimulationResult(np.asarray(percentiles), bands, log_levels.T if keep_paths else None)
+
+
+class TransitionSampler:
+    """Draws the next regime of many paths at once from a transition matrix.
+
+    The cumulative transition rows are offset by their row number and
+    flattened (row i lives in [i, i + 1]), so one searchsorted over
+    state + uniform picks the next state for every path, whatever the number
+    of states. Rows need not be square: any row-stochastic (n_states, n)
+    matrix works, e.g. per-regime duration distributions, and step() returns
+    the column drawn.
+    """
+
+    def __init__(self, transmat):
+        transmat = np.asarray(transmat, dtype=np.float64)
+        self.n_states = transmat.shape[0]
+        cumulative = np.cumsum(transmat, axis=1)
+        cumulative /= cumulative[:, -1:]
+        # Exactly 1.0 so rounding can never push a draw past the end of its row
+        cumulative[:, -1] = 1.0
+        self.offsets = np.arange(self.n_states) * transmat.shape[1]
+        self.flat = (cumulative + np.arange(self.n_states)[:, None]).ravel()
+
+    def step(self, states, uniforms):
+        return np.searchsorted(self.flat, states + uniforms, side='right') - self.offsets[states]
+
+    def initial(self, probabilities, uniforms):
+        cumulative = np.cumsum(probabilities)
+        cumulative /= cumulative[-1]
+        return np.minimum(np.searchsorted(cumulative, uniforms, side='right'), len(cumulative) - 1)
+
+
+def stationary_distribution(transmat):
+    # Left eigenvector of the transition matrix for eigenvalue 1
+    transmat = np.asarray(transmat, dtype=np.float64)
+    values, vectors = np.linalg.eig(transmat.T)
+    vector = np.real(vectors[:, np.argmin(np.abs(values - 1))])
+    return vector / vector.sum()
+
+
+def simulate_regime_paths(transmat, means, stds, n_years, n_paths=10000, initial_state=None,
+                          startprob=None, rng=None, dtype=np.float64):
+    """Simulate Markov-switching growth; returns year-major (growth, states).
+
+    Each path emits normal growth (in percent) with the mean and std of its
+    current regime, then moves to the next regime. The first simulated year
+    uses initial_state (an int or one state per path), or a draw from
+    startprob (default: the stationary distribution of transmat).
+    """
+    rng = np.random.default_rng(rng)
+    means = np.asarray(means, dtype=dtype).ravel()
+    stds = np.asarray(stds, dtype=dtype).ravel()
+    sampler = TransitionSampler(transmat)
+
+    state_dtype = np.int8 if sampler.n_states <= 127 else np.int32
+    states = np.empty((n_years, n_paths), dtype=state_dtype)
+    if initial_state is not None:
+        state = np.broadcast_to(np.asarray(initial_state, dtype=np.intp), (n_paths,)).copy()
+    else:
+        if startprob is None:
+            startprob = stationary_distribution(transmat)
+        state = sampler.initial(startprob, rng.random(n_paths))
+
+    growth = rng.standard_normal((n_years, n_paths), dtype=dtype)
+    uniforms = np.empty(n_paths)
+    for year in range(n_years):
+        states[year] = state
+        # Gather the emission parameters of every path's regime
+        growth[year] *= stds[state]
+        growth[year] += means[state]
+        if year + 1 < n_years:
+            rng.random(out=uniforms)
+            state = sampler.step(state, uniforms)
+    return growth, states
+
+
+def simulate_regimes(transmat, means, stds, n_years, n_paths=10000, initial_state=None, startprob=None,
+                     start_level=1.0, percentiles=DEFAULT_PERCENTILES, keep_paths=False, keep_states=False,
+                     rng=None, dtype=np.float64):
+    """Simulate Markov-switching growth for many paths and summarise it.
+
+    Same inputs as simulate_regime_paths; returns a SimulationResult with
+    per-year percentile bands of the GDP level.
+    """
+    growth, states = simulate_regime_paths(transmat, means, stds, n_years, n_paths=n_paths,
+                                           initial_state=initial_state, startprob=startprob,
+                                           rng=rng, dtype=dtype)
+    log_levels = growth_to_log_levels(growth, out=growth)
+    bands = percentile_bands(log_levels, start_level, percentiles)
+    return SimulationResult(np.asarray(percentiles), bands,
+                            log_levels.T if keep_paths else None,
+                            states.T if keep_states else None)
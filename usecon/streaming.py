@@ -0,0 +1,246 @@
+import numpy as np
+
+from .simulation import DEFAULT_PERCENTILES, growth_to_log_levels, simulate_regime_paths
+
+# Paths generated per chunk; a (80 years x 65536 paths) float64 chunk is ~40 MB
+DEFAULT_CHUNK_SIZE = 65536
+
+# Quantiles of the log GDP level (relative to the start) are sketched on a fixed
+# grid: e^-5 .. e^10 times the starting level in 8192 bins, i.e. ~0.2% relative
+# resolution. Values outside the grid are counted in the edge bins.
+DEFAULT_LOG_BOUNDS = (-5.0, 10.0)
+DEFAULT_BINS = 8192
+
+
+class HistogramSketch:
+    """Per-row quantile sketch over a fixed grid of bins.
+
+    Counts are integers on a grid fixed up front, so sketches built from
+    different chunks of paths merge exactly by adding counts.
+    """
+
+    def __init__(self, n_rows, bounds=DEFAULT_LOG_BOUNDS, bins=DEFAULT_BINS):
+        self.low, self.high = bounds
+        self.bins = bins
+        # One underflow and one overflow bin on each side of the grid
+        self.counts = np.zeros((n_rows, bins + 2), dtype=np.int64)
+
+    def add(self, values):
+        # values is year-major: (n_rows, n_values)
+        n_rows, width = self.counts.shape
+        scale = self.bins / (self.high - self.low)
+        index = np.floor((values - self.low) * scale)
+        np.clip(index, -1, self.bins, out=index)
+        index = index.astype(np.intp) + 1
+        index += (np.arange(n_rows) * width)[:, None]
+        self.counts += np.bincount(index.ravel(), minlength=n_rows * width).reshape(n_rows, width)
+
+    def merge(self, other):
+        self.counts += other.counts
+        return self
+
+    def quantiles(self, percentiles):
+        # Linear interpolation inside the bin that holds each requested rank
+        percentiles = np.asarray(percentiles, dtype=np.float64)
+        edges = self.low + np.arange(self.bins + 1) * (self.high - self.low) / self.bins
+        # The edge bins have no width; report the grid bound for them
+        edges = np.concatenate([[self.low], edges, [self.high]])
+        cumulative = np.cumsum(self.counts, axis=1)
+        out = np.empty((len(percentiles), self.counts.shape[0]))
+        for row in range(self.counts.shape[0]):
+            total = cumulative[row, -1]
+            rank = percentiles / 100 * total
+            b = np.minimum(np.searchsorted(cumulative[row], rank, side='left'), self.counts.shape[1] - 1)
+            before = np.where(b > 0, cumulative[row, b - 1], 0)
+            inside = np.maximum(self.counts[row, b], 1)
+            fraction = np.clip((rank - before) / inside, 0, 1)
+            out[:, row] = edges[b] + fraction * (edges[b + 1] - edges[b])
+        return out
+
+
+class RunningMoments:
+    """Per-row running mean and variance (Chan et al. parallel update)."""
+
+    def __init__(self, n_rows):
+        self.count = 0
+        self.mean = np.zeros(n_rows)
+        self.m2 = np.zeros(n_rows)
+
+    def add(self, values):
+        n = values.shape[1]
+        mean = values.mean(axis=1)
+        m2 = ((values - mean[:, None]) ** 2).sum(axis=1)
+        self._combine(n, mean, m2)
+
+    def merge(self, other):
+        self._combine(other.count, other.mean, other.m2)
+        return self
+
+    def _combine(self, n, mean, m2):
+        if n == 0:
+            return
+        total = self.count + n
+        delta = mean - self.mean
+        self.mean = self.mean + delta * (n / total)
+        self.m2 = self.m2 + m2 + delta ** 2 * (self.count * n / total)
+        self.count = total
+
+    def variance(self, ddof=1):
+        return self.m2 / max(self.count - ddof, 1)
+
+
+class PathAccumulator:
+    """Folds chunks of simulated growth paths into bounded-size summaries.
+
+    Keeps a quantile sketch of the GDP level per year, the running mean and
+    variance of the level per year, its exact minimum and maximum, and a count
+    of paths by the year of their first recession (a year of negative growth),
+    so memory does not depend on how many paths are folded in.
+    """
+
+    def __init__(self, n_years, start_level=1.0, log_bounds=DEFAULT_LOG_BOUNDS, bins=DEFAULT_BINS):
+        self.n_years = n_years
+        self.start_level = start_level
+        self.sketch = HistogramSketch(n_years, log_bounds, bins)
+        self.moments = RunningMoments(n_years)
+        # first_recession[k] counts paths whose first recession is in year k;
+        # the last slot counts paths without a recession
+        self.first_recession = np.zeros(n_years + 1, dtype=np.int64)
+        # Per-year min / max of the log level; like the counts they merge exactly
+        self.log_low = np.full(n_years, np.inf)
+        self.log_high = np.full(n_years, -np.inf)
+        # Root seed entropy of the run, so it can be repeated exactly
+        self.entropy = None
+
+    @property
+    def n_paths(self):
+        return int(self.first_recession.sum())
+
+    def add(self, growth):
+        """Fold in a year-major (n_years, n_paths) chunk of growth rates in percent.
+
+        The chunk is overwritten with log levels.
+        """
+        self.moments.merge(self.fold(growth))
+
+    def fold(self, growth):
+        # Like add(), but the chunk's level moments are returned instead of
+        # merged. Counts add up exactly in any order; float moments do not, so
+        # the parallel driver merges them itself in chunk order.
+        negative = growth < 0
+        first = np.where(negative.any(axis=0), negative.argmax(axis=0), self.n_years)
+        self.first_recession += np.bincount(first, minlength=self.n_years + 1)
+
+        log_levels = growth_to_log_levels(growth, out=growth)
+        self.sketch.add(log_levels)
+        np.minimum(self.log_low, log_levels.min(axis=1), out=self.log_low)
+        np.maximum(self.log_high, log_levels.max(axis=1), out=self.log_high)
+        moments = RunningMoments(self.n_years)
+        moments.add(np.exp(log_levels))
+        return moments
+
+    def merge(self, other):
+        self.sketch.merge(other.sketch)
+        self.moments.merge(other.moments)
+        self.first_recession += other.first_recession
+        self.merge_envelope(other)
+        return self
+
+    def merge_envelope(self, other):
+        np.minimum(self.log_low, other.log_low, out=self.log_low)
+        np.maximum(self.log_high, other.log_high, out=self.log_high)
+
+    def quantiles(self, percentiles=DEFAULT_PERCENTILES):
+        return self.start_level * np.exp(self.sketch.quantiles(percentiles))
+
+    def envelope(self):
+        """Exact (low, high) GDP level per year over every path folded in."""
+        return self.start_level * np.exp(self.log_low), self.start_level * np.exp(self.log_high)
+
+    def mean(self):
+        return self.start_level * self.moments.mean
+
+    def std(self):
+        return self.start_level * np.sqrt(self.moments.variance())
+
+    def recession_probability(self, years):
+        """Probability of at least one year of negative growth within `years` years."""
+        return self.first_recession[:years].sum() / self.n_paths
+
+
+def chunk_sizes(n_paths, chunk_size=DEFAULT_CHUNK_SIZE):
+    return [min(chunk_size, n_paths - start) for start in range(0, n_paths, chunk_size)]
+
+
+def chunk_seeds(seed, n_chunks):
+    """One independent SeedSequence stream per chunk of paths.
+
+    Streams belong to chunks rather than to workers, so the same seed gives
+    the same paths however the chunks are later spread over processes.
+    """
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    return seed, seed.spawn(n_chunks)
+
+
+class GaussianSampler:
+    # Picklable chunk sampler for i.i.d. normal growth; see simulation.simulate_gaussian
+    def __init__(self, mean, std, n_years):
+        self.mean, self.std, self.n_years = mean, std, n_years
+
+    def __call__(self, n, rng):
+        growth = rng.standard_normal((self.n_years, n))
+        growth *= self.std
+        growth += self.mean
+        return growth
+
+
+class RegimeSampler:
+    # Picklable chunk sampler for Markov-switching growth; see simulation.simulate_regimes
+    def __init__(self, transmat, means, stds, n_years, initial_state=None, startprob=None):
+        self.transmat, self.means, self.stds, self.n_years = transmat, means, stds, n_years
+        self.initial_state, self.startprob = initial_state, startprob
+
+    def __call__(self, n, rng):
+        growth, _ = simulate_regime_paths(self.transmat, self.means, self.stds, self.n_years, n_paths=n,
+                                          initial_state=self.initial_state, startprob=self.startprob,
+                                          rng=rng)
+        return growth
+
+
+def stream_paths(sampler, n_years, n_paths, chunk_size=DEFAULT_CHUNK_SIZE, start_level=1.0, seed=None,
+                 log_bounds=DEFAULT_LOG_BOUNDS, bins=DEFAULT_BINS, sink=None):
+    # sampler(n, rng) returns a year-major (n_years, n) growth matrix. A sink
+    # (ensemble.EnsembleWriter) is handed every chunk's growth and log levels.
+    sizes = chunk_sizes(n_paths, chunk_size)
+    root, seeds = chunk_seeds(seed, len(sizes))
+    accumulator = PathAccumulator(n_years, start_level, log_bounds, bins)
+    accumulator.entropy = root.entropy
+    for index, (n, chunk_seed) in enumerate(zip(sizes, seeds)):
+        growth = sampler(n, np.random.default_rng(chunk_seed))
+        if sink is not None:
+            sink.write(index, 'growth', growth)
+        accumulator.add(growth)
+        if sink is not None:
+            sink.write(index, 'log_levels', growth)
+    if sink is not None:
+        sink.close(sizes, accumulator)
+    return accumulator
+
+
+def stream_gaussian(mean, std, n_years, n_paths, chunk_size=DEFAULT_CHUNK_SIZE, start_level=1.0, seed=None,
+                    sink=None):
+    """Streaming version of simulation.simulate_gaussian; returns a PathAccumulator.
+
+    The accumulator's `entropy` attribute is the seed to pass to rerun it
+    exactly. With sink=EnsembleWriter(...) every path is also kept on disk.
+    """
+    return stream_paths(GaussianSampler(mean, std, n_years), n_years, n_paths, chunk_size, start_level, seed,
+                        sink=sink)
+
+
+def stream_regimes(transmat, means, stds, n_years, n_paths, initial_state=None, startprob=None,
+                   chunk_size=DEFAULT_CHUNK_SIZE, start_level=1.0, seed=None, sink=None):
+    """Streaming version of simulation.simulate_regimes; returns a PathAccumulator."""
+    sampler = RegimeSampler(transmat, means, stds, n_years, initial_state, startprob)
+    return stream_paths(sampler, n_years, n_paths, chunk_size, start_level, seed, sink=sink)
@@ -0,0 +1,245 @@
+import json
+import os
+import time
+import zipfile
+from collections import namedtuple
+
+import numpy as np
+from scipy.signal import lfilter
+
+from .simulation import TransitionSampler, stationary_distribution
+
+# Periods per year, date unit and step, as FRED dates them (DFF is daily,
+# POPTHM monthly, GDP quarterly on the first day of the quarter)
+FREQUENCIES = {'quarterly': (4, 'M', 3), 'monthly': (12, 'M', 1), 'daily': (365, 'D', 1)}
+
+# First period of every series
+START_DATE = '1947-01-01'
+
+# Series written per economy, named like the FRED series the scripts load;
+# REGIME holds the true regime (as float) so fitted models can be checked
+SERIES_IDS = {'gdp': 'GDP', 'inflation': 'FPCPITOTLZGUSA', 'rate': 'DFF', 'population': 'POPTHM',
+              'regime': 'REGIME'}
+
+# Values generated per column and chunk; a chunk of all columns is ~50 MB
+DEFAULT_CHUNK_VALUES = 1 << 20
+
+# chunk: periods [start, start + n) of every column, each (n, n_series)
+Chunk = namedtuple('Chunk', ['start', 'dates', 'columns'])
+
+
+def period_dates(frequency, start, n):
+    """FRED-style datetime64[D] dates (first day of each period) for periods [start, start + n)."""
+    _, unit, step = FREQUENCIES[frequency]
+    periods = np.datetime64(START_DATE, unit) + (start + np.arange(n)) * step
+    return periods.astype('datetime64[D]')
+
+
+class MacroProcess:
+    """Regime-switching macro economy, simulated for many economies at once and streamed in chunks.
+
+    Growth (% per period) is a Markov-switching mean plus ARMA(ar, ma) noise
+    whose innovation scale follows the regime, so log GDP is ARIMA(p, 1, q)
+    within a regime. Inflation (annual %) is an AR(1) pulled by the growth
+    gap; the policy rate follows a smoothed Taylor rule on inflation and the
+    growth gap, floored at zero (the unfloored shadow rate carries over);
+    population grows at a steady rate with small shocks. Growth, inflation
+    and rate innovations are correlated through `correlation`.
+
+    Regime parameters are given in annual terms (means and stds of annual
+    growth, expected spell lengths in years) and scaled to the frequency.
+    All state (regimes, filter memory, levels) is carried between calls to
+    chunk(), so for a given seed a long panel comes out the same (up to
+    rounding in the level sums) whatever the chunk size.
+    """
+
+    def __init__(self, n_series=1, frequency='quarterly', means=(3.5, -2.0), stds=(2.0, 3.0),
+                 durations=(5.0, 1.0), transmat=None, ar=(0.35,), ma=(0.2,), inflation=3.0,
+                 inflation_ar=0.9, inflation_std=1.0, neutral_rate=1.0, rate_smoothing=0.85, rate_std=0.5,
+                 population_growth=1.0, population_std=0.05, correlation=((1.0, 0.2, 0.3), (0.2, 1.0, 0.5),
+                                                                         (0.3, 0.5, 1.0)),
+                 start_gdp=250.0, start_population=145000.0, seed=None):
+        if frequency not in FREQUENCIES:
+            raise ValueError('frequency must be one of %s' % ', '.join(FREQUENCIES))
+        per_year = FREQUENCIES[frequency][0]
+        self.n_series = n_series
+        self.frequency = frequency
+        # Separate streams for regime uniforms, correlated shocks and population
+        # shocks: each is consumed in period order, so chunking cannot change the draws
+        self.seed = np.random.SeedSequence(seed)
+        self.regime_rng, self.shock_rng, self.population_rng = [np.random.default_rng(s)
+                                                                for s in self.seed.spawn(3)]
+
+        # Per-period regime parameters
+        self.means = np.asarray(means, dtype=np.float64) / per_year
+        self.stds = np.asarray(stds, dtype=np.float64) / np.sqrt(per_year)
+        K = len(self.means)
+        if transmat is None:
+            # Leave each regime after durations[k] years on average, to the others evenly
+            stay = 1 - 1 / np.maximum(np.asarray(durations, dtype=np.float64) * per_year, 1)
+            transmat = np.where(np.eye(K, dtype=bool), stay[:, None], ((1 - stay) / max(K - 1, 1))[:, None])
+        self.transmat = np.asarray(transmat, dtype=np.float64)
+        self.sampler = TransitionSampler(self.transmat)
+        self.mean_growth = stationary_distribution(self.transmat) @ self.means
+        self.per_year = per_year
+
+        # Growth noise: ARMA filter coefficients for lfilter (b / a)
+        self.arma = (np.r_[1.0, ma], np.r_[1.0, -np.asarray(ar, dtype=np.float64)])
+        self.inflation, self.inflation_ar, self.inflation_std = inflation, inflation_ar, inflation_std
+        self.neutral_rate, self.rate_smoothing, self.rate_std = neutral_rate, rate_smoothing, rate_std
+        self.population_growth = population_growth / 100 / per_year
+        self.population_std = population_std / 100 / np.sqrt(per_year)
+        self.cholesky = np.linalg.cholesky(np.asarray(correlation, dtype=np.float64))
+
+        # Carried state: the next period's regime, filter memories, log levels
+        N = n_series
+        self.state = self.sampler.initial(stationary_distribution(self.transmat), self.regime_rng.random(N))
+        self.arma_zi = np.zeros((max(len(self.arma[0]), len(self.arma[1])) - 1, N))
+        self.inflation_zi = np.zeros((1, N))
+        self.rate_zi = np.full((1, N), neutral_rate + inflation)
+        self.log_gdp = np.full(N, np.log(start_gdp))
+        self.log_population = np.full(N, np.log(start_population))
+        self.periods = 0
+
+    def _regimes(self, n):
+        # Markov chain of every economy, period by period, vectorised across economies
+        uniforms = self.regime_rng.random((n, self.n_series))
+        state_dtype = np.int8 if self.sampler.n_states <= 127 else np.int32
+        states = np.empty((n, self.n_series), dtype=state_dtype)
+        state = self.state
+        for t in range(n):
+            states[t] = state
+            state = self.sampler.step(state, uniforms[t])
+        self.state = state
+        return states
+
+    def chunk(self, n):
+        """Simulate the next n periods; returns a Chunk of (n, n_series) columns."""
+        states = self._regimes(n)
+        z = self.shock_rng.standard_normal((n, self.n_series, 3)) @ self.cholesky.T
+
+        # Regime mean plus ARMA noise with regime-scaled innovations
+        noise, self.arma_zi = lfilter(*self.arma, self.stds[states] * z[..., 0], axis=0, zi=self.arma_zi)
+        growth = self.means[states] + noise
+        gap = (growth - self.mean_growth) * self.per_year
+
+        # Inflation gap: AR(1) driven by its shock and the growth gap
+        rho = self.inflation_ar
+        shock = self.inflation_std * np.sqrt(1 - rho ** 2) * z[..., 1] + 0.05 * gap
+        inflation_gap, self.inflation_zi = lfilter([1.0], [1.0, -rho], shock, axis=0, zi=self.inflation_zi)
+        inflation = self.inflation + inflation_gap
+
+        # Smoothed Taylor rule on the shadow rate; the observed rate is floored at zero
+        smooth = self.rate_smoothing
+        target = self.neutral_rate + inflation + 0.5 * inflation_gap + 0.5 * gap
+        shadow, self.rate_zi = lfilter([1 - smooth], [1.0, -smooth], target + self.rate_std * z[..., 2], axis=0,
+                                       zi=self.rate_zi)
+
+        log_gdp = self.log_gdp + np.cumsum(np.log1p(np.maximum(growth, -99.9999) / 100), axis=0)
+        log_population = self.log_population + np.cumsum(
+            self.population_growth + self.population_std * self.population_rng.standard_normal((n, self.n_series)), axis=0)
+        self.log_gdp, self.log_population = log_gdp[-1], log_population[-1]
+
+        start, self.periods = self.periods, self.periods + n
+        columns = {'gdp': np.exp(log_gdp), 'inflation': inflation, 'rate': np.maximum(shadow, 0.0),
+                   'population': np.exp(log_population), 'regime': states.astype(np.float64)}
+        return Chunk(start, period_dates(self.frequency, start, n), columns)
+
+    def chunks(self, n_periods, chunk_size=None):
+        """Yield Chunks covering n_periods more periods."""
+        chunk_size = chunk_size or max(1, DEFAULT_CHUNK_VALUES // self.n_series)
+        for start in range(0, n_periods, chunk_size):
+            yield self.chunk(min(chunk_size, n_periods - start))
+
+
+def series_id(column, economy, n_series):
+    # A single economy uses the FRED IDs themselves, so the scripts load it unchanged
+    name = SERIES_IDS[column]
+    return name if n_series == 1 else '%s_%d' % (name, economy)
+
+
+class _NpyStream:
+    # Writes one .npy member of a .npz archive front to back: the header is
+    # written for the final length up front, then the data as it arrives
+    def __init__(self, archive, name, dtype, length):
+        self.file = archive.open(name + '.npy', 'w', force_zip64=True)
+        header = {'descr': np.lib.format.dtype_to_descr(np.dtype(dtype)), 'fortran_order': False,
+                  'shape': (length,)}
+        np.lib.format.write_array_header_1_0(self.file, header)
+
+    def write(self, values):
+        self.file.write(np.ascontiguousarray(values).tobytes())
+
+    def close(self):
+        self.file.close()
+
+
+def _write_npz(path, frequency, values, chunk_size):
+    # Assemble <id>.npz (dates + values, the SeriesStore schema) by streaming:
+    # dates are regenerated chunk by chunk, values copied from the spool
+    n_periods = len(values)
+    tmp = path + '.tmp.npz'
+    with zipfile.ZipFile(tmp, 'w', zipfile.ZIP_STORED, allowZip64=True) as archive:
+        stream = _NpyStream(archive, 'dates', 'datetime64[D]', n_periods)
+        for start in range(0, n_periods, chunk_size):
+            stream.write(period_dates(frequency, start, min(chunk_size, n_periods - start)))
+        stream.close()
+        stream = _NpyStream(archive, 'values', np.float64, n_periods)
+        for start in range(0, n_periods, chunk_size):
+            stream.write(values[start:start + chunk_size])
+        stream.close()
+    os.replace(tmp, path)
+
+
+def write_panel(root, n_periods, n_series=1, fmt='npz', chunk_size=None, **process_kwargs):
+    """Generate a synthetic panel and stream it to disk; returns the series IDs written.
+
+    fmt='npz' writes a SeriesStore directory (<id>.npz + <id>.json), readable
+    with SeriesStore(root=root, offline=True) or USECON_STORE_DIR=root with
+    USECON_OFFLINE=1. fmt='csv' writes fredgraph-style <id>.csv files, usable
+    as a source with USECON_FRED_SOURCE=root. Memory stays at one chunk
+    whatever the panel size: CSV rows are appended per chunk, and .npz values
+    are spooled to memory-mapped files and then streamed into the archives.
+
+    pandas cannot index dates past 2262, so series meant for the pandas
+    loaders should stay under ~1260 quarters, ~3780 months or ~115000 days,
+    and GDP levels overflow after ~80000 quarters of compounding; reach
+    larger sizes with n_series instead. load_arrays() has no date limit.
+    """
+    if fmt not in ('npz', 'csv'):
+        raise ValueError("fmt must be 'npz' or 'csv'")
+    process = MacroProcess(n_series=n_series, **process_kwargs)
+    chunk_size = chunk_size or max(1, DEFAULT_CHUNK_VALUES // n_series)
+    os.makedirs(root, exist_ok=True)
+    ids = [(column, economy, series_id(column, economy, n_series))
+           for economy in range(n_series) for column in SERIES_IDS]
+
+    if fmt == 'csv':
+        for _, _, sid in ids:
+            with open(os.path.join(root, sid + '.csv'), 'w') as f:
+                f.write('DATE,%s\n' % sid)
+        for chunk in process.chunks(n_periods, chunk_size):
+            dates = chunk.dates.astype(str).astype(object)
+            for column, economy, sid in ids:
+                rows = np.char.mod('%.10g', chunk.columns[column][:, economy]).astype(object)
+                with open(os.path.join(root, sid + '.csv'), 'a') as f:
+                    f.write(''.join(dates + ',' + rows + '\n'))
+        return [sid for _, _, sid in ids]
+
+    # One economy-major (n_series, n_periods) spool per column, so each chunk
+    # lands as one contiguous run per economy and each series reads back contiguously
+    spool_paths = {column: os.path.join(root, '.%s.spool.npy' % column) for column in SERIES_IDS}
+    spool = {column: np.lib.format.open_memmap(path, 'w+', np.float64, (n_series, n_periods))
+             for column, path in spool_paths.items()}
+    for chunk in process.chunks(n_periods, chunk_size):
+        stop = chunk.start + len(chunk.dates)
+        for column in SERIES_IDS:
+            spool[column][:, chunk.start:stop] = chunk.columns[column].T
+    for column, economy, sid in ids:
+        _write_npz(os.path.join(root, sid + '.npz'), process.frequency, spool[column][economy], chunk_size)
+        with open(os.path.join(root, sid + '.json'), 'w') as f:
+            json.dump({'checked': time.time(), 'etag': 'synthetic'}, f)
+    spool.clear()
+    for path in spool_paths.values():
+        os.remove(path)
+    return [sid for _, _, sid in ids]